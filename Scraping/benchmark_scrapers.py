@@ -0,0 +1,225 @@
+"""
+Offline benchmark of the PMC extractors over saved article pages.
+
+Every fixture page is served to the scrapers through a stubbed requests.get,
+so runs are repeatable and never touch the network. Timings, allocations and
+peak RSS are compared against a stored baseline so parser changes show up as
+diffs.
+"""
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+import requests
+from bs4 import BeautifulSoup
+
+from pmc_urls import extract_pmcid, resolve
+from scraper_scripts import PMC_SCRIPTS, SCRAPING_DIR, load_script
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_FIXTURES = os.path.join(SCRAPING_DIR, "output", "*.html")
+DEFAULT_BASELINE = os.path.join(SCRAPING_DIR, "benchmarks", "baseline.json")
+
+
+class FixturePage:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.content = f.read()
+        pmcid = extract_pmcid(os.path.basename(path)) or os.path.splitext(os.path.basename(path))[0]
+        self.url = f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmcid}/"
+
+
+class FixtureResponse:
+    """The parts of requests.Response the scrapers use."""
+
+    def __init__(self, url, content, status_code=200):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.elapsed = datetime.timedelta(0)
+        self.text = content.decode('utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for {self.url}")
+
+
+@contextlib.contextmanager
+def offline(pages):
+    """Serve fixture pages instead of the network and silence the scrapers' progress prints."""
+    # The scrapers fetch the resolved (canonical) URL, not the CSV form.
+    by_url = {resolve(page.url): page.content for page in pages}
+
+    def fake_get(url, *args, **kwargs):
+        if url not in by_url:
+            raise requests.ConnectionError(f"No fixture for {url}")
+        return FixtureResponse(url, by_url[url])
+
+    with mock.patch("requests.get", fake_get), mock.patch.dict(os.environ, {"RATE_LIMIT": "off"}), \
+            contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def main_content(soup):
+    """Same content lookup scrape_pmc_paper_content does before extracting sections."""
+    return (soup.find('div', class_='tsec') or soup.find('div', class_='article')
+            or soup.find('main') or soup.find('article') or soup.find('body'))
+
+
+def benchmark_cases(modules):
+    """(name, setup(page) -> state, run(state)) for every benchmarked function."""
+    parse = lambda page: BeautifulSoup(page.content, 'html.parser')
+    return [
+        ("scrape_pmc_paper_on_this_page", lambda page: page.url,
+         modules["main"].scrape_pmc_paper_on_this_page),
+        ("parse_html", lambda page: page.content,
+         lambda content: BeautifulSoup(content, 'html.parser')),
+        ("extract_hierarchical_sections", lambda page: main_content(parse(page)),
+         modules["main2"].extract_hierarchical_sections),
+        ("extract_authors_and_editors", parse, modules["main2"].extract_authors_and_editors),
+        ("extract_references", parse, modules["firas"].extract_references),
+    ]
+
+
+def measure(run, states, repeat):
+    """Time run over every state repeat times, then trace allocations over one more pass."""
+    per_page = []
+    for state in states:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(state)
+            samples.append(time.perf_counter() - start)
+        per_page.append(min(samples))
+
+    # tracemalloc slows everything down, so it gets its own pass.
+    tracemalloc.start()
+    peaks = []
+    for state in states:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        run(state)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    total = sum(per_page)
+    return {
+        "pages": len(states),
+        "total_s": total,
+        "median_ms": statistics.median(per_page) * 1000,
+        "max_ms": max(per_page) * 1000,
+        "pages_per_s": len(states) / total if total else 0.0,
+        "peak_alloc_kib": max(peaks) / 1024,
+    }
+
+
+def peak_rss_mib():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_benchmarks(fixture_glob=DEFAULT_FIXTURES, repeat=5, only=None):
+    paths = sorted(glob.glob(fixture_glob))
+    if not paths:
+        print(f"No fixture pages match {fixture_glob}")
+        return None
+    pages = [FixturePage(path) for path in paths]
+    modules = {name: load_script(name) for name in PMC_SCRIPTS}
+
+    results = {}
+    with offline(pages):
+        for name, setup, run in benchmark_cases(modules):
+            if only and name not in only:
+                continue
+            states = [setup(page) for page in pages]
+            results[name] = measure(run, states, repeat)
+
+    return {
+        "fixtures": [os.path.relpath(path, SCRAPING_DIR) for path in paths],
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "peak_rss_mib": peak_rss_mib(),
+        "functions": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Print per-function changes against the baseline and return the names that regressed."""
+    regressions = []
+    print(f"{'function':34s} {'median ms':>10s} {'baseline':>10s} {'change':>8s} "
+          f"{'pages/s':>9s} {'peak KiB':>9s}")
+    for name, stats in report["functions"].items():
+        base = baseline.get("functions", {}).get(name) if baseline else None
+        change = ""
+        if base and base["median_ms"] > 0:
+            ratio = stats["median_ms"] / base["median_ms"] - 1.0
+            change = f"{ratio:+.1%}"
+            if ratio > threshold:
+                regressions.append(name)
+                change += " !"
+        print(f"{name:34s} {stats['median_ms']:10.2f} "
+              f"{(base['median_ms'] if base else float('nan')):10.2f} {change:>8s} "
+              f"{stats['pages_per_s']:9.1f} {stats['peak_alloc_kib']:9.0f}")
+    if report["peak_rss_mib"] is not None:
+        print(f"Peak RSS: {report['peak_rss_mib']:.1f} MiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PMC extractors on saved HTML pages")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Glob of saved PMC article pages")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per page; the fastest counts")
+    parser.add_argument("--only", nargs="*", help="Benchmark only these functions")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--output", help="Also write this run's report as JSON")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown of the median that counts as a regression")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if anything regressed")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.fixtures, args.repeat, args.only)
+    if report is None:
+        sys.exit(1)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(f"{len(report['fixtures'])} fixture pages, best of {args.repeat} runs")
+    regressions = compare(report, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"Regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
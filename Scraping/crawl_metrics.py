@@ -0,0 +1,215 @@
+"""
+Per-stage timing, latency histograms and a live ETA for the crawl scripts.
+
+The scrapers wrap each stage of a paper (fetch, parse, every extractor,
+writes, polite sleeps) in ``metrics.stage(name)``. At the end of a run the
+metrics are written as JSON and in the Prometheus text exposition format.
+"""
+import contextlib
+import json
+import math
+import time
+
+import profiling
+
+# Upper bounds in seconds, Prometheus-style; the last bucket is +Inf.
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_duration(seconds):
+    """Format seconds as '1h 2m 3s', '2m 3s' or '3s'."""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours > 0:
+        return f"{hours}h {minutes}m {seconds}s"
+    elif minutes > 0:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with running sum, count, min and max."""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Fold another histogram with the same buckets into this one."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the bucket that contains it."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if count and seen + count >= rank:
+                estimate = lower + (upper - lower) * (rank - seen) / count
+                return min(max(estimate, self.min), self.max)
+            seen += count
+            lower = upper
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "min": round(self.min, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "buckets": {str(bound): count for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts)},
+        }
+
+
+class CrawlMetrics:
+    """Stage latencies, counters and an EWMA throughput estimate for one crawl run."""
+
+    def __init__(self, name="crawl", total=None, alpha=0.2):
+        self.name = name
+        self.total = total
+        self.alpha = alpha
+        self.stages = {}
+        self.counters = {}
+        self.started = time.time()
+        self.last_done = time.perf_counter()
+        self.done = 0
+        self.ewma_seconds = None  # smoothed wall time per paper, sleeps included
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    def add(self, counter, value=1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def paper_done(self, ok=True):
+        """Count a finished paper and fold its wall time into the ETA estimate."""
+        now = time.perf_counter()
+        elapsed = now - self.last_done
+        self.last_done = now
+        self.done += 1
+        self.add("papers_ok" if ok else "papers_failed")
+        profiling.paper_done()
+        if self.ewma_seconds is None:
+            self.ewma_seconds = elapsed
+        else:
+            self.ewma_seconds = self.alpha * elapsed + (1 - self.alpha) * self.ewma_seconds
+
+    def throughput(self):
+        """Current papers per second according to the EWMA."""
+        return 1.0 / self.ewma_seconds if self.ewma_seconds else 0.0
+
+    def eta_seconds(self):
+        if self.total is None or self.ewma_seconds is None:
+            return None
+        return max(self.total - self.done, 0) * self.ewma_seconds
+
+    def progress(self):
+        """One-line progress summary: done/total, failures, throughput and ETA."""
+        line = f"{self.done}/{self.total if self.total is not None else '?'} papers"
+        line += f" ({self.counters.get('papers_failed', 0)} failed)"
+        if self.ewma_seconds:
+            line += f" | {self.throughput():.2f} papers/s"
+        eta = self.eta_seconds()
+        if eta is not None:
+            line += f" | ETA {format_duration(eta)}"
+        return line
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "started": self.started,
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "papers_done": self.done,
+            "papers_total": self.total,
+            "throughput_papers_per_second": round(self.throughput(), 4),
+            "eta_seconds": self.eta_seconds(),
+            "counters": self.counters,
+            "stages": {stage: histogram.to_dict() for stage, histogram in self.stages.items()},
+        }
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        prefix = self.name
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per crawl stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for stage, histogram in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for counter, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {value}")
+        lines.append(f"# TYPE {prefix}_throughput_papers_per_second gauge")
+        lines.append(f"{prefix}_throughput_papers_per_second {self.throughput():.6f}")
+        eta = self.eta_seconds()
+        if eta is not None:
+            lines.append(f"# TYPE {prefix}_eta_seconds gauge")
+            lines.append(f"{prefix}_eta_seconds {eta:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, basename=None):
+        """Write <basename>.json and <basename>.prom; basename defaults to crawl_metrics_<name>."""
+        basename = basename or f"crawl_metrics_{self.name}"
+        try:
+            with open(basename + ".json", 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, indent=2)
+            with open(basename + ".prom", 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            print(f"Crawl metrics saved to {basename}.json and {basename}.prom")
+        except Exception as e:
+            print(f"Error saving crawl metrics: {e}")
+
+    def print_stage_summary(self):
+        print(f"{'stage':30s} {'count':>6s} {'total s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'max ms':>9s}")
+        for stage, h in sorted(self.stages.items(), key=lambda item: -item[1].sum):
+            print(f"{stage:30s} {h.count:6d} {h.sum:9.2f} {h.quantile(0.5) * 1000:9.1f} "
+                  f"{h.quantile(0.95) * 1000:9.1f} {h.max * 1000:9.1f}")
+
+
+def record_response(metrics, response, fetch_seconds):
+    """Split a finished requests call into time-to-headers and body download, and count bytes."""
+    to_headers = response.elapsed.total_seconds()
+    metrics.observe("request", to_headers)
+    metrics.observe("download", max(fetch_seconds - to_headers, 0.0))
+    metrics.add("bytes_downloaded", len(response.content))
@@ -4,12 +4,21 @@ import json
 import csv
 import re
 import time
+import os
+import sys
 from urllib.parse import urljoin
 
-def scrape_pmc_paper_on_this_page(url):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_metrics import CrawlMetrics, record_response
+from profiling import profile_run
+from pmc_urls import dedup_by_pmcid, learn, resolve
+from rate_limiter import acquire, default_delay
+
+def scrape_pmc_paper_on_this_page(url, metrics=None):
     """
     Scrape a PMC paper and extract the 'ON THIS PAGE' navigation section
     """
+    metrics = metrics or CrawlMetrics("main")
     try:
         # Set headers to mimic a real browser
         headers = {
@@ -17,11 +26,20 @@ def scrape_pmc_paper_on_this_page(url):
         }
         
         # Make request to the PMC paper
-        response = requests.get(url, headers=headers)
+        # Fetch the canonical URL directly instead of following PMC's redirect
+        fetch_url = resolve(url)
+        acquire(fetch_url, metrics)  # shared with every other crawl process
+        fetch_start = time.perf_counter()
+        response = requests.get(fetch_url, headers=headers)
         response.raise_for_status()
+        record_response(metrics, response, time.perf_counter() - fetch_start)
+        learn(fetch_url, response)
         
         # Parse HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
+        with metrics.stage("parse"):
+            soup = BeautifulSoup(response.content, 'html.parser')
+        
+        extract_start = time.perf_counter()
         
         # Extract page title
         page_title = ""
@@ -54,7 +72,7 @@ def scrape_pmc_paper_on_this_page(url):
             'div[class*="discussion"]',
             'div[class*="conclusion"]',
             'div[class*="reference"]',
-            'div[class*="acknowledgment"]'`
+            'div[class*="acknowledgment"]'
         ]
         
         found_sections = set()
@@ -130,6 +148,8 @@ def scrape_pmc_paper_on_this_page(url):
                         'link': ''
                     })
         
+        metrics.observe("extract_on_this_page", time.perf_counter() - extract_start)
+        
         return {
             'page_title': page_title,
             'page_url': url,
@@ -189,16 +209,21 @@ def read_urls_from_csv(csv_file):
                         'title': row.get('Title', '').strip(),
                         'url': row['Link'].strip()
                     })
-        print(f"Loaded {len(urls)} URLs from {csv_file}")
+        urls, duplicates = dedup_by_pmcid(urls)
+        print(f"Loaded {len(urls)} URLs from {csv_file} ({duplicates} duplicate PMCIDs skipped)")
         return urls
     except Exception as e:
         print(f"Error reading CSV file: {e}")
         return []
 
-def process_multiple_urls(urls, delay=1):
+def process_multiple_urls(urls, delay=None, metrics=None):
     """
     Process multiple URLs and collect all results
     """
+    if delay is None:
+        # The shared per-host bucket paces requests; only sleep when it is switched off.
+        delay = default_delay(1)
+    metrics = metrics or CrawlMetrics("main", total=len(urls))
     all_results = []
     successful_count = 0
     failed_count = 0
@@ -212,7 +237,7 @@ def process_multiple_urls(urls, delay=1):
         
         try:
             # Scrape the paper
-            data = scrape_pmc_paper_on_this_page(url_data['url'])
+            data = scrape_pmc_paper_on_this_page(url_data['url'], metrics)
             
             if data and data['on_this_page_items']:
                 # Add the original title from CSV if available
@@ -221,6 +246,7 @@ def process_multiple_urls(urls, delay=1):
                 
                 all_results.append(data)
                 successful_count += 1
+                metrics.paper_done(ok=True)
                 print(f"[OK] Found {len(data['on_this_page_items'])} 'ON THIS PAGE' items")
                 
                 # Display first few items
@@ -230,15 +256,20 @@ def process_multiple_urls(urls, delay=1):
                     print(f"  ... and {len(data['on_this_page_items']) - 3} more")
             else:
                 failed_count += 1
+                metrics.paper_done(ok=False)
                 print("[FAIL] No 'ON THIS PAGE' items found")
                 
         except Exception as e:
             failed_count += 1
+            metrics.paper_done(ok=False)
             print(f"[ERROR] {e}")
         
+        print(f"  {metrics.progress()}")
+        
         # Add delay to be respectful to the server
-        if i < len(urls):  # Don't delay after the last URL
-            time.sleep(delay)
+        if delay and i < len(urls):  # Don't delay after the last URL
+            with metrics.stage("sleep"):
+                time.sleep(delay)
     
     print(f"\n" + "=" * 80)
     print(f"Processing complete!")
@@ -295,12 +326,14 @@ def main():
     print(f"Processing all {len(urls)} URLs with improved section detection")
     
     # Process all URLs
-    all_results = process_multiple_urls(urls, delay=1)  # 1 second delay between requests
+    metrics = CrawlMetrics("main", total=len(urls))
+    all_results = process_multiple_urls(urls, metrics=metrics)
     
     if all_results:
         # Save all results
-        save_all_results_to_csv(all_results)
-        save_all_results_to_json(all_results)
+        with metrics.stage("write"):
+            save_all_results_to_csv(all_results)
+            save_all_results_to_json(all_results)
         
         # Print summary
         total_sections = sum(len(data['on_this_page_items']) for data in all_results)
@@ -312,6 +345,12 @@ def main():
         print(f"Results saved to: all_pmc_on_this_page.csv and all_pmc_on_this_page.json")
     else:
         print("No data was successfully scraped from any of the URLs.")
+    
+    # Where the time went, per stage
+    metrics.print_stage_summary()
+    metrics.save()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Set PROFILE_RUN=cprofile or sampling to profile this run
+    with profile_run("main"):
+        main()
\ No newline at end of file
@@ -6,6 +6,13 @@ import re
 import time
 from urllib.parse import urljoin
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_metrics import CrawlMetrics, record_response
+from profiling import profile_run
+from pmc_urls import dedup_by_pmcid, learn, resolve
+from rate_limiter import acquire, default_delay
 
 def extract_authors_and_editors(soup):
     """
@@ -109,10 +116,11 @@ def extract_authors_and_editors(soup):
     
     return authors, editors
 
-def scrape_pmc_paper_content(url, title=""):
+def scrape_pmc_paper_content(url, title="", metrics=None):
     """
     Scrape a PMC paper and extract the full hierarchical content structure
     """
+    metrics = metrics or CrawlMetrics("main2")
     try:
         # Set headers to mimic a real browser
         headers = {
@@ -120,50 +128,16 @@ def scrape_pmc_paper_content(url, title=""):
         }
         
         # Make request to the PMC paper
-        response = requests.get(url, headers=headers)
+        # Fetch the canonical URL directly instead of following PMC's redirect
+        fetch_url = resolve(url)
+        acquire(fetch_url, metrics)  # shared with every other crawl process
+        fetch_start = time.perf_counter()
+        response = requests.get(fetch_url, headers=headers)
         response.raise_for_status()
+        record_response(metrics, response, time.perf_counter() - fetch_start)
+        learn(fetch_url, response)
         
-        # Parse HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract main title
-        main_title = ""
-        title_element = soup.find('h1') or soup.find('title')
-        if title_element:
-            main_title = title_element.get_text().strip()
-        
-        # If no title found, use the provided title
-        if not main_title and title:
-            main_title = title
-        
-        # Extract authors and editors
-        authors, editors = extract_authors_and_editors(soup)
-        
-        # Initialize the hierarchical structure
-        paper_structure = {
-            'title': main_title,
-            'url': url,
-            'authors': authors,
-            'editors': editors,
-            'sections': []
-        }
-        
-        # Find the main content area
-        main_content = soup.find('div', class_='tsec') or soup.find('div', class_='article') or soup.find('main') or soup.find('article')
-        
-        if not main_content:
-            # Fallback: look for content in the body
-            main_content = soup.find('body')
-        
-        if not main_content:
-            print(f"No main content found for {url}")
-            return paper_structure
-        
-        # Extract hierarchical sections
-        sections = extract_hierarchical_sections(main_content)
-        paper_structure['sections'] = sections
-        
-        return paper_structure
+        return parse_pmc_paper(response.content, url, title, metrics)
         
     except requests.RequestException as e:
         print(f"Error fetching the page {url}: {e}")
@@ -172,6 +146,56 @@ def scrape_pmc_paper_content(url, title=""):
         print(f"Error parsing the page {url}: {e}")
         return None
 
+def parse_pmc_paper(content, url, title="", metrics=None):
+    """
+    Extract title, authors, editors and hierarchical sections from a fetched PMC page
+    """
+    metrics = metrics or CrawlMetrics("main2")
+    # Parse HTML content
+    with metrics.stage("parse"):
+        soup = BeautifulSoup(content, 'html.parser')
+    
+    # Extract main title
+    main_title = ""
+    title_element = soup.find('h1') or soup.find('title')
+    if title_element:
+        main_title = title_element.get_text().strip()
+    
+    # If no title found, use the provided title
+    if not main_title and title:
+        main_title = title
+    
+    # Extract authors and editors
+    with metrics.stage("extract_authors_and_editors"):
+        authors, editors = extract_authors_and_editors(soup)
+    
+    # Initialize the hierarchical structure
+    paper_structure = {
+        'title': main_title,
+        'url': url,
+        'authors': authors,
+        'editors': editors,
+        'sections': []
+    }
+    
+    # Find the main content area
+    main_content = soup.find('div', class_='tsec') or soup.find('div', class_='article') or soup.find('main') or soup.find('article')
+    
+    if not main_content:
+        # Fallback: look for content in the body
+        main_content = soup.find('body')
+    
+    if not main_content:
+        print(f"No main content found for {url}")
+        return paper_structure
+    
+    # Extract hierarchical sections
+    with metrics.stage("extract_hierarchical_sections"):
+        sections = extract_hierarchical_sections(main_content)
+    paper_structure['sections'] = sections
+    
+    return paper_structure
+
 def extract_hierarchical_sections(content_element):
     """
     Extract hierarchical sections from the content element
@@ -320,16 +344,21 @@ def read_urls_from_csv(csv_file):
                         'title': row.get('Title', '').strip(),
                         'url': row['Link'].strip()
                     })
-        print(f"Loaded {len(urls)} URLs from {csv_file}")
+        urls, duplicates = dedup_by_pmcid(urls)
+        print(f"Loaded {len(urls)} URLs from {csv_file} ({duplicates} duplicate PMCIDs skipped)")
         return urls
     except Exception as e:
         print(f"Error reading CSV file: {e}")
         return []
 
-def process_multiple_papers(urls, delay=2, save_interval=10):
+def process_multiple_papers(urls, delay=None, save_interval=10, metrics=None):
     """
     Process multiple papers and collect all results with periodic saving
     """
+    if delay is None:
+        # The shared per-host bucket paces requests; only sleep when it is switched off.
+        delay = default_delay(2)
+    metrics = metrics or CrawlMetrics("main2", total=len(urls))
     all_papers = []
     successful_count = 0
     failed_count = 0
@@ -346,11 +375,12 @@ def process_multiple_papers(urls, delay=2, save_interval=10):
         
         try:
             # Scrape the paper
-            paper_data = scrape_pmc_paper_content(url_data['url'], url_data['title'])
+            paper_data = scrape_pmc_paper_content(url_data['url'], url_data['title'], metrics)
             
             if paper_data and paper_data['sections']:
                 all_papers.append(paper_data)
                 successful_count += 1
+                metrics.paper_done(ok=True)
                 print(f"[OK] Found {len(paper_data['sections'])} main sections")
                 
                 # Show authors if found
@@ -375,22 +405,28 @@ def process_multiple_papers(urls, delay=2, save_interval=10):
             else:
                 failed_count += 1
                 failed_urls.append(url_data)
+                metrics.paper_done(ok=False)
                 print("[FAIL] No content sections found")
                 
         except Exception as e:
             failed_count += 1
             failed_urls.append(url_data)
+            metrics.paper_done(ok=False)
             print(f"[ERROR] {e}")
         
+        print(f"  {metrics.progress()}")
+        
         # Save progress periodically
         if i % save_interval == 0 and all_papers:
             print(f"\n[SAVE] Saving progress... ({len(all_papers)} papers processed so far)")
-            save_papers_to_json(all_papers, f"scraped_papers_progress_{i}.json")
-            save_authors_to_csv(all_papers, f"authors_progress_{i}.csv")
+            with metrics.stage("write"):
+                save_papers_to_json(all_papers, f"scraped_papers_progress_{i}.json")
+                save_authors_to_csv(all_papers, f"authors_progress_{i}.csv")
         
         # Add delay to be respectful to the server
-        if i < len(urls):  # Don't delay after the last URL
-            time.sleep(delay)
+        if delay and i < len(urls):  # Don't delay after the last URL
+            with metrics.stage("sleep"):
+                time.sleep(delay)
     
     # Save failed URLs for retry
     if failed_urls:
@@ -631,25 +667,6 @@ def count_subsections(sections):
         count += count_subsections(section['subsections'])
     return count
 
-def estimate_processing_time(num_papers, delay=2):
-    """
-    Estimate processing time for the given number of papers
-    """
-    # Rough estimate: 3-5 seconds per paper (including delay + processing)
-    time_per_paper = delay + 2  # delay + processing time
-    total_seconds = num_papers * time_per_paper
-    
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
-    
-    if hours > 0:
-        return f"{hours}h {minutes}m {seconds}s"
-    elif minutes > 0:
-        return f"{minutes}m {seconds}s"
-    else:
-        return f"{seconds}s"
-
 def main():
     """
     Main function to process all papers
@@ -666,10 +683,8 @@ def main():
     # To limit papers for testing, uncomment and modify the line below:
     urls = urls[:5]  # Process only first 5 papers
     
-    # Estimate processing time
-    estimated_time = estimate_processing_time(len(urls), delay=2)
-    print(f"Estimated processing time for {len(urls)} papers: {estimated_time}")
-    print("This is a rough estimate and actual time may vary.")
+    # Throughput and ETA are measured live and printed after every paper
+    metrics = CrawlMetrics("main2", total=len(urls))
     
     # Ask for confirmation if processing many papers
     if len(urls) > 10:
@@ -682,14 +697,15 @@ def main():
     
     # Process all papers
     print(f"Processing all {len(urls)} papers...")
-    all_papers = process_multiple_papers(urls, delay=2)  # 2 second delay between requests
+    all_papers = process_multiple_papers(urls, metrics=metrics)
     
     if all_papers:
         # Save results
-        save_papers_to_json(all_papers)
-        save_papers_to_csv(all_papers)
-        save_papers_to_text(all_papers)
-        save_authors_to_csv(all_papers)
+        with metrics.stage("write"):
+            save_papers_to_json(all_papers)
+            save_papers_to_csv(all_papers)
+            save_papers_to_text(all_papers)
+            save_authors_to_csv(all_papers)
         
         # Print summary
         print_paper_summary(all_papers)
@@ -710,6 +726,10 @@ def main():
         create_summary_report(all_papers)
     else:
         print("No papers were successfully scraped.")
+    
+    # Where the time went, per stage
+    metrics.print_stage_summary()
+    metrics.save()
 
 def create_summary_report(papers):
     """
@@ -765,4 +785,6 @@ def create_summary_report(papers):
         print(f"Error creating summary report: {e}")
 
 if __name__ == "__main__":
-    main()
+    # Set PROFILE_RUN=cprofile or sampling to profile this run
+    with profile_run("main2"):
+        main()
@@ -0,0 +1,319 @@
+"""
+End-to-end load test of the crawl scripts against a local PMC stand-in.
+
+A local HTTP server serves saved PMC article pages for any path with a PMCID
+and Semantic Scholar-shaped JSON for /api/1/search, with configurable latency,
+error, 429 and redirect rates. Redirected articles move to /articles/moved/PMC…/
+on the same host. The real process_* entry points then crawl it, with requests
+to NCBI and Semantic Scholar rewritten to the local server, and the report
+shows throughput, tail latency, how failures were handled and which redirects
+the scrapers learned (kept in a temporary file, not pmc_redirects.json).
+
+    python load_test.py --scraper main2 --papers 50 --workers 4 --error-rate 0.05 --rate-limit-rate 0.1
+"""
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from benchmark_scrapers import DEFAULT_FIXTURES
+import pmc_urls
+from crawl_metrics import CrawlMetrics, Histogram
+from pmc_urls import PMCID_PATTERN
+from scraper_scripts import SCRAPING_DIR, SCRIPTS, load_script
+
+DEFAULT_CSV = os.path.join(SCRAPING_DIR, "SB_publication_PMC.csv")
+STAND_IN_HOSTS = ("www.ncbi.nlm.nih.gov", "pmc.ncbi.nlm.nih.gov", "www.semanticscholar.org")
+
+
+class StandInConfig:
+    def __init__(self, pages, latency_ms=200.0, latency_sigma=0.5, error_rate=0.0, rate_limit_rate=0.0,
+                 redirect_rate=0.0, retry_after=1, seed=0):
+        self.pages = pages
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.redirect_rate = redirect_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def draw(self):
+        """Return (latency seconds, outcome) for one request."""
+        with self.lock:
+            # Log-normal around the median; sigma 0 gives a fixed latency.
+            latency = self.latency_ms / 1000 * math.exp(self.rng.gauss(0.0, self.latency_sigma))
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            return latency, "error"
+        if roll < self.error_rate + self.rate_limit_rate:
+            return latency, "rate_limited"
+        if roll < self.error_rate + self.rate_limit_rate + self.redirect_rate:
+            return latency, "redirect"
+        return latency, "ok"
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        config = self.server.config
+        latency, outcome = config.draw()
+        time.sleep(latency)
+        parts = urlsplit(self.path)
+
+        if outcome == "error":
+            self.send_body(500, b"Internal Server Error", "text/plain")
+        elif outcome == "rate_limited":
+            self.send_body(429, b"Too Many Requests", "text/plain", {"Retry-After": str(config.retry_after)})
+        elif parts.path.startswith("/api/1/search"):
+            outcome = "ok"
+            query = parse_qs(parts.query).get("query", [""])[0]
+            self.send_body(200, json.dumps(semantic_scholar_result(query)).encode(), "application/json")
+        elif PMCID_PATTERN.search(parts.path):
+            pmcid = PMCID_PATTERN.search(parts.path).group(0).upper()
+            if outcome == "redirect" and parts.path.startswith("/pmc/"):
+                # PMC moved articles from /pmc/articles/ to /articles/ on a new host.
+                self.send_body(301, b"", "text/plain", {"Location": f"/articles/{pmcid}/"})
+            elif outcome == "redirect" and not parts.path.startswith("/articles/moved/"):
+                # A canonical article that has moved again; scrapers should learn the new path.
+                self.send_body(301, b"", "text/plain", {"Location": f"/articles/moved/{pmcid}/"})
+            else:
+                outcome = "ok"
+                page = config.pages[sum(map(ord, pmcid)) % len(config.pages)]
+                self.send_body(200, page, "text/html; charset=utf-8")
+        else:
+            outcome = "not_found"
+            self.send_body(404, b"Not Found", "text/plain")
+        config.count(outcome)
+
+    def send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def semantic_scholar_result(query):
+    seed = sum(map(ord, query))
+    return {"data": [{
+        "title": query,
+        "authors": [{"name": "Stand-In Author"}],
+        "year": 2010 + seed % 15,
+        "citationCount": seed % 300,
+        "influentialCitationCount": seed % 20,
+        "isOpenAccess": True,
+        "url": "https://www.semanticscholar.org/paper/stand-in",
+        "venue": "Stand-In Journal",
+        "abstract": "",
+        "publicationTypes": ["JournalArticle"],
+        "publicationDate": "",
+        "externalIds": {"DOI": f"10.0000/standin.{seed}"},
+        "openAccessPdf": {},
+    }]}
+
+
+def start_stand_in(config, port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class RequestRecorder:
+    """Route requests for the real hosts to the stand-in and time every call."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.latency = Histogram()
+        self.statuses = {}
+        self.exceptions = {}
+        self.lock = threading.Lock()
+        self.original = requests.Session.request
+
+    def patch(self):
+        recorder = self
+
+        def request(session, method, url, *args, **kwargs):
+            parts = urlsplit(url)
+            if parts.hostname in STAND_IN_HOSTS:
+                url = recorder.base_url + parts.path + (f"?{parts.query}" if parts.query else "")
+            start = time.perf_counter()
+            try:
+                response = recorder.original(session, method, url, *args, **kwargs)
+            except Exception as e:
+                with recorder.lock:
+                    name = type(e).__name__
+                    recorder.exceptions[name] = recorder.exceptions.get(name, 0) + 1
+                raise
+            if parts.hostname in STAND_IN_HOSTS:
+                # Show the scrapers the host they asked for, so pmc_urls.learn sees real PMC URLs.
+                response.url = response.url.replace(recorder.base_url, f"{parts.scheme}://{parts.netloc}", 1)
+            with recorder.lock:
+                recorder.latency.observe(time.perf_counter() - start)
+                recorder.statuses[response.status_code] = recorder.statuses.get(response.status_code, 0) + 1
+                for hop in response.history:
+                    recorder.statuses[hop.status_code] = recorder.statuses.get(hop.status_code, 0) + 1
+            return response
+
+        return mock.patch.object(requests.Session, "request", request)
+
+
+def read_papers(csv_path, limit):
+    papers = []
+    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            if row.get('Link', '').strip():
+                papers.append({'title': row.get('Title', '').strip(), 'url': row['Link'].strip()})
+    return papers[:limit] if limit else papers
+
+
+def crawl(scraper, module, papers, delay, metrics):
+    """Run one scraper's real process_* loop; return the number of papers it returned."""
+    if scraper == "main":
+        return len(module.process_multiple_urls(papers, delay=delay, metrics=metrics))
+    if scraper == "semantic_scholar":
+        return len(module.process_papers(papers, delay=delay, metrics=metrics))
+    # main2 and firas; periodic progress saves are pushed past the end of the run.
+    return len(module.process_multiple_papers(papers, delay=delay, save_interval=len(papers) + 1, metrics=metrics))
+
+
+def run_load_test(scraper, papers, config, workers=1, delay=0.0, quiet=True, rate_limit=False):
+    server = start_stand_in(config)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    module = load_script(scraper)
+    recorder = RequestRecorder(base_url)
+    shares = [papers[i::workers] for i in range(workers)]
+    metrics = [CrawlMetrics(f"{scraper}_load_test", total=len(share)) for share in shares]
+    returned = [0] * workers
+
+    def worker(i):
+        returned[i] = crawl(scraper, module, shares[i], delay, metrics[i])
+
+    output = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+    start = time.perf_counter()
+    # The shared per-host limiter would throttle the stand-in like the real hosts; it is opt-in here.
+    limiter = contextlib.nullcontext() if rate_limit else mock.patch.dict(os.environ, {"RATE_LIMIT": "off"})
+    with tempfile.TemporaryDirectory() as tmp:
+        redirects_file = os.path.join(tmp, "pmc_redirects.json")
+        # Learned redirects go to a scratch file; pmc_urls caches them, so start and end with an empty cache.
+        redirects = mock.patch.dict(os.environ, {"PMC_REDIRECTS_FILE": redirects_file})
+        with recorder.patch(), limiter, redirects, mock.patch.object(pmc_urls, "_redirects", None), output:
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        learned = {}
+        if os.path.exists(redirects_file):
+            with open(redirects_file, 'r', encoding='utf-8') as f:
+                learned = json.load(f)
+    server.shutdown()
+
+    stages = {}
+    for m in metrics:
+        for stage, histogram in m.stages.items():
+            stages.setdefault(stage, Histogram()).merge(histogram)
+    latency = recorder.latency
+    return {
+        "scraper": scraper,
+        "papers": len(papers),
+        "workers": workers,
+        "delay": delay,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_papers_per_second": round(len(papers) / elapsed, 3) if elapsed else 0.0,
+        "papers_returned": sum(returned),
+        "papers_failed": len(papers) - sum(returned),
+        "request_latency": latency.to_dict(),
+        "http_statuses": {str(status): count for status, count in sorted(recorder.statuses.items())},
+        "client_exceptions": recorder.exceptions,
+        "server_outcomes": config.counts,
+        "learned_redirects": learned,
+        "stages": {stage: histogram.to_dict() for stage, histogram in stages.items()},
+        "config": {"latency_ms": config.latency_ms, "latency_sigma": config.latency_sigma,
+                   "error_rate": config.error_rate, "rate_limit_rate": config.rate_limit_rate,
+                   "redirect_rate": config.redirect_rate},
+    }
+
+
+def print_report(report):
+    latency = report["request_latency"]
+    print(f"{report['scraper']}: {report['papers']} papers, {report['workers']} workers, "
+          f"{report['elapsed_seconds']:.2f}s -> {report['throughput_papers_per_second']:.2f} papers/s")
+    print(f"Papers returned: {report['papers_returned']}, lost: {report['papers_failed']}")
+    print(f"Request latency: p50 {latency['p50'] * 1000:.0f} ms, p95 {latency['p95'] * 1000:.0f} ms, "
+          f"p99 {latency['p99'] * 1000:.0f} ms, max {latency['max'] * 1000:.0f} ms over {latency['count']} requests")
+    print(f"HTTP statuses: {report['http_statuses']}")
+    if report["client_exceptions"]:
+        print(f"Client exceptions: {report['client_exceptions']}")
+    print(f"Server outcomes: {report['server_outcomes']}")
+    print(f"Redirects learned: {len(report['learned_redirects'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the crawl scripts against a local PMC stand-in server")
+    parser.add_argument("--scraper", choices=sorted(SCRIPTS), default="main2")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--papers", type=int, default=20, help="Papers to crawl (0 = all in the CSV)")
+    parser.add_argument("--workers", type=int, default=1, help="Copies of the crawl loop run in parallel")
+    parser.add_argument("--delay", type=float, default=0.0, help="Per-paper delay passed to the crawl loop")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Glob of saved PMC article pages to serve")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Median injected server latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread (0 = fixed latency)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses")
+    parser.add_argument("--redirect-rate", type=float, default=0.0, help="Fraction of article requests redirected")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the shared per-host rate limiter on")
+    parser.add_argument("--verbose", action="store_true", help="Show the scrapers' own output")
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(args.fixtures)):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    if not pages:
+        print(f"No fixture pages match {args.fixtures}")
+        return
+
+    config = StandInConfig(pages, args.latency_ms, args.latency_sigma, args.error_rate, args.rate_limit_rate,
+                           args.redirect_rate, seed=args.seed)
+    report = run_load_test(args.scraper, read_papers(args.csv, args.papers), config, args.workers, args.delay,
+                           quiet=not args.verbose, rate_limit=args.rate_limit)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
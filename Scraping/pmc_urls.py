@@ -0,0 +1,97 @@
+"""
+Canonical PMC article URLs, learned redirects and de-duplication by PMCID.
+
+SB_publication_PMC.csv links to www.ncbi.nlm.nih.gov/pmc/articles/PMCxxxx/,
+which now answers with a redirect to pmc.ncbi.nlm.nih.gov/articles/PMCxxxx/.
+The scrapers fetch ``resolve(url)`` instead, so each paper costs a single
+request, and call ``learn(url, response)`` afterwards: if PMC moves articles
+again, the new target is stored in pmc_redirects.json and later runs go
+straight there. Output rows keep the CSV URL, so files still join on it.
+"""
+import json
+import os
+import re
+from urllib.parse import urlsplit
+
+from rate_limiter import locked_state
+
+CANONICAL_URL = "https://pmc.ncbi.nlm.nih.gov/articles/{pmcid}/"
+PMC_HOSTS = ("pmc.ncbi.nlm.nih.gov", "www.ncbi.nlm.nih.gov", "ncbi.nlm.nih.gov")
+PMCID_PATTERN = re.compile(r"PMC\d+", re.IGNORECASE)
+DEFAULT_REDIRECTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pmc_redirects.json")
+
+_redirects = None
+
+
+def extract_pmcid(url):
+    """Return the upper-cased PMCID in a URL or string, or an empty string."""
+    match = PMCID_PATTERN.search(url or "")
+    return match.group(0).upper() if match else ""
+
+
+def canonical_url(url):
+    """The canonical article URL for a PMC link; anything else is returned unchanged."""
+    pmcid = extract_pmcid(url)
+    if pmcid and urlsplit(url).hostname in PMC_HOSTS:
+        return CANONICAL_URL.format(pmcid=pmcid)
+    return url
+
+
+def redirects_path():
+    return os.environ.get("PMC_REDIRECTS_FILE", DEFAULT_REDIRECTS_PATH)
+
+
+def learned_redirects():
+    global _redirects
+    if _redirects is None:
+        _redirects = {}
+        if os.path.exists(redirects_path()):
+            try:
+                with open(redirects_path(), 'r', encoding='utf-8') as f:
+                    _redirects = json.load(f)
+            except Exception as e:
+                print(f"Error loading learned redirects: {e}")
+    return _redirects
+
+
+def resolve(url):
+    """The URL to fetch for url: a learned redirect target if there is one, else the canonical form."""
+    redirects = learned_redirects()
+    canonical = canonical_url(url)
+    return redirects.get(canonical) or redirects.get(url) or canonical
+
+
+def learn(requested_url, response):
+    """Remember where requested_url ended up if it was redirected to another PMC URL for the same article."""
+    final_url = response.url.split("#")[0]
+    if final_url == requested_url or urlsplit(final_url).hostname not in PMC_HOSTS:
+        return
+    # Error and landing pages on a PMC host are not the article; never store them as its URL.
+    if not response.ok or not extract_pmcid(requested_url) or extract_pmcid(final_url) != extract_pmcid(requested_url):
+        return
+    redirects = learned_redirects()
+    redirects[requested_url] = final_url
+    try:
+        # Other crawl processes learn too; merge with what is on disk under the shared file lock.
+        with locked_state(redirects_path()) as (f, stored):
+            stored[requested_url] = final_url
+            redirects.update(stored)
+            f.seek(0)
+            f.truncate()
+            json.dump(stored, f, indent=2)
+    except Exception as e:
+        print(f"Error saving learned redirect: {e}")
+
+
+def dedup_by_pmcid(rows, key='url'):
+    """Keep the first row for each PMCID (rows without one are kept); return (rows, number dropped)."""
+    seen = set()
+    unique = []
+    for row in rows:
+        pmcid = extract_pmcid(row.get(key, ''))
+        if pmcid:
+            if pmcid in seen:
+                continue
+            seen.add(pmcid)
+        unique.append(row)
+    return unique, len(rows) - len(unique)
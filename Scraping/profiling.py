@@ -0,0 +1,161 @@
+"""
+Opt-in profiling for crawl and summary runs.
+
+Entry points run their main() inside ``profile_run(name)``. Nothing happens
+unless PROFILE_RUN is set:
+
+    PROFILE_RUN=cprofile        deterministic cProfile plus a stack sampler
+    PROFILE_RUN=sampling        stack sampler only (low overhead)
+    PROFILE_FIRST_PAPERS=N      stop profiling after N papers
+    PROFILE_INTERVAL_MS=5       sampler interval
+    PROFILE_DIR=.               where the profile files are written
+
+Each run writes <name>_<timestamp>.collapsed (folded stacks for
+flamegraph.pl / speedscope), .top.txt (hottest functions) and, for cprofile,
+.prof (pstats, for snakeviz or gprof2dot).
+"""
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+
+_active = None
+
+
+class StackSampler(threading.Thread):
+    """Sample one thread's Python stack at a fixed interval and count folded stacks."""
+
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+                self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def top_functions(self, limit=25):
+        """(function, self samples, inclusive samples) sorted by self samples."""
+        own = {}
+        inclusive = {}
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for frame in set(frames):
+                inclusive[frame] = inclusive.get(frame, 0) + count
+        ranked = sorted(own.items(), key=lambda item: -item[1])[:limit]
+        return [(frame, count, inclusive[frame]) for frame, count in ranked]
+
+
+class RunProfiler:
+    def __init__(self, name, mode="sampling", first_papers=None, output_dir=".", interval=0.005):
+        self.name = name
+        self.mode = mode
+        self.first_papers = first_papers
+        self.output_dir = output_dir
+        self.interval = interval
+        self.papers = 0
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        self.sampler = None
+        self.started = None
+        self.running = False
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler = StackSampler(threading.get_ident(), self.interval)
+        self.sampler.start()
+        if self.profile:
+            self.profile.enable()
+        self.running = True
+
+    def paper_done(self):
+        self.papers += 1
+        if self.running and self.first_papers and self.papers >= self.first_papers:
+            self.stop()
+
+    def stop(self):
+        if not self.running:
+            return
+        if self.profile:
+            self.profile.disable()
+        self.sampler.stop()
+        self.running = False
+        self.write()
+
+    def write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{self.name}_{time.strftime('%Y%m%d_%H%M%S')}")
+        elapsed = time.perf_counter() - self.started
+        with open(base + ".collapsed", 'w', encoding='utf-8') as f:
+            f.write(self.sampler.collapsed())
+
+        lines = [f"Profile of {self.name}: {elapsed:.2f}s, {self.papers} papers, mode {self.mode}", ""]
+        lines.append(f"Sampled stacks ({self.sampler.samples} samples every {self.interval * 1000:g} ms):")
+        lines.append(f"{'self %':>7s} {'total %':>7s}  function")
+        total = max(self.sampler.samples, 1)
+        for frame, own, inclusive in self.sampler.top_functions():
+            lines.append(f"{own / total:7.1%} {inclusive / total:7.1%}  {frame}")
+        if self.profile:
+            self.profile.dump_stats(base + ".prof")
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=stream)
+            stats.sort_stats("tottime").print_stats(25)
+            lines.append("")
+            lines.append("cProfile, by own time:")
+            lines.append(stream.getvalue())
+        with open(base + ".top.txt", 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"Profile saved to {base}.collapsed and {base}.top.txt"
+              + (f" and {base}.prof" if self.profile else ""))
+
+
+@contextlib.contextmanager
+def profile_run(name):
+    """Profile the enclosed run if PROFILE_RUN is set; otherwise do nothing."""
+    global _active
+    mode = os.environ.get("PROFILE_RUN", "").strip().lower()
+    if mode not in ("cprofile", "sampling"):
+        if mode:
+            print(f"Unknown PROFILE_RUN mode '{mode}', expected 'cprofile' or 'sampling'. Not profiling.")
+        yield None
+        return
+
+    first_papers = int(os.environ.get("PROFILE_FIRST_PAPERS", "0")) or None
+    interval = float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000
+    profiler = RunProfiler(name, mode, first_papers, os.environ.get("PROFILE_DIR", "."), interval)
+    _active = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active = None
+
+
+def paper_done():
+    """Tell the active profiler a paper finished, so PROFILE_FIRST_PAPERS can stop it."""
+    if _active is not None:
+        _active.paper_done()
@@ -0,0 +1,146 @@
+"""
+Host-scoped token buckets shared by every crawl, search and summary process.
+
+Before each request a script calls ``acquire(url_or_host)``. The bucket for
+that host lives in one small JSON file guarded by an exclusive file lock, so
+main.py, main2.py, firas.py, the Semantic Scholar searcher and the summarizer
+running side by side draw from the same budget and their combined rate stays
+just under each provider's limit. The buckets are the only pacing: the
+scripts' own fixed sleeps between papers only apply when the limiter is off.
+
+    RATE_LIMIT_FILE=/shared/rate_limits.json   where the buckets live
+    RATE_LIMIT=off                              disable (offline benchmarks, load tests)
+
+    python rate_limiter.py status
+"""
+import argparse
+import contextlib
+import json
+import os
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# host -> (requests per second, burst). A host also covers its subdomains.
+HOST_LIMITS = {
+    "www.ncbi.nlm.nih.gov": (1.0, 2),
+    "pmc.ncbi.nlm.nih.gov": (1.0, 2),
+    "semanticscholar.org": (0.5, 1),
+    "openrouter.ai": (5.0, 10),
+}
+DEFAULT_STATE_PATH = os.path.join(tempfile.gettempdir(), "crawl_rate_limits.json")
+
+
+def state_path():
+    return os.environ.get("RATE_LIMIT_FILE", DEFAULT_STATE_PATH)
+
+
+def enabled():
+    return os.environ.get("RATE_LIMIT", "").strip().lower() not in ("off", "0", "false", "no")
+
+
+def default_delay(seconds):
+    """Fixed pause a script should add between its own requests: none while the shared buckets pace them."""
+    return 0.0 if enabled() else seconds
+
+
+def limit_for(host):
+    """Return (bucket host, rate, burst) for host, or None when it is not limited."""
+    for limited, (rate, burst) in HOST_LIMITS.items():
+        if host == limited or host.endswith("." + limited):
+            return limited, rate, burst
+    return None
+
+
+@contextlib.contextmanager
+def locked_state(path):
+    """Open the bucket file under an exclusive lock and yield (file, state dict)."""
+    with open(path, 'a+', encoding='utf-8') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError:
+                state = {}
+            yield f, state
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def take_token(host, rate, burst, path=None):
+    """Refill host's bucket and take one token if available; return the seconds until one is."""
+    with locked_state(path or state_path()) as (f, state):
+        now = time.time()
+        bucket = state.get(host, {"tokens": burst, "updated": now})
+        tokens = min(burst, bucket["tokens"] + (now - bucket["updated"]) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        state[host] = {"tokens": tokens, "updated": now}
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(state))
+        f.flush()
+    return wait
+
+
+def acquire(url_or_host, metrics=None):
+    """Block until the shared bucket for this URL's host allows one more request; return seconds waited."""
+    if not enabled():
+        return 0.0
+    host = urlsplit(url_or_host).hostname if "://" in url_or_host else url_or_host
+    limit = limit_for(host or "")
+    if limit is None:
+        return 0.0
+    bucket, rate, burst = limit
+    waited = 0.0
+    while True:
+        wait = take_token(bucket, rate, burst)
+        if wait <= 0:
+            break
+        time.sleep(wait)
+        waited += wait
+    if metrics is not None:
+        metrics.observe("rate_limit", waited)
+    return waited
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or reset the shared per-host request buckets")
+    parser.add_argument("command", choices=["status", "reset"])
+    args = parser.parse_args()
+
+    path = state_path()
+    if args.command == "reset":
+        if os.path.exists(path):
+            os.remove(path)
+        print(f"Removed {path}")
+        return
+    with locked_state(path) as (_, state):
+        now = time.time()
+        print(f"Buckets in {path}:")
+        for host, (rate, burst) in HOST_LIMITS.items():
+            bucket = state.get(host)
+            tokens = burst if bucket is None else min(burst, bucket["tokens"] + (now - bucket["updated"]) * rate)
+            print(f"  {host:24s} {rate:g}/s burst {burst}: {tokens:.2f} tokens available")
+
+
+if __name__ == "__main__":
+    main()
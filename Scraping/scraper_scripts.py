@@ -0,0 +1,27 @@
+"""
+Registry of the scraper scripts and a loader for them.
+
+The scripts live in folders whose names contain spaces, so they cannot be
+imported as packages; the benchmark, load test, work queue and pipeline all
+load them by path through here.
+"""
+import importlib.util
+import os
+
+SCRAPING_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = {
+    "main": os.path.join(SCRAPING_DIR, "first part", "main.py"),
+    "main2": os.path.join(SCRAPING_DIR, "first part", "main2.py"),
+    "firas": os.path.join(SCRAPING_DIR, "second part", "firas.py"),
+    "semantic_scholar": os.path.join(SCRAPING_DIR, "second part", "main.py"),
+}
+# The scripts that parse PMC article pages (everything but the Semantic Scholar search).
+PMC_SCRIPTS = ("main", "main2", "firas")
+
+
+def load_script(name):
+    """Import the scraper script registered under name; every call returns a fresh module."""
+    spec = importlib.util.spec_from_file_location(f"scraper_{name}", SCRIPTS[name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
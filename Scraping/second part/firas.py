@@ -6,6 +6,13 @@ import re
 import time
 from urllib.parse import urljoin
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_metrics import CrawlMetrics, record_response
+from profiling import profile_run
+from pmc_urls import dedup_by_pmcid, learn, resolve
+from rate_limiter import acquire, default_delay
 
 def extract_authors_and_editors(soup):
     """
@@ -205,10 +212,11 @@ def extract_reference_title(ref_text):
     except Exception as e:
         return ref_text[:100].strip()
 
-def scrape_pmc_paper_content(url, title=""):
+def scrape_pmc_paper_content(url, title="", metrics=None):
     """
     Scrape a PMC paper and extract only title, URL, and references
     """
+    metrics = metrics or CrawlMetrics("firas")
     try:
         # Set headers to mimic a real browser
         headers = {
@@ -216,33 +224,16 @@ def scrape_pmc_paper_content(url, title=""):
         }
         
         # Make request to the PMC paper
-        response = requests.get(url, headers=headers)
+        # Fetch the canonical URL directly instead of following PMC's redirect
+        fetch_url = resolve(url)
+        acquire(fetch_url, metrics)  # shared with every other crawl process
+        fetch_start = time.perf_counter()
+        response = requests.get(fetch_url, headers=headers)
         response.raise_for_status()
+        record_response(metrics, response, time.perf_counter() - fetch_start)
+        learn(fetch_url, response)
         
-        # Parse HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract main title
-        main_title = ""
-        title_element = soup.find('h1') or soup.find('title')
-        if title_element:
-            main_title = title_element.get_text().strip()
-        
-        # If no title found, use the provided title
-        if not main_title and title:
-            main_title = title
-        
-        # Extract references
-        references = extract_references(soup)
-        
-        # Simple structure with only required data
-        paper_data = {
-            'title': main_title,
-            'url': url,
-            'references': references  # Now just an array of reference titles
-        }
-        
-        return paper_data
+        return parse_pmc_references(response.content, url, title, metrics)
         
     except requests.RequestException as e:
         print(f"Error fetching the page {url}: {e}")
@@ -252,6 +243,39 @@ def scrape_pmc_paper_content(url, title=""):
         return None
 
 
+def parse_pmc_references(content, url, title="", metrics=None):
+    """
+    Extract the title and reference list from a fetched PMC page
+    """
+    metrics = metrics or CrawlMetrics("firas")
+    # Parse HTML content
+    with metrics.stage("parse"):
+        soup = BeautifulSoup(content, 'html.parser')
+    
+    # Extract main title
+    main_title = ""
+    title_element = soup.find('h1') or soup.find('title')
+    if title_element:
+        main_title = title_element.get_text().strip()
+    
+    # If no title found, use the provided title
+    if not main_title and title:
+        main_title = title
+    
+    # Extract references
+    with metrics.stage("extract_references"):
+        references = extract_references(soup)
+    
+    # Simple structure with only required data
+    paper_data = {
+        'title': main_title,
+        'url': url,
+        'references': references  # Now just an array of reference titles
+    }
+    
+    return paper_data
+
+
 def read_urls_from_csv(csv_file):
     """
     Read URLs from the SB_publication_PMC.csv file
@@ -280,7 +304,8 @@ def read_urls_from_csv(csv_file):
                 elif i <= 5:  # Show first 5 rows for debugging
                     print(f"Row {i}: {row}")
         
-        print(f"Loaded {len(urls)} URLs from {csv_file}")
+        urls, duplicates = dedup_by_pmcid(urls)
+        print(f"Loaded {len(urls)} URLs from {csv_file} ({duplicates} duplicate PMCIDs skipped)")
         if len(urls) > 0:
             print(f"First URL example: {urls[0]['url']}")
         return urls
@@ -289,10 +314,14 @@ def read_urls_from_csv(csv_file):
         print(f"File path attempted: {os.path.abspath(csv_file)}")
         return []
 
-def process_multiple_papers(urls, delay=2, save_interval=10):
+def process_multiple_papers(urls, delay=None, save_interval=10, metrics=None):
     """
     Process multiple papers and collect all results with periodic saving
     """
+    if delay is None:
+        # The shared per-host bucket paces requests; only sleep when it is switched off.
+        delay = default_delay(2)
+    metrics = metrics or CrawlMetrics("firas", total=len(urls))
     all_papers = []
     successful_count = 0
     failed_count = 0
@@ -309,11 +338,12 @@ def process_multiple_papers(urls, delay=2, save_interval=10):
         
         try:
             # Scrape the paper
-            paper_data = scrape_pmc_paper_content(url_data['url'], url_data['title'])
+            paper_data = scrape_pmc_paper_content(url_data['url'], url_data['title'], metrics)
             
             if paper_data and paper_data.get('title'):
                 all_papers.append(paper_data)
                 successful_count += 1
+                metrics.paper_done(ok=True)
                 print(f"[OK] Title: {paper_data['title'][:60]}...")
                 
                 # Show references if found
@@ -332,22 +362,27 @@ def process_multiple_papers(urls, delay=2, save_interval=10):
             else:
                 failed_count += 1
                 failed_urls.append(url_data)
+                metrics.paper_done(ok=False)
                 print("[FAIL] No paper data found")
                 
         except Exception as e:
             failed_count += 1
             failed_urls.append(url_data)
+            metrics.paper_done(ok=False)
             print(f"[ERROR] {e}")
         
+        print(f"  {metrics.progress()}")
+        
         # Save progress periodically
         if i % save_interval == 0 and all_papers:
             print(f"\n[SAVE] Saving progress... ({len(all_papers)} papers processed so far)")
-            save_papers_to_json(all_papers, f"scraped_papers_progress_{i}.json")
-            save_authors_to_csv(all_papers, f"authors_progress_{i}.csv")
+            with metrics.stage("write"):
+                save_papers_to_json(all_papers, f"scraped_papers_progress_{i}.json")
         
         # Add delay to be respectful to the server
-        if i < len(urls):  # Don't delay after the last URL
-            time.sleep(delay)
+        if delay and i < len(urls):  # Don't delay after the last URL
+            with metrics.stage("sleep"):
+                time.sleep(delay)
     
     # Save failed URLs for retry
     if failed_urls:
@@ -468,25 +503,6 @@ def print_paper_summary(papers):
             print(f"     ... and {len(references) - 3} more references")
 
 
-def estimate_processing_time(num_papers, delay=2):
-    """
-    Estimate processing time for the given number of papers
-    """
-    # Rough estimate: 3-5 seconds per paper (including delay + processing)
-    time_per_paper = delay + 2  # delay + processing time
-    total_seconds = num_papers * time_per_paper
-    
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
-    
-    if hours > 0:
-        return f"{hours}h {minutes}m {seconds}s"
-    elif minutes > 0:
-        return f"{minutes}m {seconds}s"
-    else:
-        return f"{seconds}s"
-
 def main():
     """
     Main function to process all papers
@@ -529,10 +545,8 @@ def main():
     urls = urls[:5]
     print(f"Processing first {len(urls)} papers for testing...")
     
-    # Estimate processing time
-    estimated_time = estimate_processing_time(len(urls), delay=2)
-    print(f"Estimated processing time for {len(urls)} papers: {estimated_time}")
-    print("This is a rough estimate and actual time may vary.")
+    # Throughput and ETA are measured live and printed after every paper
+    metrics = CrawlMetrics("firas", total=len(urls))
     
     # Ask for confirmation if processing many papers
     if len(urls) > 10:
@@ -545,13 +559,14 @@ def main():
     
     # Process all papers
     print(f"Processing all {len(urls)} papers...")
-    all_papers = process_multiple_papers(urls, delay=2)  # 2 second delay between requests
+    all_papers = process_multiple_papers(urls, metrics=metrics)
     
     if all_papers:
         # Save results
-        save_papers_to_json(all_papers)
-        save_papers_to_csv(all_papers)
-        save_papers_to_text(all_papers)
+        with metrics.stage("write"):
+            save_papers_to_json(all_papers)
+            save_papers_to_csv(all_papers)
+            save_papers_to_text(all_papers)
         
         # Print summary
         print_paper_summary(all_papers)
@@ -570,6 +585,10 @@ def main():
         create_summary_report(all_papers)
     else:
         print("No papers were successfully scraped.")
+    
+    # Where the time went, per stage
+    metrics.print_stage_summary()
+    metrics.save()
 
 def create_summary_report(papers):
     """
@@ -615,4 +634,6 @@ def create_summary_report(papers):
         print(f"Error creating summary report: {e}")
 
 if __name__ == "__main__":
-    main()
+    # Set PROFILE_RUN=cprofile or sampling to profile this run
+    with profile_run("firas"):
+        main()
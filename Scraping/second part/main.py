@@ -3,11 +3,20 @@ import csv
 import json
 import time
 import re
+import os
+import sys
 from urllib.parse import quote
 from bs4 import BeautifulSoup
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawl_metrics import CrawlMetrics, record_response
+from profiling import profile_run
+from pmc_urls import dedup_by_pmcid
+from rate_limiter import acquire, default_delay
+
 class SemanticScholarSearcher:
-    def __init__(self):
+    def __init__(self, metrics=None):
+        self.metrics = metrics or CrawlMetrics("semantic_scholar")
         self.base_url = "https://www.semanticscholar.org/api/1/search"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -18,9 +27,11 @@ class SemanticScholarSearcher:
         self.session = requests.Session()
         self.session.headers.update(self.headers)
     
-    def search_paper(self, title, max_retries=3):
+    def search_paper(self, title, max_retries=3, raise_errors=False):
         """
-        Search for a paper on Semantic Scholar using its title
+        Search for a paper on Semantic Scholar using its title.
+        Returns None when nothing matches; errors that outlast the retries
+        also return None unless raise_errors is set.
         """
         for attempt in range(max_retries):
             try:
@@ -40,14 +51,19 @@ class SemanticScholarSearcher:
                 print(f"Searching for: {clean_title[:80]}...")
                 
                 # Make the API request
+                acquire(self.base_url, self.metrics)
+                fetch_start = time.perf_counter()
                 response = self.session.get(self.base_url, params=params, timeout=30)
                 response.raise_for_status()
+                record_response(self.metrics, response, time.perf_counter() - fetch_start)
                 
-                data = response.json()
+                with self.metrics.stage("parse"):
+                    data = response.json()
                 
                 if 'data' in data and data['data']:
                     # Find the best match
-                    best_match = self.find_best_match(data['data'], title)
+                    with self.metrics.stage("match"):
+                        best_match = self.find_best_match(data['data'], title)
                     if best_match:
                         return self.extract_citation_info(best_match)
                 
@@ -56,16 +72,23 @@ class SemanticScholarSearcher:
                 
             except requests.exceptions.RequestException as e:
                 print(f"Request error (attempt {attempt + 1}): {e}")
+                self.metrics.add("request_errors")
                 if attempt < max_retries - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
+                    self.metrics.add("retries")
+                    with self.metrics.stage("backoff"):
+                        time.sleep(2 ** attempt)  # Exponential backoff
                 else:
                     print(f"Failed to search for: {title[:60]}...")
+                    if raise_errors:
+                        raise
                     return None
             except Exception as e:
                 print(f"Unexpected error (attempt {attempt + 1}): {e}")
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)
                 else:
+                    if raise_errors:
+                        raise
                     return None
         
         return None
@@ -206,7 +229,8 @@ def read_csv_file(csv_file_path):
                         'title': row[title_key].strip(),
                         'url': row['Link'].strip()
                     })
-        print(f"Loaded {len(papers)} papers from {csv_file_path}")
+        papers, duplicates = dedup_by_pmcid(papers)
+        print(f"Loaded {len(papers)} papers from {csv_file_path} ({duplicates} duplicate PMCIDs skipped)")
         return papers
     except Exception as e:
         print(f"Error reading CSV file: {e}")
@@ -262,11 +286,39 @@ def save_results_to_json(results, filename="semantic_scholar_citations.json"):
     except Exception as e:
         print(f"Error saving to JSON: {e}")
 
-def process_papers(papers, delay=2):
+def citation_result(paper, citation_info):
+    """
+    Combine a CSV paper row with the citation info found for it
+    """
+    return {
+        'original_title': paper['title'],
+        'original_url': paper['url'],
+        'semantic_title': citation_info.get('title', ''),
+        'authors': citation_info.get('authors', ''),
+        'year': citation_info.get('year', ''),
+        'venue': citation_info.get('venue', ''),
+        'citation_count': citation_info.get('citation_count', 0),
+        'influential_citation_count': citation_info.get('influential_citation_count', 0),
+        'is_open_access': citation_info.get('is_open_access', False),
+        'semantic_url': citation_info.get('url', ''),
+        'abstract': citation_info.get('abstract', ''),
+        'publication_types': citation_info.get('publication_types', []),
+        'publication_date': citation_info.get('publication_date', ''),
+        'doi': citation_info.get('external_ids', {}).get('DOI', ''),
+        'pmid': citation_info.get('external_ids', {}).get('PubMed', ''),
+        'pmcid': citation_info.get('external_ids', {}).get('PubMedCentral', ''),
+        'open_access_pdf_url': citation_info.get('open_access_pdf', {}).get('url', '')
+    }
+
+def process_papers(papers, delay=None, metrics=None):
     """
     Process all papers and search for citations
     """
-    searcher = SemanticScholarSearcher()
+    if delay is None:
+        # The shared per-host bucket paces requests; only sleep when it is switched off.
+        delay = default_delay(2)
+    metrics = metrics or CrawlMetrics("semantic_scholar", total=len(papers))
+    searcher = SemanticScholarSearcher(metrics)
     results = []
     successful_searches = 0
     failed_searches = 0
@@ -283,28 +335,11 @@ def process_papers(papers, delay=2):
             
             if citation_info:
                 # Combine original paper info with citation info
-                result = {
-                    'original_title': paper['title'],
-                    'original_url': paper['url'],
-                    'semantic_title': citation_info.get('title', ''),
-                    'authors': citation_info.get('authors', ''),
-                    'year': citation_info.get('year', ''),
-                    'venue': citation_info.get('venue', ''),
-                    'citation_count': citation_info.get('citation_count', 0),
-                    'influential_citation_count': citation_info.get('influential_citation_count', 0),
-                    'is_open_access': citation_info.get('is_open_access', False),
-                    'semantic_url': citation_info.get('url', ''),
-                    'abstract': citation_info.get('abstract', ''),
-                    'publication_types': citation_info.get('publication_types', []),
-                    'publication_date': citation_info.get('publication_date', ''),
-                    'doi': citation_info.get('external_ids', {}).get('DOI', ''),
-                    'pmid': citation_info.get('external_ids', {}).get('PubMed', ''),
-                    'pmcid': citation_info.get('external_ids', {}).get('PubMedCentral', ''),
-                    'open_access_pdf_url': citation_info.get('open_access_pdf', {}).get('url', '')
-                }
+                result = citation_result(paper, citation_info)
                 
                 results.append(result)
                 successful_searches += 1
+                metrics.paper_done(ok=True)
                 
                 print(f"[SUCCESS] Found citation data:")
                 print(f"  Title: {citation_info.get('title', 'N/A')[:60]}...")
@@ -314,15 +349,20 @@ def process_papers(papers, delay=2):
                 print(f"  Venue: {citation_info.get('venue', 'N/A')[:40]}...")
             else:
                 failed_searches += 1
+                metrics.paper_done(ok=False)
                 print(f"[FAILED] No citation data found")
                 
         except Exception as e:
             failed_searches += 1
+            metrics.paper_done(ok=False)
             print(f"[ERROR] {e}")
         
+        print(f"  {metrics.progress()}")
+        
         # Add delay to be respectful to the API
-        if i < len(papers):
-            time.sleep(delay)
+        if delay and i < len(papers):
+            with metrics.stage("sleep"):
+                time.sleep(delay)
     
     print(f"\n" + "=" * 80)
     print(f"Processing complete!")
@@ -344,12 +384,14 @@ def main():
         return
     
     # Process all papers
-    results = process_papers(papers, delay=2)  # 2 second delay between requests
+    metrics = CrawlMetrics("semantic_scholar", total=len(papers))
+    results = process_papers(papers, metrics=metrics)
     
     if results:
         # Save results
-        save_results_to_csv(results)
-        save_results_to_json(results)
+        with metrics.stage("write"):
+            save_results_to_csv(results)
+            save_results_to_json(results)
         
         # Print summary
         total_citations = sum(result.get('citation_count', 0) for result in results)
@@ -365,6 +407,12 @@ def main():
         print(f"Results saved to: semantic_scholar_citations.csv and semantic_scholar_citations.json")
     else:
         print("No citation data was found for any of the papers.")
+    
+    # Where the time went, per stage
+    metrics.print_stage_summary()
+    metrics.save()
 
 if __name__ == "__main__":
-    main()
+    # Set PROFILE_RUN=cprofile or sampling to profile this run
+    with profile_run("semantic_scholar"):
+        main()
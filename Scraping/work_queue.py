@@ -0,0 +1,466 @@
+"""
+Lease-based work queue so a crawl can be spread over many worker processes.
+
+Papers are enqueued once per scraper. Workers claim one paper at a time with
+a time-limited lease, renew it with heartbeats while they scrape, and report
+the result. A lease that runs out (worker crashed, machine lost) is reclaimed
+by the next claim. Requests are paced by the scrapers' shared per-host token
+buckets (rate_limiter.py). With the limiter off, or for workers on machines
+that do not share its state file, --interval makes each task first reserve a
+slot for its host in the queue itself, spacing tasks across all workers.
+`export` writes the finished results with the scraper's own save functions,
+giving the same output files as a single-process run.
+
+The queue lives in an SQLite file (one file shared by local processes) or is
+reached over HTTP (`serve` exposes an SQLite queue to other machines; it is
+the local stand-in for a hosted queue service, and SQLite locking over
+network filesystems is not reliable enough to share the file directly).
+
+    python work_queue.py enqueue --scraper main2
+    python work_queue.py work --scraper main2 --processes 4
+    export WORK_QUEUE_TOKEN=<shared secret>                 # on the queue host and every worker
+    python work_queue.py serve --host 0.0.0.0 --port 8765   # on the queue host
+    python work_queue.py work --scraper main2 --queue http://queue-host:8765
+    python work_queue.py export --scraper main2
+"""
+import argparse
+import contextlib
+import csv
+import hmac
+import io
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+from crawl_metrics import CrawlMetrics
+from pmc_urls import extract_pmcid
+from rate_limiter import default_delay
+from scraper_scripts import SCRAPING_DIR, SCRIPTS, load_script
+
+DEFAULT_QUEUE = "crawl_queue.db"
+DEFAULT_CSV = os.path.join(SCRAPING_DIR, "SB_publication_PMC.csv")
+SEMANTIC_SCHOLAR_HOST = "www.semanticscholar.org"
+# Shared secret between `serve` and its workers; required when serving beyond localhost.
+TOKEN_ENV = "WORK_QUEUE_TOKEN"
+TOKEN_HEADER = "X-Queue-Token"
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    queue TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (queue, state, seq);
+CREATE TABLE IF NOT EXISTS host_slots (
+    host TEXT PRIMARY KEY,
+    next_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteQueue:
+    """Queue in an SQLite file; safe to share between threads and processes on one machine.
+
+    HTTPQueue offers the same methods. Tasks are dicts with id, payload and attempts.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE):
+        self.path = path
+        self.local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def transaction(self):
+        """BEGIN IMMEDIATE takes the write lock up front, so read-then-update steps cannot interleave."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def enqueue(self, queue, items):
+        """Add {"id", ...} payloads not already queued; return how many were added."""
+        conn = self.transaction()
+        try:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM tasks WHERE queue = ?", (queue,)).fetchone()[0]
+            added = 0
+            for item in items:
+                seq += 1
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO tasks (id, queue, seq, payload, updated) VALUES (?, ?, ?, ?, ?)",
+                    (f"{queue}:{item['id']}", queue, seq, json.dumps(item, ensure_ascii=False), time.time()))
+                added += cursor.rowcount
+            conn.execute("COMMIT")
+            return added
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim(self, queue, worker, lease_seconds, max_attempts=3):
+        now = time.time()
+        conn = self.transaction()
+        try:
+            # A task whose lease ran out max_attempts times keeps killing its workers; stop handing it out.
+            conn.execute("UPDATE tasks SET state = 'failed', error = 'lease expired', updated = ? "
+                         "WHERE queue = ? AND state = 'leased' AND lease_until < ? AND attempts >= ?",
+                         (now, queue, now, max_attempts))
+            row = conn.execute("SELECT id, payload, attempts FROM tasks WHERE queue = ? AND "
+                               "(state = 'pending' OR (state = 'leased' AND lease_until < ?)) "
+                               "ORDER BY seq LIMIT 1", (queue, now)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE tasks SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                         "updated = ? WHERE id = ?", (worker, now + lease_seconds, now, row[0]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return {"id": row[0], "payload": json.loads(row[1]), "attempts": row[2] + 1}
+
+    def heartbeat(self, task_id, worker, lease_seconds):
+        """Extend a lease; False if the worker no longer holds it."""
+        cursor = self.connection().execute(
+            "UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+            (time.time() + lease_seconds, task_id, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, task_id, worker, result):
+        cursor = self.connection().execute(
+            "UPDATE tasks SET state = 'done', result = ?, error = NULL, lease_until = NULL, updated = ? "
+            "WHERE id = ? AND worker = ? AND state = 'leased'",
+            (json.dumps(result, ensure_ascii=False), time.time(), task_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker, error, max_attempts=3):
+        cursor = self.connection().execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, lease_until = NULL, updated = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+            (max_attempts, error, time.time(), task_id, worker))
+        return cursor.rowcount == 1
+
+    def reserve_slot(self, host, interval):
+        """Book the next request slot for host; return the seconds to wait for it."""
+        now = time.time()
+        conn = self.transaction()
+        try:
+            row = conn.execute("SELECT next_at FROM host_slots WHERE host = ?", (host,)).fetchone()
+            start = max(now, row[0] if row else 0.0)
+            conn.execute("INSERT OR REPLACE INTO host_slots (host, next_at) VALUES (?, ?)", (host, start + interval))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return start - now
+
+    def stats(self, queue):
+        rows = self.connection().execute("SELECT state, COUNT(*) FROM tasks WHERE queue = ? GROUP BY state", (queue,))
+        return dict(rows.fetchall())
+
+    def results(self, queue):
+        rows = self.connection().execute(
+            "SELECT result FROM tasks WHERE queue = ? AND state = 'done' ORDER BY seq", (queue,))
+        return [json.loads(result) for (result,) in rows]
+
+
+class HTTPQueue:
+    """Client for a queue served by `work_queue.py serve` (or a service with the same API)."""
+
+    def __init__(self, base_url, token=None):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        token = token or os.environ.get(TOKEN_ENV)
+        if token:
+            self.session.headers[TOKEN_HEADER] = token
+
+    def call(self, method, **kwargs):
+        response = self.session.post(f"{self.base_url}/{method}", json=kwargs, timeout=60)
+        response.raise_for_status()
+        return response.json()["result"]
+
+    def enqueue(self, queue, items):
+        return self.call("enqueue", queue=queue, items=items)
+
+    def claim(self, queue, worker, lease_seconds, max_attempts=3):
+        return self.call("claim", queue=queue, worker=worker, lease_seconds=lease_seconds, max_attempts=max_attempts)
+
+    def heartbeat(self, task_id, worker, lease_seconds):
+        return self.call("heartbeat", task_id=task_id, worker=worker, lease_seconds=lease_seconds)
+
+    def complete(self, task_id, worker, result):
+        return self.call("complete", task_id=task_id, worker=worker, result=result)
+
+    def fail(self, task_id, worker, error, max_attempts=3):
+        return self.call("fail", task_id=task_id, worker=worker, error=error, max_attempts=max_attempts)
+
+    def reserve_slot(self, host, interval):
+        return self.call("reserve_slot", host=host, interval=interval)
+
+    def stats(self, queue):
+        return self.call("stats", queue=queue)
+
+    def results(self, queue):
+        return self.call("results", queue=queue)
+
+
+QUEUE_METHODS = {"enqueue", "claim", "heartbeat", "complete", "fail", "reserve_slot", "stats", "results"}
+
+
+class QueueHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        token = self.server.token
+        if token and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), token):
+            self.send_json(401, {"error": "missing or wrong queue token"})
+            return
+        method = self.path.strip("/")
+        if method not in QUEUE_METHODS:
+            self.send_json(404, {"error": f"unknown method {method}"})
+            return
+        try:
+            kwargs = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            self.send_json(200, {"result": getattr(self.server.backend, method)(**kwargs)})
+        except Exception as e:
+            self.send_json(500, {"error": str(e)})
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_queue(backend, host="127.0.0.1", port=8765, token=None):
+    """Serve backend over HTTP. Binding beyond localhost requires a token, since clients can write results."""
+    token = token or os.environ.get(TOKEN_ENV)
+    if host not in LOOPBACK_HOSTS and not token:
+        raise SystemExit(f"Set {TOKEN_ENV} to a shared secret before serving the queue on {host}")
+    server = ThreadingHTTPServer((host, port), QueueHandler)
+    server.daemon_threads = True
+    server.backend = backend
+    server.token = token
+    print(f"Serving queue on http://{host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+def open_queue(spec):
+    """An HTTPQueue for http(s) URLs, otherwise an SQLiteQueue on that path."""
+    if spec.startswith(("http://", "https://")):
+        return HTTPQueue(spec)
+    return SQLiteQueue(spec)
+
+
+class LeaseKeeper(threading.Thread):
+    """Renew a task's lease in the background while it is being worked on."""
+
+    def __init__(self, backend, task_id, worker, lease_seconds):
+        super().__init__(daemon=True)
+        self.backend = backend
+        self.task_id = task_id
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                if not self.backend.heartbeat(self.task_id, self.worker, self.lease_seconds):
+                    self.lost = True
+                    return
+            except Exception as e:
+                print(f"Heartbeat failed for {self.task_id}: {e}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.join()
+
+
+def read_papers(csv_path):
+    """{"id", "title", "url"} per CSV row, with the PMCID as id."""
+    papers = []
+    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            url = row.get('Link', '').strip()
+            if url:
+                papers.append({"id": extract_pmcid(url) or url,
+                               "title": row.get('Title', '').strip(), "url": url})
+    return papers
+
+
+def task_host(scraper, payload):
+    return SEMANTIC_SCHOLAR_HOST if scraper == "semantic_scholar" else urlsplit(payload["url"]).hostname
+
+
+def run_task(scraper, module, payload, metrics):
+    """Scrape one paper the way the scraper's own process loop does; None means it failed."""
+    if scraper == "main":
+        data = module.scrape_pmc_paper_on_this_page(payload["url"], metrics)
+        if not data or not data['on_this_page_items']:
+            return None
+        if payload["title"]:
+            data['original_title'] = payload["title"]
+        return data
+    if scraper == "semantic_scholar":
+        citation_info = module.SemanticScholarSearcher(metrics).search_paper(payload["title"])
+        return module.citation_result(payload, citation_info) if citation_info else None
+    paper = module.scrape_pmc_paper_content(payload["url"], payload["title"], metrics)
+    if scraper == "main2":
+        return paper if paper and paper['sections'] else None
+    return paper if paper and paper.get('title') else None
+
+
+def run_worker(queue_spec, scraper, worker=None, lease_seconds=120.0, interval=None, max_attempts=3,
+               poll_seconds=5.0, quiet=True):
+    """Claim and scrape papers until the queue has nothing left to hand out.
+
+    interval spaces tasks to one host across all workers; by default it is 0
+    while the shared rate limiter paces each request, and 1 s when it is off.
+    """
+    if interval is None:
+        interval = default_delay(1.0)
+    backend = open_queue(queue_spec)
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    module = load_script(scraper)
+    metrics = CrawlMetrics(f"{scraper}_worker")
+    while True:
+        task = backend.claim(scraper, worker, lease_seconds, max_attempts)
+        if task is None:
+            # Others may still hold leases that could expire and come back to us.
+            if backend.stats(scraper).get("leased"):
+                with metrics.stage("idle"):
+                    time.sleep(poll_seconds)
+                continue
+            break
+
+        payload = task["payload"]
+        if interval:
+            with metrics.stage("politeness"):
+                time.sleep(backend.reserve_slot(task_host(scraper, payload), interval))
+        error = None
+        with LeaseKeeper(backend, task["id"], worker, lease_seconds) as keeper:
+            try:
+                with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+                    result = run_task(scraper, module, payload, metrics)
+                if result is None:
+                    error = "no result"
+            except Exception as e:
+                result, error = None, str(e)
+        if keeper.lost:
+            metrics.add("leases_lost")
+            print(f"[{worker}] lost the lease on {task['id']}; another worker has it")
+        elif error:
+            backend.fail(task["id"], worker, error, max_attempts)
+            metrics.paper_done(ok=False)
+            print(f"[{worker}] {payload['id']} failed (attempt {task['attempts']}): {error}")
+        else:
+            backend.complete(task["id"], worker, result)
+            metrics.paper_done(ok=True)
+            print(f"[{worker}] {payload['id']} done | {metrics.progress()}")
+
+    print(f"[{worker}] queue drained")
+    metrics.print_stage_summary()
+    metrics.save(f"crawl_metrics_{worker.replace(':', '_')}")
+
+
+def export_results(backend, scraper):
+    """Write the finished results with the scraper's own save functions (same files as a normal run)."""
+    results = backend.results(scraper)
+    if not results:
+        print("No finished results to export.")
+        return
+    module = load_script(scraper)
+    if scraper == "main":
+        module.save_all_results_to_csv(results)
+        module.save_all_results_to_json(results)
+    elif scraper == "main2":
+        module.save_papers_to_json(results)
+        module.save_papers_to_csv(results)
+        module.save_papers_to_text(results)
+        module.save_authors_to_csv(results)
+    elif scraper == "firas":
+        module.save_papers_to_json(results)
+        module.save_papers_to_csv(results)
+        module.save_papers_to_text(results)
+    else:
+        module.save_results_to_csv(results)
+        module.save_results_to_json(results)
+    print(f"Exported {len(results)} results")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spread a crawl over worker processes through a leased work queue")
+    parser.add_argument("command", choices=["enqueue", "work", "status", "export", "serve"])
+    parser.add_argument("--queue", default=DEFAULT_QUEUE, help="SQLite file or http:// URL of a queue server")
+    parser.add_argument("--scraper", choices=sorted(SCRIPTS), default="main2")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--limit", type=int, help="Enqueue only the first N papers")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes to start on this machine")
+    parser.add_argument("--lease", type=float, default=120.0, help="Lease length in seconds")
+    parser.add_argument("--interval", type=float,
+                        help="Minimum seconds between tasks for one host, across all workers "
+                             "(default: 0 while RATE_LIMIT is on, else 1)")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--host", default="127.0.0.1",
+                        help=f"Interface to serve on; anything but localhost needs {TOKEN_ENV}")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--verbose", action="store_true", help="Show the scrapers' own output")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve_queue(SQLiteQueue(args.queue), args.host, args.port)
+        return
+    backend = open_queue(args.queue)
+    if args.command == "enqueue":
+        papers = read_papers(args.csv)[:args.limit] if args.limit else read_papers(args.csv)
+        added = backend.enqueue(args.scraper, papers)
+        print(f"Enqueued {added} new papers for {args.scraper} ({len(papers) - added} already queued)")
+    elif args.command == "work":
+        worker_args = (args.queue, args.scraper, None, args.lease, args.interval, args.max_attempts, 5.0,
+                       not args.verbose)
+        if args.processes <= 1:
+            run_worker(*worker_args)
+        else:
+            processes = [multiprocessing.Process(target=run_worker, args=worker_args) for _ in range(args.processes)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+    elif args.command == "export":
+        export_results(backend, args.scraper)
+    print(f"{args.scraper}: " + ", ".join(f"{state} {n}" for state, n in sorted(backend.stats(args.scraper).items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from vector_index import DEFAULT_INDEX_DIR as DEFAULT_VECTOR_INDEX_DIR
+from vector_index import top_k_rows
+
+DEFAULT_EMBEDDINGS_PATH = os.path.join(DEFAULT_VECTOR_INDEX_DIR, "embeddings.npy")
+DEFAULT_INDEX_DIR = os.path.join("Backend", "Data", "ann_index")
+
+
+def kmeans_plus_plus(vectors, n_clusters, rng):
+    """Pick initial centroids among unit vectors with k-means++ cosine seeding."""
+    n = len(vectors)
+    centroids = np.empty((n_clusters, vectors.shape[1]), dtype=np.float32)
+    centroids[0] = vectors[rng.integers(n)]
+    closest = 1.0 - vectors @ centroids[0]
+    for c in range(1, n_clusters):
+        weights = np.maximum(closest, 0.0)
+        total = weights.sum()
+        pick = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids[c] = vectors[pick]
+        closest = np.minimum(closest, 1.0 - vectors @ centroids[c])
+    return centroids
+
+
+def spherical_kmeans(vectors, n_clusters, n_iter=20, seed=0):
+    """Cluster unit vectors by cosine similarity and return unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    # k-means++ seeding keeps the lists balanced enough for IVF probing.
+    centroids = kmeans_plus_plus(vectors, n_clusters, rng)
+
+    for _ in range(n_iter):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms == 0
+        if empty.any():
+            # Reseed empty clusters from random points instead of dropping them.
+            sums[empty] = vectors[rng.integers(n, size=int(empty.sum()))]
+            norms[empty] = np.linalg.norm(sums[empty], axis=1)
+        new_centroids = (sums / norms[:, None]).astype(np.float32)
+        if np.allclose(new_centroids, centroids, atol=1e-5):
+            centroids = new_centroids
+            break
+        centroids = new_centroids
+    return centroids
+
+
+def build_ivf_index(embeddings, index_dir=DEFAULT_INDEX_DIR, n_lists=None, train_size=50000,
+                    dtype="float16", seed=0):
+    """Partition chunk embeddings into k-means inverted lists and persist them to index_dir."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    n = len(embeddings)
+    if n == 0:
+        print("No embeddings to index.")
+        return None
+    if n_lists is None:
+        n_lists = max(1, int(4 * np.sqrt(n)))
+    n_lists = min(n_lists, n)
+
+    rng = np.random.default_rng(seed)
+    sample = embeddings if n <= train_size else embeddings[rng.choice(n, train_size, replace=False)]
+    centroids = spherical_kmeans(sample, n_lists, seed=seed)
+
+    assignment = np.argmax(embeddings @ centroids.T, axis=1)
+    order = np.argsort(assignment, kind='stable')
+    list_ptr = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignment, minlength=n_lists), out=list_ptr[1:])
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "centroids.npy"), centroids)
+    np.save(os.path.join(index_dir, "list_ptr.npy"), list_ptr)
+    np.save(os.path.join(index_dir, "list_ids.npy"), order.astype(np.int32))
+    # Vectors are stored list by list so a probe reads one contiguous slice.
+    np.save(os.path.join(index_dir, "list_vectors.npy"), embeddings[order].astype(dtype))
+
+    sizes = np.diff(list_ptr)
+    meta = {
+        "num_vectors": n,
+        "dimensions": int(embeddings.shape[1]),
+        "num_lists": n_lists,
+        "dtype": dtype,
+        "largest_list": int(sizes.max()),
+        "empty_lists": int((sizes == 0).sum()),
+    }
+    with open(os.path.join(index_dir, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"Built IVF index: {n} vectors in {n_lists} lists "
+          f"(largest {meta['largest_list']}, empty {meta['empty_lists']}) at {index_dir}")
+    return meta
+
+
+class IVFIndex:
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, nprobe=8):
+        with open(os.path.join(index_dir, "meta.json"), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.centroids = np.load(os.path.join(index_dir, "centroids.npy"))
+        self.list_ptr = np.load(os.path.join(index_dir, "list_ptr.npy"))
+        self.list_ids = np.load(os.path.join(index_dir, "list_ids.npy"), mmap_mode='r')
+        self.list_vectors = np.load(os.path.join(index_dir, "list_vectors.npy"), mmap_mode='r')
+        self.nprobe = nprobe
+
+    def search(self, vector, k=10, nprobe=None):
+        """Return (chunk ids, scores) of the approximate top-k for one unit query vector."""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        vector = np.asarray(vector, dtype=np.float32)
+        centroid_scores = self.centroids @ vector
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        candidate_ids = []
+        candidate_scores = []
+        for list_no in probes:
+            start, end = self.list_ptr[list_no], self.list_ptr[list_no + 1]
+            if start == end:
+                continue
+            candidate_ids.append(self.list_ids[start:end])
+            candidate_scores.append(self.list_vectors[start:end].astype(np.float32) @ vector)
+        if not candidate_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        top, top_scores = top_k_rows(scores[None, :], k)
+        return ids[top[0]], top_scores[0]
+
+    def search_batch(self, vectors, k=10, nprobe=None):
+        """Run search() for every row of vectors."""
+        return [self.search(vector, k, nprobe) for vector in vectors]
+
+
+def evaluate_recall(index, embeddings, k=10, nprobe_values=(1, 2, 4, 8, 16, 32), n_queries=200,
+                    seed=0):
+    """Compare IVF results against exact search and report recall@k and latency per nprobe.
+
+    Queries are sampled from the indexed vectors, so each query's own row is
+    excluded from both result lists; it would always be found in the probed
+    home cluster and inflate recall.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(embeddings), min(n_queries, len(embeddings)), replace=False)
+    queries = embeddings[query_rows]
+
+    start = time.perf_counter()
+    exact_scores = queries @ embeddings.T
+    exact_scores[np.arange(len(queries)), query_rows] = -np.inf
+    exact_ids, _ = top_k_rows(exact_scores, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    report = {
+        "k": k,
+        "num_queries": len(queries),
+        "num_vectors": len(embeddings),
+        "exact_ms_per_query": exact_ms,
+        "settings": [],
+    }
+    for nprobe in nprobe_values:
+        if nprobe > len(index.centroids):
+            break
+        hits = 0
+        latencies = []
+        for query, row, truth in zip(queries, query_rows, exact_ids):
+            start = time.perf_counter()
+            ids, _ = index.search(query, k + 1, nprobe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            ids = ids[ids != row][:k]
+            hits += len(np.intersect1d(ids, truth, assume_unique=True))
+        latencies = np.asarray(latencies)
+        report["settings"].append({
+            "nprobe": nprobe,
+            "recall_at_k": hits / (len(queries) * k),
+            "mean_ms": float(latencies.mean()),
+            "p95_ms": float(np.percentile(latencies, 95)),
+        })
+    return report
+
+
+def print_recall_report(report):
+    """Print the recall/latency trade-off table from evaluate_recall()."""
+    print(f"recall@{report['k']} over {report['num_queries']} queries, {report['num_vectors']} vectors")
+    print(f"exact search: {report['exact_ms_per_query']:.3f} ms/query (batched)")
+    print(f"{'nprobe':>7} {'recall':>8} {'mean ms':>9} {'p95 ms':>9}")
+    for row in report["settings"]:
+        print(f"{row['nprobe']:>7} {row['recall_at_k']:>8.3f} {row['mean_ms']:>9.3f} {row['p95_ms']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or evaluate an IVF index over chunk embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the index from an embedding matrix")
+    build_parser.add_argument("--embeddings", default=DEFAULT_EMBEDDINGS_PATH)
+    build_parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    build_parser.add_argument("--lists", type=int, default=None, help="Number of k-means lists (default 4*sqrt(n))")
+    build_parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+
+    eval_parser = subparsers.add_parser("evaluate", help="Report recall@k and latency against exact search")
+    eval_parser.add_argument("--embeddings", default=DEFAULT_EMBEDDINGS_PATH)
+    eval_parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    eval_parser.add_argument("-k", type=int, default=10)
+    eval_parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    eval_parser.add_argument("--queries", type=int, default=200)
+    eval_parser.add_argument("--report", default=None, help="Optional path to write the report as JSON")
+
+    args = parser.parse_args()
+    embeddings = np.load(args.embeddings, mmap_mode='r')
+
+    if args.command == "build":
+        start = time.perf_counter()
+        build_ivf_index(embeddings, args.index_dir, n_lists=args.lists, dtype=args.dtype)
+        print(f"Build took {time.perf_counter() - start:.2f}s")
+    else:
+        index = IVFIndex(args.index_dir)
+        report = evaluate_recall(index, embeddings, args.k, args.nprobe, args.queries)
+        print_recall_report(report)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"Report saved to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import json
+import math
+import os
+import re
+import time
+from array import array
+
+import numpy as np
+
+from chunk_reader import iter_chunks
+
+DEFAULT_CHUNKS_PATH = os.path.join("Backend", "Data", "rag_chunks.json")
+DEFAULT_INDEX_DIR = os.path.join("Backend", "Data", "bm25_index")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each et few for from further
+had has have having he her here hers him his how however i if in into is it its itself just me
+more most my no nor not now of off on once only or other our ours out over own same she should
+so some such than that the their theirs them then there these they this those through to too
+under until up us very was we were what when where which while who whom why will with would you
+your yours al fig figure table
+""".split())
+
+
+def tokenize(text):
+    """Lowercase text and split it into index terms, dropping stopwords."""
+    return [tok for tok in TOKEN_PATTERN.findall(text.lower())
+            if len(tok) > 1 and tok not in STOPWORDS]
+
+
+class ChunkMetadata:
+    """Dictionary-encoded paper and section labels for each chunk id."""
+
+    def __init__(self):
+        self.papers = []
+        self.sections = []
+        self.chunk_paper = array('i')
+        self.chunk_section = array('i')
+        self._paper_ids = {}
+        self._section_ids = {}
+
+    def add(self, chunk):
+        """Record the paper and section of the next chunk id."""
+        paper_key = (chunk.get("paper_title", ""), chunk.get("url", ""))
+        paper_id = self._paper_ids.get(paper_key)
+        if paper_id is None:
+            paper_id = self._paper_ids[paper_key] = len(self.papers)
+            self.papers.append(list(paper_key))
+        section = chunk.get("section", "")
+        section_id = self._section_ids.get(section)
+        if section_id is None:
+            section_id = self._section_ids[section] = len(self.sections)
+            self.sections.append(section)
+        self.chunk_paper.append(paper_id)
+        self.chunk_section.append(section_id)
+
+    def save(self, index_dir):
+        """Write the encoded metadata next to an index."""
+        np.save(os.path.join(index_dir, "chunk_paper.npy"), np.asarray(self.chunk_paper, dtype=np.int32))
+        np.save(os.path.join(index_dir, "chunk_section.npy"), np.asarray(self.chunk_section, dtype=np.int32))
+        with open(os.path.join(index_dir, "papers.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.papers, f, ensure_ascii=False)
+        with open(os.path.join(index_dir, "sections.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.sections, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, index_dir):
+        """Open metadata written by save(), memory-mapping the per-chunk arrays."""
+        metadata = cls()
+        with open(os.path.join(index_dir, "papers.json"), 'r', encoding='utf-8') as f:
+            metadata.papers = json.load(f)
+        with open(os.path.join(index_dir, "sections.json"), 'r', encoding='utf-8') as f:
+            metadata.sections = json.load(f)
+        metadata.chunk_paper = np.load(os.path.join(index_dir, "chunk_paper.npy"), mmap_mode='r')
+        metadata.chunk_section = np.load(os.path.join(index_dir, "chunk_section.npy"), mmap_mode='r')
+        return metadata
+
+    def describe(self, chunk_id):
+        """Return the paper title, url and section of a chunk."""
+        title, url = self.papers[self.chunk_paper[chunk_id]]
+        return {
+            "paper_title": title,
+            "url": url,
+            "section": self.sections[self.chunk_section[chunk_id]],
+        }
+
+
+def build_bm25_index(chunks, index_dir=DEFAULT_INDEX_DIR, k1=1.2, b=0.75):
+    """Tokenize every chunk of an iterable (e.g. iter_chunks) and write an array-backed inverted index to index_dir."""
+    postings = {}  # term -> (array of chunk ids, array of term frequencies)
+    doc_lengths = array('I')
+    metadata = ChunkMetadata()
+
+    for chunk_id, chunk in enumerate(chunks):
+        tokens = tokenize(chunk.get("text", ""))
+        doc_lengths.append(len(tokens))
+        metadata.add(chunk)
+
+        counts = {}
+        for tok in tokens:
+            counts[tok] = counts.get(tok, 0) + 1
+        for tok, tf in counts.items():
+            entry = postings.get(tok)
+            if entry is None:
+                entry = postings[tok] = (array('I'), array('H'))
+            entry[0].append(chunk_id)
+            entry[1].append(min(tf, 65535))
+
+    num_docs = len(doc_lengths)
+    if num_docs == 0:
+        print("No chunks to index.")
+        return None
+
+    os.makedirs(index_dir, exist_ok=True)
+
+    # Lay postings out term by term in one contiguous array; the vocabulary
+    # stores each term's [offset, document frequency] slice.
+    vocab = {}
+    total = sum(len(ids) for ids, _ in postings.values())
+    all_ids = np.empty(total, dtype=np.uint32)
+    all_tfs = np.empty(total, dtype=np.uint16)
+    offset = 0
+    for term in sorted(postings):
+        ids, tfs = postings[term]
+        df = len(ids)
+        all_ids[offset:offset + df] = np.frombuffer(ids, dtype=np.uint32)
+        all_tfs[offset:offset + df] = np.frombuffer(tfs, dtype=np.uint16)
+        vocab[term] = [offset, df]
+        offset += df
+
+    lengths = np.frombuffer(doc_lengths, dtype=np.uint32).astype(np.float32)
+    avgdl = float(lengths.mean()) or 1.0
+    # Per-chunk length normalisation is query independent, so precompute it.
+    doc_norm = (k1 * (1.0 - b + b * lengths / avgdl)).astype(np.float32)
+
+    np.save(os.path.join(index_dir, "postings.npy"), all_ids)
+    np.save(os.path.join(index_dir, "tfs.npy"), all_tfs)
+    np.save(os.path.join(index_dir, "doc_norm.npy"), doc_norm)
+    metadata.save(index_dir)
+
+    with open(os.path.join(index_dir, "vocab.json"), 'w', encoding='utf-8') as f:
+        json.dump(vocab, f, ensure_ascii=False, separators=(",", ":"))
+
+    meta = {
+        "num_chunks": num_docs,
+        "num_terms": len(vocab),
+        "num_postings": int(total),
+        "avgdl": avgdl,
+        "k1": k1,
+        "b": b,
+    }
+    with open(os.path.join(index_dir, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"Indexed {num_docs} chunks, {len(vocab)} terms, {total} postings into {index_dir}")
+    return meta
+
+
+class BM25Index:
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        with open(os.path.join(index_dir, "meta.json"), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, "vocab.json"), 'r', encoding='utf-8') as f:
+            self.vocab = json.load(f)
+        self.metadata = ChunkMetadata.load(index_dir)
+
+        # Postings are memory-mapped so opening the index costs nothing
+        # beyond the vocabulary, whatever the corpus size.
+        self.postings = np.load(os.path.join(index_dir, "postings.npy"), mmap_mode='r')
+        self.tfs = np.load(os.path.join(index_dir, "tfs.npy"), mmap_mode='r')
+        self.doc_norm = np.load(os.path.join(index_dir, "doc_norm.npy"), mmap_mode='r')
+
+        self.num_chunks = self.meta["num_chunks"]
+        self.k1 = self.meta["k1"]
+
+    def idf(self, df):
+        """BM25 inverse document frequency for a term seen in df chunks."""
+        return math.log(1.0 + (self.num_chunks - df + 0.5) / (df + 0.5))
+
+    def score(self, query):
+        """Return (chunk ids, scores) for every chunk matching at least one query term."""
+        scores = None
+        for term in set(tokenize(query)):
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            ids = self.postings[offset:offset + df]
+            tf = self.tfs[offset:offset + df].astype(np.float32)
+            contrib = self.idf(df) * tf * (self.k1 + 1.0) / (tf + self.doc_norm[ids])
+            if scores is None:
+                scores = np.zeros(self.num_chunks, dtype=np.float32)
+            # Chunk ids are unique within one posting list, so fancy-index
+            # accumulation is safe here.
+            scores[ids] += contrib
+        if scores is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        matched = np.flatnonzero(scores)
+        return matched, scores[matched]
+
+    def search(self, query, k=10):
+        """Return the top-k chunks for query, best first, with paper and section metadata."""
+        ids, scores = self.score(query)
+        if len(ids) == 0:
+            return []
+        if len(ids) > k:
+            top = np.argpartition(-scores, k)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+
+        results = []
+        for i in order:
+            chunk_id = int(ids[i])
+            hit = {"chunk_id": chunk_id, "score": float(scores[i])}
+            hit.update(self.metadata.describe(chunk_id))
+            results.append(hit)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the BM25 index over RAG chunks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the index from a chunk file")
+    build_parser.add_argument("--chunks", default=DEFAULT_CHUNKS_PATH)
+    build_parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+
+    query_parser = subparsers.add_parser("query", help="Query an existing index")
+    query_parser.add_argument("query")
+    query_parser.add_argument("-k", type=int, default=10)
+    query_parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        build_bm25_index(iter_chunks(args.chunks), args.index_dir)
+        print(f"Build took {time.perf_counter() - start:.2f}s")
+    else:
+        index = BM25Index(args.index_dir)
+        start = time.perf_counter()
+        results = index.search(args.query, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for rank, hit in enumerate(results, 1):
+            print(f"{rank:2d}. [{hit['score']:.3f}] {hit['paper_title'][:70]} :: {hit['section'][:40]}")
+        print(f"{len(results)} results in {elapsed_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import json
+import re
+
+READ_SIZE = 1 << 20
+
+_STRUCTURAL = re.compile(rb'[\[\]{}"]')
+_STRING_END = re.compile(rb'["\\]')
+
+
+def decode_record(raw):
+    """Decode one record's bytes as UTF-8 JSON, falling back to latin1."""
+    try:
+        return json.loads(raw.decode('utf-8'))
+    except UnicodeDecodeError:
+        return json.loads(raw.decode('latin1'))
+
+
+def iter_array_records(f, read_size=READ_SIZE):
+    """Yield (start, end, raw bytes) for each object element of a top-level JSON array.
+
+    Only the element currently being scanned is buffered, so memory stays
+    bounded by the largest single record rather than the file size.
+    """
+    buffer = b""
+    base = 0          # file offset of buffer[0]
+    pos = 0           # scan position inside buffer
+    depth = 0
+    in_string = False
+    element_start = None
+    started = False
+
+    while True:
+        if pos >= len(buffer):
+            data = f.read(read_size)
+            if not data:
+                return
+            # Keep the bytes of the element being scanned, drop the rest.
+            keep_from = element_start - base if element_start is not None else len(buffer)
+            base += keep_from
+            buffer = buffer[keep_from:] + data
+            pos -= keep_from
+
+        if in_string:
+            match = _STRING_END.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                continue
+            if match.group() == b"\\":
+                if match.end() >= len(buffer):
+                    # Escape split across reads; rescan it once more data arrives.
+                    pos = match.start()
+                    more = f.read(read_size)
+                    if not more:
+                        return
+                    buffer += more
+                    continue
+                pos = match.end() + 1
+                continue
+            in_string = False
+            pos = match.end()
+            continue
+
+        match = _STRUCTURAL.search(buffer, pos)
+        if match is None:
+            pos = len(buffer)
+            continue
+        char = match.group()
+        pos = match.end()
+        if char == b'"':
+            in_string = True
+        elif char in (b"{", b"["):
+            if not started:
+                started = True
+            elif depth == 1 and element_start is None:
+                element_start = base + match.start()
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 1 and element_start is not None:
+                end = base + match.end()
+                yield element_start, end, buffer[element_start - base:match.end()]
+                element_start = None
+            elif depth == 0:
+                return
+
+
+def iter_ndjson_records(f):
+    """Yield (start, end, raw bytes) for each non-blank line of an NDJSON file."""
+    offset = 0
+    for line in f:
+        start = offset
+        offset += len(line)
+        stripped = line.strip()
+        if stripped:
+            # Report the span of the JSON text itself, without the newline.
+            lead = len(line) - len(line.lstrip())
+            yield start + lead, start + lead + len(stripped), stripped
+
+
+def detect_format(f):
+    """Return 'array' or 'ndjson' from the first non-whitespace byte, leaving f at offset 0."""
+    head = b""
+    while True:
+        block = f.read(4096)
+        if not block:
+            break
+        head = block.lstrip()
+        if head:
+            break
+    f.seek(0)
+    if head.startswith(b"\xef\xbb\xbf"):
+        head = head[3:].lstrip()
+    return "array" if head.startswith(b"[") else "ndjson"
+
+
+def iter_records(f):
+    """Yield (start, end, raw bytes) for every record of a JSON-array or NDJSON binary file."""
+    if detect_format(f) == "array":
+        return iter_array_records(f)
+    return iter_ndjson_records(f)
+
+
+def iter_chunks(file_path):
+    """Stream chunk dicts from a rag_chunks.json style array or an NDJSON file."""
+    with open(file_path, 'rb') as f:
+        for _, _, raw in iter_records(f):
+            yield decode_record(raw)
+
+
+def convert_to_ndjson(input_path, output_path):
+    """Rewrite a chunk file as NDJSON, one record per line, in constant memory."""
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        for chunk in iter_chunks(input_path):
+            out.write(json.dumps(chunk, ensure_ascii=False))
+            out.write("\n")
+            count += 1
+    print(f"Wrote {count} records to {output_path}")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream records from a JSON-array or NDJSON chunk file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    count_parser = subparsers.add_parser("count", help="Count records and papers without loading the file")
+    count_parser.add_argument("path")
+
+    convert_parser = subparsers.add_parser("to-ndjson", help="Convert a chunk file to NDJSON")
+    convert_parser.add_argument("path")
+    convert_parser.add_argument("output")
+
+    args = parser.parse_args()
+
+    if args.command == "count":
+        records = 0
+        titles = set()
+        for chunk in iter_chunks(args.path):
+            records += 1
+            titles.add(chunk.get("paper_title", ""))
+        print(f"{records} records from {len(titles)} papers")
+    else:
+        convert_to_ndjson(args.path, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import time
+
+import numpy as np
+
+from bm25_index import tokenize
+from title_index import extract_pmcid, normalize_title
+
+DEFAULT_CORPUS_CSV = os.path.join("Backend", "Data", "SB_publication_PMC.csv")
+DEFAULT_REFERENCES_PATH = os.path.join("Scraping", "second part", "papers_with_references.json")
+DEFAULT_GRAPH_DIR = os.path.join("Backend", "Data", "citation_graph")
+
+DOI_PATTERN = re.compile(r"\b(10\.\d{4,9}/[^\s\]\[,;]+)", re.IGNORECASE)
+PMID_PATTERN = re.compile(r"(?:PMID[:\s]*|pubmed/)(\d{5,9})", re.IGNORECASE)
+# "12. Smith AB, Jones C, et al. (2013) " in front of the reference title.
+REFERENCE_PREFIX = re.compile(r"^\s*\d+\.\s*.*?\(\d{4}[a-z]?\)\s*")
+# firas.py keeps the first 100 characters of each reference.
+TRUNCATED_LENGTH = 100
+
+
+def normalize_doi(doi):
+    """Lowercase a DOI and strip trailing punctuation picked up from running text."""
+    return doi.lower().rstrip(".)")
+
+
+class CorpusResolver:
+    """Match free-text references to corpus papers by identifiers or title tokens."""
+
+    def __init__(self, papers, min_score=0.8, min_shared=4):
+        self.papers = papers
+        self.min_score = min_score
+        self.min_shared = min_shared
+        self.by_pmcid = {}
+        self.by_doi = {}
+        self.by_pmid = {}
+        self.by_title = {}
+        self.postings = {}
+        self.title_tokens = []
+
+        for paper_id, paper in enumerate(papers):
+            if paper.get("pmcid"):
+                self.by_pmcid.setdefault(paper["pmcid"], paper_id)
+            if paper.get("doi"):
+                self.by_doi.setdefault(normalize_doi(paper["doi"]), paper_id)
+            if paper.get("pmid"):
+                self.by_pmid.setdefault(str(paper["pmid"]), paper_id)
+            self.by_title.setdefault(normalize_title(paper["title"]), paper_id)
+            tokens = set(tokenize(paper["title"]))
+            self.title_tokens.append(tokens)
+            for token in tokens:
+                self.postings.setdefault(token, []).append(paper_id)
+
+        n = max(len(papers), 1)
+        self.idf = {token: math.log(1.0 + n / len(ids)) for token, ids in self.postings.items()}
+
+    def resolve_ids(self, text):
+        """Return the corpus paper id for a DOI, PMID or PMCID mentioned in text, or None."""
+        for doi in DOI_PATTERN.findall(text):
+            paper_id = self.by_doi.get(normalize_doi(doi))
+            if paper_id is not None:
+                return paper_id
+        for pmid in PMID_PATTERN.findall(text):
+            paper_id = self.by_pmid.get(pmid)
+            if paper_id is not None:
+                return paper_id
+        pmcid = extract_pmcid(text)
+        return self.by_pmcid.get(pmcid) if pmcid else None
+
+    def resolve(self, reference):
+        """Return (paper id, method) for a reference string, or (None, None)."""
+        paper_id = self.resolve_ids(reference)
+        if paper_id is not None:
+            return paper_id, "id"
+
+        fragment = REFERENCE_PREFIX.sub("", reference)
+        paper_id = self.by_title.get(normalize_title(fragment))
+        if paper_id is not None:
+            return paper_id, "title"
+
+        tokens = tokenize(fragment)
+        if len(reference) >= TRUNCATED_LENGTH and tokens:
+            tokens = tokens[:-1]  # the last word may be cut mid-way
+        tokens = [token for token in dict.fromkeys(tokens) if token in self.idf]
+        if len(tokens) < self.min_shared:
+            return None, None
+
+        # Candidates come from the rarest tokens' posting lists only.
+        rare = sorted(tokens, key=lambda token: -self.idf[token])[:3]
+        candidates = set()
+        for token in rare:
+            candidates.update(self.postings[token])
+
+        total = sum(self.idf[token] for token in tokens)
+        best_id, best_score = None, 0.0
+        for candidate in candidates:
+            shared = [token for token in tokens if token in self.title_tokens[candidate]]
+            if len(shared) < self.min_shared:
+                continue
+            score = sum(self.idf[token] for token in shared) / total
+            if score > best_score:
+                best_id, best_score = candidate, score
+        if best_score >= self.min_score:
+            return best_id, "fuzzy"
+        return None, None
+
+
+def read_corpus(csv_file, ids_csv=None):
+    """Read corpus papers (title, url, PMCID) and optionally DOIs/PMIDs from semantic_scholar_citations.csv."""
+    papers = []
+    seen = {}
+    try:
+        with open(csv_file, 'r', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                url = row.get('Link', '').strip()
+                title = row.get('Title', '').strip()
+                pmcid = extract_pmcid(url)
+                key = pmcid or normalize_title(title)
+                if not key or key in seen:
+                    continue
+                seen[key] = len(papers)
+                papers.append({"title": title, "url": url, "pmcid": pmcid, "doi": "", "pmid": ""})
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        return []
+
+    if ids_csv and os.path.exists(ids_csv):
+        with open(ids_csv, 'r', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                paper_id = seen.get(extract_pmcid(row.get('original_url', '')))
+                if paper_id is not None:
+                    papers[paper_id]["doi"] = row.get('doi', '')
+                    papers[paper_id]["pmid"] = row.get('pmid', '')
+    return papers
+
+
+def build_citation_graph(papers, citing_papers, resolver=None):
+    """Resolve every reference and return (indptr, indices, resolution stats)."""
+    resolver = resolver or CorpusResolver(papers)
+    src = []
+    dst = []
+    stats = {"references": 0, "id": 0, "title": 0, "fuzzy": 0, "unresolved": 0, "self_citations": 0,
+             "unknown_citing": 0}
+
+    for citing in citing_papers:
+        citing_id = resolver.resolve_ids(citing.get('url', ''))
+        if citing_id is None:
+            citing_id = resolver.by_title.get(normalize_title(citing.get('title', '')))
+        if citing_id is None:
+            stats["unknown_citing"] += 1
+            continue
+        for reference in citing.get('references', []):
+            stats["references"] += 1
+            cited_id, method = resolver.resolve(reference)
+            if cited_id is None:
+                stats["unresolved"] += 1
+                continue
+            if cited_id == citing_id:
+                # Resolved, but a paper citing itself adds no edge.
+                stats["self_citations"] += 1
+                continue
+            stats[method] += 1
+            src.append(citing_id)
+            dst.append(cited_id)
+
+    n = len(papers)
+    if src:
+        edges = np.unique(np.asarray(src, dtype=np.int64) * n + np.asarray(dst, dtype=np.int64))
+        src_arr, dst_arr = edges // n, edges % n
+    else:
+        src_arr = dst_arr = np.empty(0, dtype=np.int64)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src_arr, minlength=n), out=indptr[1:])
+    return indptr, dst_arr.astype(np.int32), stats
+
+
+def pagerank(indptr, indices, damping=0.85, tol=1e-10, max_iter=100):
+    """PageRank over a CSR adjacency (row = citing paper) using only array operations."""
+    n = len(indptr) - 1
+    if n == 0:
+        return np.empty(0)
+    out_degree = np.diff(indptr)
+    src = np.repeat(np.arange(n), out_degree)
+    dangling = out_degree == 0
+    inv_out = np.zeros(n)
+    inv_out[~dangling] = 1.0 / out_degree[~dangling]
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        flow = np.bincount(indices, weights=(rank * inv_out)[src], minlength=n)
+        new_rank = (1.0 - damping) / n + damping * (flow + rank[dangling].sum() / n)
+        if np.abs(new_rank - rank).sum() < tol:
+            return new_rank
+        rank = new_rank
+    return rank
+
+
+def save_citation_graph(graph_dir, papers, indptr, indices, stats):
+    """Write CSR arrays, node list and degree/PageRank metrics to graph_dir."""
+    os.makedirs(graph_dir, exist_ok=True)
+    out_degree = np.diff(indptr)
+    in_degree = np.bincount(indices, minlength=len(papers))
+    ranks = pagerank(indptr, indices)
+
+    np.save(os.path.join(graph_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(graph_dir, "indices.npy"), indices)
+    np.save(os.path.join(graph_dir, "pagerank.npy"), ranks)
+    np.save(os.path.join(graph_dir, "in_degree.npy"), in_degree)
+    np.save(os.path.join(graph_dir, "out_degree.npy"), out_degree)
+    with open(os.path.join(graph_dir, "papers.json"), 'w', encoding='utf-8') as f:
+        json.dump(papers, f, ensure_ascii=False)
+
+    top = np.argsort(-ranks, kind='stable')[:20]
+    summary = {
+        "papers": len(papers),
+        "edges": int(len(indices)),
+        "resolution": stats,
+        "top_pagerank": [
+            {"title": papers[i]["title"], "pmcid": papers[i]["pmcid"], "pagerank": float(ranks[i]),
+             "in_degree": int(in_degree[i]), "out_degree": int(out_degree[i])}
+            for i in top
+        ],
+    }
+    with open(os.path.join(graph_dir, "summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary
+
+
+def load_citation_graph(graph_dir=DEFAULT_GRAPH_DIR):
+    """Return (papers, indptr, indices) of a saved graph, with arrays memory-mapped."""
+    with open(os.path.join(graph_dir, "papers.json"), 'r', encoding='utf-8') as f:
+        papers = json.load(f)
+    indptr = np.load(os.path.join(graph_dir, "indptr.npy"), mmap_mode='r')
+    indices = np.load(os.path.join(graph_dir, "indices.npy"), mmap_mode='r')
+    return papers, indptr, indices
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve scraped references to corpus papers and build a CSR citation graph")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_CSV)
+    parser.add_argument("--references", default=DEFAULT_REFERENCES_PATH)
+    parser.add_argument("--ids", default=os.path.join("Scraping", "second part", "semantic_scholar_citations.csv"),
+                        help="Optional semantic_scholar_citations.csv providing DOIs/PMIDs for corpus papers")
+    parser.add_argument("--graph-dir", default=DEFAULT_GRAPH_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    papers = read_corpus(args.corpus, args.ids)
+    try:
+        with open(args.references, 'r', encoding='utf-8') as f:
+            citing_papers = json.load(f)
+    except Exception as e:
+        print(f"Error loading references from {args.references}: {e}")
+        return
+
+    indptr, indices, stats = build_citation_graph(papers, citing_papers)
+    summary = save_citation_graph(args.graph_dir, papers, indptr, indices, stats)
+
+    print(f"Citation graph: {summary['papers']} papers, {summary['edges']} corpus-internal citations")
+    print(f"References: {stats['references']} "
+          f"(by id {stats['id']}, exact title {stats['title']}, fuzzy {stats['fuzzy']}, self {stats['self_citations']}, "
+          f"unresolved {stats['unresolved']})")
+    print("Top papers by PageRank:")
+    for entry in summary["top_pagerank"][:5]:
+        print(f"  {entry['pagerank']:.5f} in={entry['in_degree']} {entry['title'][:70]}")
+    print(f"Saved to {args.graph_dir} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
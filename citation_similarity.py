@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from scipy import sparse
+
+from citation_graph import (DEFAULT_CORPUS_CSV, DEFAULT_REFERENCES_PATH, DOI_PATTERN, REFERENCE_PREFIX,
+                            CorpusResolver, normalize_doi, read_corpus)
+from title_index import extract_pmcid, normalize_title
+
+DEFAULT_OUTPUT_DIR = os.path.join("Backend", "Data", "related_papers")
+KINDS = ("coupling", "cocitation")
+
+# References are cut at 100 characters after author lists of varying length,
+# so only the first few title words are a stable key for the cited work.
+REFERENCE_KEY_WORDS = 8
+
+
+def reference_key(reference, resolver):
+    """Return a key identifying the cited work: corpus id, DOI, or leading title words."""
+    paper_id, _ = resolver.resolve(reference)
+    if paper_id is not None:
+        return f"paper:{paper_id}"
+    dois = DOI_PATTERN.findall(reference)
+    if dois:
+        return f"doi:{normalize_doi(dois[0])}"
+    words = normalize_title(REFERENCE_PREFIX.sub("", reference)).split()
+    if len(words) < 3:
+        return None  # journal names and other fragments are not a reference
+    return "text:" + " ".join(words[:REFERENCE_KEY_WORDS])
+
+
+def build_incidence(papers, citing_papers, resolver):
+    """Return the paper x reference matrix and the corpus paper x corpus paper citation matrix."""
+    reference_ids = {}
+    rows, cols = [], []
+    cite_rows, cite_cols = [], []
+    for citing in citing_papers:
+        citing_id = resolver.resolve_ids(citing.get('url', ''))
+        if citing_id is None:
+            citing_id = resolver.by_title.get(normalize_title(citing.get('title', '')))
+        if citing_id is None:
+            continue
+        for reference in citing.get('references', []):
+            key = reference_key(reference, resolver)
+            if key is None:
+                continue
+            rows.append(citing_id)
+            cols.append(reference_ids.setdefault(key, len(reference_ids)))
+            if key.startswith("paper:"):
+                cite_rows.append(citing_id)
+                cite_cols.append(int(key[6:]))
+
+    n = len(papers)
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                  shape=(n, len(reference_ids)))
+    citations = sparse.csr_matrix((np.ones(len(cite_rows), dtype=np.float32), (cite_rows, cite_cols)),
+                                  shape=(n, n))
+    # Repeated references inside one paper count once.
+    incidence.data[:] = 1.0
+    citations.data[:] = 1.0
+    return incidence, citations
+
+
+def cosine_overlap(matrix):
+    """Return M M^T with Salton cosine normalization and an empty diagonal."""
+    counts = np.asarray(matrix.sum(axis=1)).ravel()
+    product = (matrix @ matrix.T).tocoo()
+    keep = product.row != product.col
+    rows, cols, shared = product.row[keep], product.col[keep], product.data[keep]
+    scores = shared / np.sqrt(counts[rows] * counts[cols])
+    return rows, cols, scores, shared
+
+
+def top_k_csr(n, rows, cols, scores, shared, k):
+    """Keep the k best neighbours of every row and return them as CSR arrays."""
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores, shared = rows[order], cols[order], scores[order], shared[order]
+    first = np.searchsorted(rows, rows)
+    keep = (np.arange(len(rows)) - first) < k
+    rows, cols, scores, shared = rows[keep], cols[keep], scores[keep], shared[keep]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols.astype(np.int32), scores.astype(np.float32), shared.astype(np.int32)
+
+
+def build_related_papers(papers, citing_papers, output_dir=DEFAULT_OUTPUT_DIR, k=20):
+    """Compute bibliographic coupling and co-citation neighbours and persist them per kind."""
+    resolver = CorpusResolver(papers)
+    incidence, citations = build_incidence(papers, citing_papers, resolver)
+    n = len(papers)
+
+    os.makedirs(output_dir, exist_ok=True)
+    summary = {"papers": n, "references": incidence.shape[1], "k": k}
+    # Coupling: papers citing the same works (rows of the incidence matrix).
+    # Co-citation: papers cited together (columns of the corpus citation matrix).
+    for kind, matrix in (("coupling", incidence), ("cocitation", citations.T.tocsr())):
+        indptr, neighbours, scores, shared = top_k_csr(n, *cosine_overlap(matrix), k)
+        np.save(os.path.join(output_dir, f"{kind}_indptr.npy"), indptr)
+        np.save(os.path.join(output_dir, f"{kind}_neighbours.npy"), neighbours)
+        np.save(os.path.join(output_dir, f"{kind}_scores.npy"), scores)
+        np.save(os.path.join(output_dir, f"{kind}_shared.npy"), shared)
+        summary[kind] = {"pairs": int(len(neighbours)), "papers_with_neighbours": int((np.diff(indptr) > 0).sum())}
+
+    with open(os.path.join(output_dir, "papers.json"), 'w', encoding='utf-8') as f:
+        json.dump(papers, f, ensure_ascii=False)
+    with open(os.path.join(output_dir, "summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+class RelatedPapers:
+    """Constant-time related-paper lookups over precomputed neighbour lists."""
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR):
+        with open(os.path.join(output_dir, "papers.json"), 'r', encoding='utf-8') as f:
+            self.papers = json.load(f)
+        self.ids = {}
+        for paper_id, paper in enumerate(self.papers):
+            if paper.get("pmcid"):
+                self.ids.setdefault(paper["pmcid"], paper_id)
+            self.ids.setdefault(normalize_title(paper["title"]), paper_id)
+        self.arrays = {
+            kind: tuple(np.load(os.path.join(output_dir, f"{kind}_{name}.npy"), mmap_mode='r')
+                        for name in ("indptr", "neighbours", "scores", "shared"))
+            for kind in KINDS
+        }
+
+    def related(self, title_or_pmcid, kind="coupling"):
+        """Return the stored neighbours of a paper, best first."""
+        paper_id = self.ids.get(extract_pmcid(title_or_pmcid) if title_or_pmcid.upper().startswith("PMC")
+                                else normalize_title(title_or_pmcid))
+        if paper_id is None:
+            return []
+        indptr, neighbours, scores, shared = self.arrays[kind]
+        start, end = indptr[paper_id], indptr[paper_id + 1]
+        return [
+            {"title": self.papers[j]["title"], "pmcid": self.papers[j]["pmcid"],
+             "score": float(s), "shared": int(c)}
+            for j, s, c in zip(neighbours[start:end], scores[start:end], shared[start:end])
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute co-citation and bibliographic-coupling neighbours")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("--corpus", default=DEFAULT_CORPUS_CSV)
+    build_parser.add_argument("--references", default=DEFAULT_REFERENCES_PATH)
+    build_parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    build_parser.add_argument("-k", type=int, default=20)
+
+    query_parser = subparsers.add_parser("query")
+    query_parser.add_argument("paper", help="Title or PMCID")
+    query_parser.add_argument("--kind", choices=KINDS, default="coupling")
+    query_parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        try:
+            with open(args.references, 'r', encoding='utf-8') as f:
+                citing_papers = json.load(f)
+        except Exception as e:
+            print(f"Error loading references from {args.references}: {e}")
+            return
+        summary = build_related_papers(read_corpus(args.corpus), citing_papers, args.output_dir, args.k)
+        print(f"{summary['papers']} papers, {summary['references']} distinct references")
+        for kind in KINDS:
+            print(f"  {kind}: {summary[kind]['pairs']} neighbour pairs, "
+                  f"{summary[kind]['papers_with_neighbours']} papers with neighbours")
+        print(f"Saved to {args.output_dir} in {time.perf_counter() - start:.2f}s")
+    else:
+        for entry in RelatedPapers(args.output_dir).related(args.paper, args.kind):
+            print(f"[{entry['score']:.3f}, {entry['shared']} shared] {entry['title'][:80]}")
+
+
+if __name__ == "__main__":
+    main()
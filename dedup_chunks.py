@@ -0,0 +1,194 @@
+import argparse
+import itertools
+import json
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+from bm25_index import DEFAULT_CHUNKS_PATH
+from chunk_reader import iter_chunks
+
+DEFAULT_OUTPUT_PATH = os.path.join("Backend", "Data", "rag_chunks_dedup.json")
+DEFAULT_MAP_PATH = os.path.join("Backend", "Data", "rag_chunks_duplicates.json")
+
+# Largest prime below 2^32: (a*x + b) with a, b, x < 2^32 cannot overflow uint64.
+HASH_PRIME = 4294967291
+MAX_HASH = (1 << 32) - 1
+WORD_PATTERN = re.compile(r"\w+")
+# LSH buckets with more members than this are paired linearly instead of all-pairs.
+MAX_BUCKET_SIZE = 64
+
+
+def shingle_hashes(text, size=5):
+    """Hash the word size-grams of a text to 32-bit integers."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        # Short chunks (e.g. "Corresponding author.") become a single shingle.
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    unique = set(grams)
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in unique),
+                       dtype=np.uint64, count=len(unique))
+
+
+class MinHasher:
+    """MinHash signatures from universal hashes (a*x + b) mod p."""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, HASH_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, HASH_PRIME, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, hashes):
+        """Return the num_perm minimum hash values of a shingle hash set."""
+        if len(hashes) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        permuted = (hashes[None, :] * self.a[:, None] + self.b[:, None]) % HASH_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+def lsh_candidate_pairs(signatures, bands, rows, max_bucket=MAX_BUCKET_SIZE):
+    """Yield (i, j) chunk pairs that share at least one LSH band bucket.
+
+    Buckets of up to max_bucket members yield every pair. Larger buckets
+    (boilerplate repeated across many papers) would be quadratic, so each
+    member is only paired with the bucket's first member and its predecessor;
+    union-find still joins any member similar to either into one cluster.
+    """
+    seen = set()
+    for band in range(bands):
+        buckets = {}
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for chunk_id, key in enumerate(map(bytes, block)):
+            buckets.setdefault(key, []).append(chunk_id)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) <= max_bucket:
+                pairs = itertools.combinations(members, 2)
+            else:
+                pairs = itertools.chain(((members[0], other) for other in members[1:]),
+                                        zip(members[1:], members[2:]))
+            for pair in pairs:
+                if pair not in seen:
+                    seen.add(pair)
+                    yield pair
+
+
+def find_duplicates(chunks, threshold=0.8, num_perm=128, bands=16, shingle_size=5):
+    """Return (stats per chunk, duplicate map {dup_id: kept_id}) for an iterable of chunks."""
+    hasher = MinHasher(num_perm)
+    rows = num_perm // bands
+    signatures = []
+    stats = []
+    for chunk in chunks:
+        text = chunk.get("text", "")
+        signatures.append(hasher.signature(shingle_hashes(text, shingle_size)))
+        stats.append((len(text.encode('utf-8')), len(text.split())))
+    if not signatures:
+        return stats, {}
+    signatures = np.vstack(signatures)
+    empty = signatures[:, 0] == MAX_HASH
+
+    parent = list(range(len(signatures)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in lsh_candidate_pairs(signatures, bands, rows):
+        if empty[i] or empty[j]:
+            continue
+        similarity = np.count_nonzero(signatures[i] == signatures[j]) / num_perm
+        if similarity >= threshold:
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                # The earliest chunk of a cluster is the one kept.
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    duplicates = {}
+    for chunk_id in range(len(parent)):
+        root = find(chunk_id)
+        if root != chunk_id:
+            duplicates[chunk_id] = root
+    return stats, duplicates
+
+
+def reduction_report(stats, duplicates, threshold):
+    """Summarize how much the deduplicated set saves in chunks, bytes and tokens."""
+    total_bytes = sum(size for size, _ in stats)
+    total_words = sum(words for _, words in stats)
+    removed_bytes = sum(stats[i][0] for i in duplicates)
+    removed_words = sum(stats[i][1] for i in duplicates)
+    return {
+        "threshold": threshold,
+        "chunks_before": len(stats),
+        "chunks_after": len(stats) - len(duplicates),
+        "duplicates_removed": len(duplicates),
+        "duplicate_clusters": len(set(duplicates.values())),
+        "text_bytes_before": total_bytes,
+        "text_bytes_after": total_bytes - removed_bytes,
+        "words_before": total_words,
+        "words_after": total_words - removed_words,
+        # Rough LLM token estimate at ~4 bytes of English text per token.
+        "est_tokens_saved": removed_bytes // 4,
+        "byte_reduction_pct": 100.0 * removed_bytes / total_bytes if total_bytes else 0.0,
+    }
+
+
+def write_deduplicated(input_path, output_path, duplicates):
+    """Stream the chunk file again, writing only the kept chunks as a JSON array."""
+    with open(output_path, 'w', encoding='utf-8') as out:
+        out.write("[\n")
+        first = True
+        for chunk_id, chunk in enumerate(iter_chunks(input_path)):
+            if chunk_id in duplicates:
+                continue
+            if not first:
+                out.write(",\n")
+            out.write(json.dumps(chunk, ensure_ascii=False))
+            first = False
+        out.write("\n]\n")
+    print(f"Deduplicated chunks saved to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and drop near-duplicate RAG chunks with MinHash/LSH")
+    parser.add_argument("--chunks", default=DEFAULT_CHUNKS_PATH)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument("--map", default=DEFAULT_MAP_PATH, help="Where to write the duplicate map and report")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Estimated Jaccard similarity to merge at")
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--bands", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.num_perm % args.bands:
+        parser.error("--num-perm must be divisible by --bands")
+
+    start = time.perf_counter()
+    stats, duplicates = find_duplicates(iter_chunks(args.chunks), args.threshold, args.num_perm, args.bands)
+    report = reduction_report(stats, duplicates, args.threshold)
+    report["seconds"] = time.perf_counter() - start
+
+    write_deduplicated(args.chunks, args.output, duplicates)
+    with open(args.map, 'w', encoding='utf-8') as f:
+        json.dump({"report": report, "duplicates": {str(k): v for k, v in sorted(duplicates.items())}}, f, indent=2)
+    print(f"Duplicate map saved to {args.map}")
+
+    print(f"\nChunks: {report['chunks_before']} -> {report['chunks_after']} "
+          f"({report['duplicates_removed']} duplicates in {report['duplicate_clusters']} clusters)")
+    print(f"Text bytes: {report['text_bytes_before']} -> {report['text_bytes_after']} "
+          f"(-{report['byte_reduction_pct']:.1f}%)")
+    print(f"Words: {report['words_before']} -> {report['words_after']}, ~{report['est_tokens_saved']} LLM tokens saved")
+    print(f"Took {report['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
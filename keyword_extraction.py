@@ -0,0 +1,230 @@
+import argparse
+import csv
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from bm25_index import DEFAULT_CHUNKS_PATH, STOPWORDS
+from chunk_reader import iter_chunks
+
+DEFAULT_STATE_PATH = "keyword_state.json"
+DEFAULT_OUTPUT_PATH = "papers_keywords_auto.csv"
+
+# Words that split candidate phrases in addition to the index stopwords;
+# they carry no topical meaning in scientific prose.
+PHRASE_BREAKERS = STOPWORDS | frozenset("""
+using used use study studies result results showed shown show shows found observed compared
+may might well within without among across via per either whether although thus therefore
+significant significantly respectively including included data analysis performed total
+different similar higher lower increased decreased level levels effect effects group groups
+first second third one two three four five new non previous previously recent recently
+et al e g i ie eg vs min max mean sd sem supplementary additional available figure figures
+""".split())
+
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9]*(?:[-/][a-z0-9]+)*")
+# Anything that is not a word, whitespace or an intra-word joiner ends a phrase.
+SPLIT_PATTERN = re.compile(r"[^a-z0-9\s\-/]+")
+
+
+def candidate_phrases(text, max_words=4):
+    """Split text RAKE-style on punctuation and stopwords and return phrase counts."""
+    counts = {}
+    for fragment in SPLIT_PATTERN.split(text.lower()):
+        run = []
+        for word in WORD_PATTERN.findall(fragment) + [None]:
+            if word is None or word in PHRASE_BREAKERS or len(word) < 3:
+                # Emit every sub-phrase of the run up to max_words long.
+                for i in range(len(run)):
+                    for n in range(1, min(max_words, len(run) - i) + 1):
+                        phrase = " ".join(run[i:i + n])
+                        counts[phrase] = counts.get(phrase, 0) + 1
+                run = []
+            else:
+                run.append(word)
+    return counts
+
+
+def flatten_sections(sections):
+    """Yield the content of every section and subsection of a scraped paper."""
+    for section in sections:
+        if section.get('content'):
+            yield section['content']
+        yield from flatten_sections(section.get('subsections', []))
+
+
+def iter_corpus_documents(path):
+    """Yield (title, url, text) per paper from scraped_papers.json or a RAG chunk file."""
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+    if b'"sections"' in head:
+        with open(path, 'r', encoding='utf-8') as f:
+            for paper in json.load(f):
+                yield paper.get('title', ''), paper.get('url', ''), "\n".join(flatten_sections(paper.get('sections', [])))
+        return
+
+    papers = {}
+    for chunk in iter_chunks(path):
+        key = chunk.get("url") or chunk.get("paper_title", "")
+        if key not in papers:
+            papers[key] = (chunk.get("paper_title", ""), chunk.get("url", ""), [])
+        papers[key][2].append(chunk.get("text", ""))
+    for title, url, texts in papers.values():
+        yield title, url, "\n".join(texts)
+
+
+class KeywordState:
+    """Corpus phrase statistics and extracted keywords, persisted between runs."""
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self.num_docs = 0
+        self.df = {}
+        self.papers = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.num_docs = data["num_docs"]
+                self.df = data["df"]
+                self.papers = data["papers"]
+            except Exception as e:
+                print(f"Error loading keyword state {path}: {e}. Starting from scratch.")
+
+    def save(self):
+        """Write the state atomically."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"num_docs": self.num_docs, "df": self.df, "papers": self.papers},
+                      f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+
+def contains_words(words, part):
+    """Whether the word tuple part occurs contiguously in words."""
+    n = len(part)
+    return any(words[i:i + n] == part for i in range(len(words) - n + 1))
+
+
+def score_documents(doc_counts, state, top_k=10, min_tf=2, max_words=4):
+    """Pick the top_k keywords of each document from its phrase counts with one sparse TF-IDF pass."""
+    vocab = {}
+    rows = []
+    cols = []
+    tfs = []
+    for row, counts in enumerate(doc_counts):
+        for phrase, tf in counts.items():
+            if tf < min_tf:
+                continue
+            rows.append(row)
+            cols.append(vocab.setdefault(phrase, len(vocab)))
+            tfs.append(tf)
+    if not rows:
+        return [[] for _ in doc_counts]
+
+    phrases = list(vocab)
+    rows = np.asarray(rows, dtype=np.int32)
+    cols = np.asarray(cols, dtype=np.int32)
+    tfs = np.asarray(tfs, dtype=np.float32)
+    df = np.asarray([state.df.get(phrase, 1) for phrase in phrases], dtype=np.float32)
+    n_words = np.asarray([phrase.count(" ") + 1 for phrase in phrases], dtype=np.float32)
+
+    idf = np.log((1.0 + state.num_docs) / (1.0 + df)) + 1.0
+    # Multi-word phrases get a RAKE-like boost; they are what a reader calls a keyword.
+    phrase_weight = idf * (1.0 + 0.5 * (np.minimum(n_words, max_words) - 1.0))
+    scores = (1.0 + np.log(tfs)) * phrase_weight[cols]
+
+    # Sort every non-zero by (document, descending score) in one go.
+    order = np.lexsort((-scores, rows))
+    rows, cols = rows[order], cols[order]
+    starts = np.searchsorted(rows, np.arange(len(doc_counts)))
+    ends = np.searchsorted(rows, np.arange(len(doc_counts)), side='right')
+
+    results = []
+    for start, end in zip(starts, ends):
+        picked = []
+        picked_words = []
+        for col in cols[start:end]:
+            phrase = phrases[col]
+            words = tuple(phrase.split())
+            # Skip phrases that overlap a better one word for word ("bone" after
+            # "bone loss", but not "ion" after "radiation").
+            if any(contains_words(kept, words) or contains_words(words, kept) for kept in picked_words):
+                continue
+            picked.append(phrase)
+            picked_words.append(words)
+            if len(picked) == top_k:
+                break
+        results.append(picked)
+    return results
+
+
+def extract_keywords(corpus_path, state, top_k=10, rebuild=False):
+    """Add keywords for papers not yet in state, updating corpus statistics incrementally."""
+    if rebuild:
+        state.num_docs, state.df, state.papers = 0, {}, {}
+
+    new_docs = []
+    for title, url, text in iter_corpus_documents(corpus_path):
+        key = url or title
+        if not key or key in state.papers or not text.strip():
+            continue
+        new_docs.append((key, title, url, candidate_phrases(text)))
+
+    if not new_docs:
+        print("No new papers to process.")
+        return []
+
+    # Fold the new papers into the stored document frequencies; older papers'
+    # statistics are kept rather than recomputed.
+    for _, _, _, counts in new_docs:
+        for phrase in counts:
+            state.df[phrase] = state.df.get(phrase, 0) + 1
+    state.num_docs += len(new_docs)
+
+    keywords = score_documents([counts for _, _, _, counts in new_docs], state, top_k)
+    for (key, title, url, _), picked in zip(new_docs, keywords):
+        state.papers[key] = {"title": title, "url": url, "keywords": picked}
+    print(f"Extracted keywords for {len(new_docs)} new papers ({state.num_docs} in corpus)")
+    return [key for key, _, _, _ in new_docs]
+
+
+def save_keywords_csv(state, filename=DEFAULT_OUTPUT_PATH):
+    """Write title,url,keywords rows like papers_keywords*.csv."""
+    try:
+        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=['title', 'url', 'keywords'])
+            writer.writeheader()
+            for paper in state.papers.values():
+                writer.writerow({
+                    'title': paper['title'],
+                    'url': paper['url'],
+                    'keywords': ', '.join(paper['keywords'])
+                })
+        print(f"Keywords saved to {filename}")
+    except Exception as e:
+        print(f"Error saving keywords to CSV: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract TF-IDF phrase keywords for the scraped corpus")
+    parser.add_argument("--corpus", default=DEFAULT_CHUNKS_PATH,
+                        help="rag_chunks.json style chunk file (JSON array or NDJSON) or scraped_papers.json")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument("-k", "--top-k", type=int, default=10)
+    parser.add_argument("--rebuild", action="store_true", help="Discard stored statistics and recompute everything")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    state = KeywordState(args.state)
+    extract_keywords(args.corpus, state, args.top_k, args.rebuild)
+    state.save()
+    save_keywords_csv(state, args.output)
+    print(f"Took {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
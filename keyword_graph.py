@@ -0,0 +1,145 @@
+import argparse
+import csv
+import json
+import os
+import re
+import time
+
+import numpy as np
+from scipy import sparse
+
+DEFAULT_CSV_PATHS = ["papers_with_citations.csv"]
+DEFAULT_OUTPUT_PATH = os.path.join("Backend", "Data", "keyword_graph.json")
+
+# Same delimiters as parseKeywordsFromPublication in the backend.
+KEYWORD_SPLIT = re.compile(r"[;,|]")
+# Placeholders the scrapers write when keyword generation failed.
+MISSING_KEYWORDS = {"", "error", "not found"}
+
+
+def normalize_keyword(keyword):
+    """Casefold a keyword and collapse whitespace so spelling variants share an id."""
+    return " ".join(keyword.casefold().strip(" .;:'\"").split())
+
+
+def read_paper_keywords(csv_paths):
+    """Return {url: (title, set of normalized keywords)} merged across keyword CSVs."""
+    papers = {}
+    for csv_path in csv_paths:
+        try:
+            with open(csv_path, 'r', encoding='utf-8-sig') as f:
+                for row in csv.DictReader(f):
+                    url = (row.get('url') or row.get('Link') or '').strip()
+                    title = (row.get('title') or row.get('Title') or '').strip()
+                    key = url or title
+                    if not key:
+                        continue
+                    keywords = {normalize_keyword(k) for k in KEYWORD_SPLIT.split(row.get('keywords', ''))}
+                    keywords -= MISSING_KEYWORDS
+                    entry = papers.setdefault(key, (title, set()))
+                    entry[1].update(keywords)
+        except Exception as e:
+            print(f"Error reading CSV file {csv_path}: {e}")
+    return papers
+
+
+def build_incidence_matrix(papers):
+    """Encode keywords as integer ids and return (paper x keyword CSR matrix, keyword labels)."""
+    keyword_ids = {}
+    rows = []
+    cols = []
+    for row, (_, keywords) in enumerate(papers.values()):
+        for keyword in keywords:
+            rows.append(row)
+            cols.append(keyword_ids.setdefault(keyword, len(keyword_ids)))
+    data = np.ones(len(rows), dtype=np.float32)
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(papers), len(keyword_ids)))
+    return matrix, list(keyword_ids)
+
+
+def cooccurrence_edges(matrix, min_count=2, top_k=10, max_edges=20000, rank_by="pmi"):
+    """Compute keyword co-occurrence with one sparse product and prune it to the strongest edges."""
+    n_papers = matrix.shape[0]
+    doc_freq = np.asarray(matrix.sum(axis=0)).ravel()
+
+    cooc = (matrix.T @ matrix).tocoo()
+    # Upper triangle only: each undirected pair once, no self loops.
+    keep = (cooc.row < cooc.col) & (cooc.data >= min_count)
+    src, dst, counts = cooc.row[keep], cooc.col[keep], cooc.data[keep]
+    pmi = np.log(counts * n_papers / (doc_freq[src] * doc_freq[dst]))
+    weight = pmi if rank_by == "pmi" else counts
+
+    # Keep an edge if it is among the top_k of either endpoint.
+    ends = np.concatenate([src, dst])
+    edge_ids = np.concatenate([np.arange(len(src)), np.arange(len(src))])
+    order = np.lexsort((-np.concatenate([weight, weight]), ends))
+    ends, edge_ids = ends[order], edge_ids[order]
+    first = np.searchsorted(ends, ends)
+    rank_in_node = np.arange(len(ends)) - first
+    selected = np.unique(edge_ids[rank_in_node < top_k])
+
+    if len(selected) > max_edges:
+        selected = selected[np.argsort(-weight[selected], kind='stable')[:max_edges]]
+    selected = selected[np.argsort(-weight[selected], kind='stable')]
+    return src[selected], dst[selected], counts[selected], pmi[selected], doc_freq
+
+
+def build_keyword_graph(csv_paths, output_path=DEFAULT_OUTPUT_PATH, min_count=2, top_k=10,
+                        max_edges=20000, rank_by="pmi"):
+    """Build the keyword co-occurrence graph from keyword CSVs and write it as compact JSON."""
+    papers = read_paper_keywords(csv_paths)
+    if not papers:
+        print("No papers with keywords found.")
+        return None
+
+    matrix, keywords = build_incidence_matrix(papers)
+    src, dst, counts, pmi, doc_freq = cooccurrence_edges(matrix, min_count, top_k, max_edges, rank_by)
+
+    # Drop keywords left without edges and renumber the survivors densely.
+    used = np.unique(np.concatenate([src, dst]))
+    new_ids = np.full(len(keywords), -1, dtype=np.int64)
+    new_ids[used] = np.arange(len(used))
+
+    graph = {
+        "meta": {
+            "sources": csv_paths,
+            "papers": matrix.shape[0],
+            "keywords": len(keywords),
+            "nodes": len(used),
+            "edges": len(src),
+            "min_count": min_count,
+            "top_k": top_k,
+            "rank_by": rank_by,
+            "edge_fields": ["source", "target", "count", "pmi"],
+        },
+        "nodes": [{"id": int(new_ids[k]), "label": keywords[k], "papers": int(doc_freq[k])} for k in used],
+        "edges": [[int(new_ids[s]), int(new_ids[d]), int(c), round(float(p), 4)]
+                  for s, d, c, p in zip(src, dst, counts, pmi)],
+    }
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(graph, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"Keyword graph with {len(used)} nodes and {len(src)} edges "
+          f"(from {matrix.shape[0]} papers, {len(keywords)} keywords) saved to {output_path}")
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the keyword co-occurrence graph")
+    parser.add_argument("--csv", nargs="+", default=DEFAULT_CSV_PATHS,
+                        help="Keyword CSVs (title,url,keywords,...); keywords are merged per url")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument("--min-count", type=int, default=2, help="Minimum papers a pair must share")
+    parser.add_argument("--top-k", type=int, default=10, help="Edges kept per keyword")
+    parser.add_argument("--max-edges", type=int, default=20000)
+    parser.add_argument("--rank-by", choices=["pmi", "count"], default="pmi")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_keyword_graph(args.csv, args.output, args.min_count, args.top_k, args.max_edges, args.rank_by)
+    print(f"Took {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import csv
+import json
+import os
+import re
+import time
+
+import numpy as np
+from scipy import sparse
+
+from keyword_graph import KEYWORD_SPLIT, MISSING_KEYWORDS, normalize_keyword
+from title_index import file_fingerprint, unchanged_fingerprint
+
+DEFAULT_CSV_PATH = "papers_with_citations.csv"
+DEFAULT_OUTPUT_PATH = os.path.join("Backend", "Data", "keyword_trends.json")
+TRENDS_VERSION = 1
+
+# "2014 Aug 18", "2014 Aug", "2014"; anything else ("Not found", "Error") has no year.
+DATE_PATTERN = re.compile(r"^\s*(\d{4})(?:\s+([A-Za-z]{3}))?")
+MONTHS = {name: i for i, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+
+def parse_publication_dates(values):
+    """Return (years, months) arrays for publication_date strings; 0 where unknown.
+
+    Each distinct string is parsed once and the result broadcast back, so a
+    corpus with many papers per day costs one regex per day.
+    """
+    uniques, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    years = np.zeros(len(uniques), dtype=np.int16)
+    months = np.zeros(len(uniques), dtype=np.int8)
+    for i, value in enumerate(uniques):
+        match = DATE_PATTERN.match(value)
+        if match:
+            years[i] = int(match.group(1))
+            months[i] = MONTHS.get((match.group(2) or "").lower(), 0)
+    return years[inverse], months[inverse]
+
+
+def read_keyword_years(csv_path):
+    """Return (publication_date strings, keyword sets) for every row of the CSV."""
+    dates = []
+    keyword_sets = []
+    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            keywords = {normalize_keyword(k) for k in KEYWORD_SPLIT.split(row.get('keywords', ''))}
+            dates.append(row.get('publication_date', ''))
+            keyword_sets.append(keywords - MISSING_KEYWORDS)
+    return dates, keyword_sets
+
+
+def keyword_year_counts(keyword_sets, years):
+    """Count papers per (keyword, year) with one sparse product; returns (counts, keywords, year labels).
+
+    Needs at least one paper with a known year.
+    """
+    keyword_ids = {}
+    rows = []
+    cols = []
+    for row, keywords in enumerate(keyword_sets):
+        for keyword in keywords:
+            rows.append(row)
+            cols.append(keyword_ids.setdefault(keyword, len(keyword_ids)))
+    n_papers = len(keyword_sets)
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                                  shape=(n_papers, len(keyword_ids)))
+
+    dated = np.flatnonzero(years > 0)
+    first_year = int(years[dated].min())
+    year_labels = np.arange(first_year, int(years[dated].max()) + 1)
+    year_matrix = sparse.csr_matrix((np.ones(len(dated), dtype=np.int32), (dated, years[dated] - first_year)),
+                                    shape=(n_papers, len(year_labels)))
+    counts = (incidence.T @ year_matrix).toarray()
+    return counts, list(keyword_ids), year_labels
+
+
+def trend_scores(counts, papers_per_year, window=3):
+    """Growth and burst scores of every keyword over the last window years.
+
+    growth: log ratio of the keyword's papers in the last window against the
+    window before, minus the same ratio for the whole corpus, so a keyword
+    growing only as fast as the corpus scores 0.
+    burst: Poisson z-score of the last window's count against what the
+    keyword's overall share of papers predicts.
+    """
+    recent = counts[:, -window:].sum(axis=1)
+    previous = counts[:, -2 * window:-window].sum(axis=1)
+    corpus_recent = papers_per_year[-window:].sum()
+    corpus_previous = papers_per_year[-2 * window:-window].sum()
+    growth = (np.log((recent + 1.0) / (previous + 1.0))
+              - np.log((corpus_recent + 1.0) / (corpus_previous + 1.0)))
+
+    totals = counts.sum(axis=1)
+    expected = totals * corpus_recent / max(papers_per_year.sum(), 1)
+    burst = (recent - expected) / np.sqrt(np.maximum(expected, 1e-9))
+    burst[totals == 0] = 0.0
+    return growth, burst
+
+
+def build_keyword_trends(csv_path=DEFAULT_CSV_PATH, output_path=DEFAULT_OUTPUT_PATH, window=3, min_papers=2,
+                         force=False):
+    """Materialize the keyword x year cube with trend scores, unless the stored one is still current."""
+    if not force and os.path.exists(output_path):
+        try:
+            with open(output_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            meta = cached["meta"]
+            current = unchanged_fingerprint(meta["source"], csv_path)
+            if (meta.get("version") == TRENDS_VERSION and meta.get("window") == window
+                    and meta.get("min_papers") == min_papers and current is not None):
+                if current is not meta["source"]:
+                    meta["source"] = current
+                    with open(output_path, 'w', encoding='utf-8') as f:
+                        json.dump(cached, f, ensure_ascii=False, separators=(",", ":"))
+                print(f"Keyword trends in {output_path} are up to date.")
+                return cached
+        except Exception as e:
+            print(f"Error reading cached trends {output_path}: {e}. Rebuilding.")
+
+    try:
+        dates, keyword_sets = read_keyword_years(csv_path)
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        return None
+    years, _ = parse_publication_dates(dates)
+    if not (years > 0).any():
+        print("No papers with a publication year found.")
+        return None
+    counts, keywords, year_labels = keyword_year_counts(keyword_sets, years)
+    papers_per_year = np.bincount(years[years > 0] - year_labels[0], minlength=len(year_labels))
+    growth, burst = trend_scores(counts, papers_per_year, window)
+
+    totals = counts.sum(axis=1)
+    kept = np.flatnonzero(totals >= min_papers)
+    kept = kept[np.lexsort((-totals[kept], -burst[kept]))]
+    trends = {
+        "meta": {
+            "version": TRENDS_VERSION,
+            "source": file_fingerprint(csv_path),
+            "papers": len(dates),
+            "undated_papers": int((years == 0).sum()),
+            "keywords": len(keywords),
+            "window": window,
+            "min_papers": min_papers,
+            "years": [int(y) for y in year_labels],
+            "papers_per_year": [int(c) for c in papers_per_year],
+        },
+        # Sorted by burst score; counts align with meta.years.
+        "keywords": [
+            {"keyword": keywords[k], "papers": int(totals[k]), "counts": [int(c) for c in counts[k]],
+             "growth": round(float(growth[k]), 4), "burst": round(float(burst[k]), 4)}
+            for k in kept
+        ],
+    }
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(trends, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"Keyword trends for {len(kept)} keywords over {len(year_labels)} years saved to {output_path}")
+    return trends
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the keyword x year trend cube with growth and burst scores")
+    parser.add_argument("--csv", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument("--window", type=int, default=3, help="Years compared for growth and burst")
+    parser.add_argument("--min-papers", type=int, default=2, help="Keywords with fewer papers are left out")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the CSV has not changed")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    trends = build_keyword_trends(args.csv, args.output, args.window, args.min_papers, args.force)
+    if trends:
+        print("Rising keywords:")
+        for entry in trends["keywords"][:10]:
+            print(f"  burst {entry['burst']:6.2f} growth {entry['growth']:+.2f} "
+                  f"({entry['papers']} papers) {entry['keyword']}")
+    print(f"Took {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
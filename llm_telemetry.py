@@ -0,0 +1,123 @@
+"""
+Per-call telemetry for the LLM summaries.
+
+Every chat completion records its model, prompt/completion tokens, time to
+first token and latency of the answering attempt, wall time including
+rate-limit waits and retries, retries, provider prompt-cache hits and cost.
+The run rollup has latency percentiles and total spend, written as JSON so
+prompt and model choices can be compared on speed and cost.
+"""
+import json
+import threading
+import time
+
+# USD per million (prompt, completion) tokens, used when the provider does not
+# report the cost itself. Check https://openrouter.ai/models when adding models.
+MODEL_PRICES = {
+    "qwen/qwen3-coder": (0.20, 0.80),
+    "openai/gpt-4o-mini": (0.15, 0.60),
+    "anthropic/claude-3.5-haiku": (0.80, 4.00),
+    "meta-llama/llama-3.1-8b-instruct": (0.02, 0.03),
+}
+DEFAULT_REPORT_PATH = "summary_telemetry.json"
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Cost in USD from MODEL_PRICES, or None for an unknown model."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def percentile(sorted_values, q):
+    """Linearly interpolated percentile (q in 0..100) of an already sorted list."""
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def latency_summary(values):
+    # Plain Python rather than NumPy keeps importing the summarizer cheap.
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    values = sorted(values)
+    return {"count": len(values), "mean": round(sum(values) / len(values), 4),
+            "p50": round(percentile(values, 50), 4), "p95": round(percentile(values, 95), 4),
+            "p99": round(percentile(values, 99), 4), "max": round(values[-1], 4)}
+
+
+class LLMTelemetry:
+    """Collects one record per LLM call; safe to share between threads."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, **call):
+        """Store one call: title, model, ok, prompt/completion/cached tokens, ttft, latency, wall, retries, cost, error.
+
+        ttft and latency cover the last attempt only; wall also includes rate-limit waits, failed attempts and backoff.
+        """
+        if call.get("cost") is None and call.get("ok"):
+            call["cost"] = estimate_cost(call["model"], call.get("prompt_tokens", 0), call.get("completion_tokens", 0))
+        call["cache_hit"] = call.get("cached_tokens", 0) > 0
+        with self.lock:
+            self.calls.append(call)
+
+    def summary(self):
+        with self.lock:
+            calls = list(self.calls)
+        ok = [c for c in calls if c["ok"]]
+        costs = [c["cost"] for c in ok if c.get("cost") is not None]
+        by_model = {}
+        for c in ok:
+            model = by_model.setdefault(c["model"], {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0})
+            model["calls"] += 1
+            model["prompt_tokens"] += c["prompt_tokens"]
+            model["completion_tokens"] += c["completion_tokens"]
+            model["cost"] += c.get("cost") or 0.0
+        return {
+            "calls": len(calls),
+            "failed": len(calls) - len(ok),
+            "retries": sum(c.get("retries", 0) for c in calls),
+            "cache_hits": sum(c["cache_hit"] for c in ok),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in ok),
+            "completion_tokens": sum(c["completion_tokens"] for c in ok),
+            "total_cost_usd": round(sum(costs), 6),
+            "calls_without_cost": len(ok) - len(costs),
+            "latency_seconds": latency_summary([c["latency"] for c in ok]),
+            "ttft_seconds": latency_summary([c["ttft"] for c in ok if c.get("ttft") is not None]),
+            "wall_seconds": latency_summary([c.get("wall", c["latency"]) for c in ok]),
+            "by_model": by_model,
+        }
+
+    def slowest(self, n=5):
+        with self.lock:
+            ok = [c for c in self.calls if c["ok"]]
+        return sorted(ok, key=lambda c: -c["latency"])[:n]
+
+    def print_summary(self):
+        s = self.summary()
+        if not s["calls"]:
+            return
+        lat, ttft = s["latency_seconds"], s["ttft_seconds"]
+        print(f"LLM calls: {s['calls']} ({s['failed']} failed, {s['retries']} retries, {s['cache_hits']} cache hits)")
+        print(f"Tokens: {s['prompt_tokens']} prompt, {s['completion_tokens']} completion; "
+              f"cost ${s['total_cost_usd']:.4f}")
+        print(f"Latency: p50 {lat['p50']:.2f}s, p95 {lat['p95']:.2f}s, p99 {lat['p99']:.2f}s; "
+              f"TTFT p50 {ttft['p50']:.2f}s, p95 {ttft['p95']:.2f}s; wall p95 {s['wall_seconds']['p95']:.2f}s")
+
+    def save(self, path=DEFAULT_REPORT_PATH):
+        with self.lock:
+            calls = list(self.calls)
+        report = {"started": self.started, "finished": time.time(), "summary": self.summary(),
+                  "slowest": [c["title"] for c in self.slowest()], "calls": calls}
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            print(f"LLM telemetry saved to {path}")
+        except Exception as e:
+            print(f"Error saving LLM telemetry: {e}")
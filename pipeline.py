@@ -0,0 +1,447 @@
+"""
+Incremental paper pipeline driven by a content-hash manifest.
+
+Every paper in SB_publication_PMC.csv is keyed by its PMCID. The manifest
+records, per paper, the hash of its input row and, for each derived artifact,
+the stage version, the hashes of the inputs it was built from and the hash of
+its own output:
+
+    row -> page -> sections -> chunks -> keywords
+                \\-> references        \\-> summary
+        -> citations
+
+`update` rebuilds only artifacts that are missing, whose stage version
+changed, or whose inputs changed. Unchanged outputs stop the cascade, so
+re-parsing a page that yields the same sections leaves chunks, keywords and
+summaries alone. Failed artifacts are retried after a backoff that doubles
+with every failure, or right away with --retry-failed; a paper Semantic
+Scholar does not know is recorded as an empty citations artifact rather than
+a failure. `export` merges the per-paper artifacts into corpus files.
+`status` and `export` never write the manifest, and papers that leave the
+CSV keep their cached artifacts until `prune`.
+
+    python pipeline.py status
+    python pipeline.py update --skip summary
+    python pipeline.py update --only citations --limit 20
+    python pipeline.py update --retry-failed
+    python pipeline.py prune                     # forget papers no longer in the CSV
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+import requests
+
+from keyword_extraction import KeywordState, candidate_phrases, score_documents
+from title_index import extract_pmcid
+
+SCRAPING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Scraping")
+sys.path.insert(0, SCRAPING_DIR)
+from crawl_metrics import CrawlMetrics, record_response
+from pmc_urls import learn, resolve
+from rate_limiter import acquire, default_delay
+from scraper_scripts import load_script
+
+DEFAULT_CSV = os.path.join(SCRAPING_DIR, "SB_publication_PMC.csv")
+DEFAULT_DIR = os.path.join("Backend", "Data", "pipeline")
+MANIFEST_VERSION = 1
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# stage -> (version, upstream artifacts). Bump a version whenever the code
+# behind a stage changes its output; only that stage and what depends on it
+# are rebuilt. Stages are listed in dependency order.
+STAGES = {
+    "page": (1, ("row",)),
+    "sections": (1, ("page",)),
+    "references": (1, ("page",)),
+    "chunks": (1, ("sections",)),
+    "keywords": (1, ("chunks",)),
+    "citations": (1, ("row",)),
+    "summary": (1, ("chunks",)),
+}
+NETWORK_STAGES = {"page", "citations", "summary"}
+# A failed artifact waits RETRY_BACKOFF seconds, doubled per further failure up to RETRY_BACKOFF_MAX.
+RETRY_BACKOFF = 24 * 3600
+RETRY_BACKOFF_MAX = 30 * 24 * 3600
+
+CHUNK_CHARS = 1000
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def content_hash(data):
+    if not isinstance(data, bytes):
+        data = json.dumps(data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_input_rows(csv_path):
+    """Return {pmcid: {"title", "url"}} for every row with a PMC link; the first row of a PMCID wins."""
+    rows = {}
+    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            url = row.get('Link', '').strip()
+            pmcid = extract_pmcid(url)
+            if pmcid and pmcid not in rows:
+                rows[pmcid] = {"title": row.get('Title', '').strip(), "url": url}
+    return rows
+
+
+def chunk_sections(paper):
+    """Split every section into chunks of whole sentences, about CHUNK_CHARS long, like rag_chunks.json."""
+    chunks = []
+
+    def walk(sections):
+        for section in sections:
+            current = ""
+            for sentence in SENTENCE_END.split(section.get('content', '')):
+                if current and len(current) + len(sentence) + 1 > CHUNK_CHARS:
+                    chunks.append((section.get('title', ''), current))
+                    current = sentence
+                else:
+                    current = f"{current} {sentence}" if current else sentence
+            if current.strip():
+                chunks.append((section.get('title', ''), current))
+            walk(section.get('subsections', []))
+
+    walk(paper.get('sections', []))
+    return [{"text": text, "section": section, "paper_title": paper.get('title', ''), "url": paper.get('url', '')}
+            for section, text in chunks]
+
+
+class Manifest:
+    """Per-PMCID row hashes and artifact records, persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.papers = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.papers = data["papers"]
+            except Exception as e:
+                print(f"Error loading manifest {path}: {e}. Starting from scratch.")
+
+    def save(self):
+        """Write the manifest atomically."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "papers": self.papers}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def input_hashes(self, pmcid, stage):
+        entry = self.papers[pmcid]
+        hashes = {}
+        for dep in STAGES[stage][1]:
+            if dep == "row":
+                hashes[dep] = entry["row_hash"]
+            else:
+                record = entry["artifacts"].get(dep)
+                hashes[dep] = record["hash"] if record and record.get("hash") else None
+        return hashes
+
+    def stale_reason(self, pmcid, stage):
+        """Why stage must be rebuilt for pmcid, '' if it is current, or None if an input is not available yet."""
+        inputs = self.input_hashes(pmcid, stage)
+        if any(h is None for h in inputs.values()):
+            return None
+        record = self.papers[pmcid]["artifacts"].get(stage)
+        if record is None:
+            return "new"
+        if record["version"] != STAGES[stage][0]:
+            return "version"
+        if record["inputs"] != inputs:
+            return "inputs"
+        if record.get("error"):
+            return "failed"
+        return ""
+
+    def retry_due(self, pmcid, stage):
+        """Whether a failed artifact has waited out its backoff."""
+        record = self.papers[pmcid]["artifacts"][stage]
+        backoff = min(RETRY_BACKOFF * 2 ** (record.get("failures", 1) - 1), RETRY_BACKOFF_MAX)
+        return time.time() >= record["updated"] + backoff
+
+
+class Pipeline:
+    def __init__(self, csv_path=DEFAULT_CSV, data_dir=DEFAULT_DIR, delay=None, metrics=None):
+        self.csv_path = csv_path
+        self.data_dir = data_dir
+        # The shared per-host bucket paces requests; only sleep when it is switched off.
+        self.delay = default_delay(1.0) if delay is None else delay
+        self.metrics = metrics or CrawlMetrics("pipeline")
+        os.makedirs(data_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(data_dir, "manifest.json"))
+        self.keyword_state = None
+        self._modules = {}
+        self._searcher = None
+        self.pmcids = list(self.manifest.papers)  # papers in the current CSV, set by sync_rows
+
+    def module(self, name):
+        if name not in self._modules:
+            self._modules[name] = load_script(name)
+        return self._modules[name]
+
+    def artifact_path(self, stage, pmcid):
+        return os.path.join(self.data_dir, stage, pmcid + (".html" if stage == "page" else ".json"))
+
+    def load(self, stage, pmcid):
+        with open(self.artifact_path(stage, pmcid), 'rb') as f:
+            data = f.read()
+        return data if stage == "page" else json.loads(data)
+
+    def store(self, stage, pmcid, value):
+        """Write an artifact and return its content hash."""
+        data = value if stage == "page" else json.dumps(value, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        path = self.artifact_path(stage, pmcid)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return content_hash(data)
+
+    def sync_rows(self, prune=False):
+        """Fold the input CSV into the in-memory manifest; return (new, changed, missing) PMCID counts.
+
+        Papers missing from the CSV are left alone, so a subset CSV never costs
+        cached work; with prune they are dropped and their artifact files deleted.
+        """
+        rows = read_input_rows(self.csv_path)
+        self.pmcids = list(rows)
+        new = changed = 0
+        for pmcid, row in rows.items():
+            row_hash = content_hash(row)
+            entry = self.manifest.papers.get(pmcid)
+            if entry is None:
+                self.manifest.papers[pmcid] = {"title": row["title"], "url": row["url"],
+                                               "row_hash": row_hash, "artifacts": {}}
+                new += 1
+            elif entry["row_hash"] != row_hash:
+                entry.update(title=row["title"], url=row["url"], row_hash=row_hash)
+                changed += 1
+        missing = [pmcid for pmcid in self.manifest.papers if pmcid not in rows]
+        if prune:
+            for pmcid in missing:
+                del self.manifest.papers[pmcid]
+                for stage in STAGES:
+                    if os.path.exists(self.artifact_path(stage, pmcid)):
+                        os.remove(self.artifact_path(stage, pmcid))
+        return new, changed, len(missing)
+
+    def status(self, stages=STAGES):
+        """Return {stage: {reason: count}} over the papers in the CSV."""
+        counts = {stage: {} for stage in stages}
+        for pmcid in self.pmcids:
+            for stage in stages:
+                reason = self.manifest.stale_reason(pmcid, stage)
+                key = "waiting" if reason is None else (reason or "current")
+                if reason == "failed" and not self.manifest.retry_due(pmcid, stage):
+                    key = "backoff"
+                counts[stage][key] = counts[stage].get(key, 0) + 1
+        return counts
+
+    def build(self, stage, pmcid):
+        """Compute one artifact from its upstream artifacts; return None on failure."""
+        entry = self.manifest.papers[pmcid]
+        if stage == "page":
+            fetch_url = resolve(entry["url"])
+            acquire(fetch_url, self.metrics)
+            fetch_start = time.perf_counter()
+            response = requests.get(fetch_url, headers=HEADERS, timeout=30)
+            response.raise_for_status()
+            record_response(self.metrics, response, time.perf_counter() - fetch_start)
+            learn(fetch_url, response)
+            return response.content
+        if stage == "sections":
+            return self.module("main2").parse_pmc_paper(self.load("page", pmcid), entry["url"], entry["title"],
+                                                        self.metrics)
+        if stage == "references":
+            return self.module("firas").parse_pmc_references(self.load("page", pmcid), entry["url"],
+                                                             entry["title"], self.metrics)["references"]
+        if stage == "chunks":
+            return chunk_sections(self.load("sections", pmcid))
+        if stage == "keywords":
+            return self.extract_keywords(pmcid, self.load("chunks", pmcid))
+        if stage == "citations":
+            if self._searcher is None:
+                self._searcher = self.module("semantic_scholar").SemanticScholarSearcher(self.metrics)
+            # Request errors raise and count as failures; a paper that is simply not found is
+            # stored as an empty result so daily updates do not ask for it again.
+            return self._searcher.search_paper(entry["title"], raise_errors=True) or {}
+        if stage == "summary":
+            from summarize import summarize_text
+            text = "\n\n".join(chunk["text"] for chunk in self.load("chunks", pmcid))
+            summary = summarize_text(None, text, entry["title"])
+            if summary.startswith("Error summarizing"):
+                raise RuntimeError(summary)
+            return summary
+        raise ValueError(f"Unknown stage {stage}")
+
+    def extract_keywords(self, pmcid, chunks):
+        if self.keyword_state is None:
+            self.keyword_state = KeywordState(os.path.join(self.data_dir, "keyword_state.json"))
+        state = self.keyword_state
+        counts = candidate_phrases("\n".join(chunk["text"] for chunk in chunks))
+        # Document frequencies only grow when a paper is seen for the first time.
+        if pmcid not in state.papers:
+            for phrase in counts:
+                state.df[phrase] = state.df.get(phrase, 0) + 1
+            state.num_docs += 1
+        keywords = score_documents([counts], state)[0]
+        state.papers[pmcid] = {"title": self.manifest.papers[pmcid]["title"],
+                               "url": self.manifest.papers[pmcid]["url"], "keywords": keywords}
+        return keywords
+
+    def update(self, stages=STAGES, limit=None, refetch=False, retry_failed=False):
+        """Rebuild stale artifacts stage by stage for every paper in the CSV; return {stage: rebuilt count}.
+
+        Failed artifacts are only retried once their backoff has passed, or always with retry_failed.
+        """
+        if refetch:
+            for pmcid in self.pmcids:
+                self.manifest.papers[pmcid]["artifacts"].pop("page", None)
+        rebuilt = {stage: 0 for stage in stages}
+        failed = {stage: 0 for stage in stages}
+        pmcids = self.pmcids
+        for stage in (s for s in STAGES if s in stages):
+            todo = []
+            for pmcid in pmcids:
+                reason = self.manifest.stale_reason(pmcid, stage)
+                if reason and (reason != "failed" or retry_failed or self.manifest.retry_due(pmcid, stage)):
+                    todo.append(pmcid)
+            if limit:
+                todo = todo[:limit]
+            if todo:
+                print(f"{stage}: rebuilding {len(todo)} artifacts")
+            for i, pmcid in enumerate(todo):
+                inputs = self.manifest.input_hashes(pmcid, stage)
+                try:
+                    with self.metrics.stage(stage):
+                        value = self.build(stage, pmcid)
+                    error = None if value is not None else "no result"
+                except Exception as e:
+                    value, error = None, str(e)
+                record = {"version": STAGES[stage][0], "inputs": inputs, "updated": time.time()}
+                if error:
+                    previous = self.manifest.papers[pmcid]["artifacts"].get(stage) or {}
+                    # Keep the last good hash so downstream artifacts are not invalidated by a failed retry.
+                    record.update(hash=previous.get("hash"), error=error,
+                                  failures=previous.get("failures", 0) + 1 if previous.get("error") else 1)
+                    failed[stage] += 1
+                    print(f"  {pmcid} {stage} failed: {error}")
+                else:
+                    record["hash"] = self.store(stage, pmcid, value)
+                    rebuilt[stage] += 1
+                self.manifest.papers[pmcid]["artifacts"][stage] = record
+                if self.delay and stage in NETWORK_STAGES and i < len(todo) - 1:
+                    with self.metrics.stage("sleep"):
+                        time.sleep(self.delay)
+                if (i + 1) % 25 == 0:
+                    self.save()
+            self.save()
+        self.metrics.add("artifacts_failed", sum(failed.values()))
+        return rebuilt
+
+    def save(self):
+        self.manifest.save()
+        if self.keyword_state is not None:
+            self.keyword_state.save()
+
+    def export(self):
+        """Merge the CSV's papers into corpus files in data_dir.
+
+        Writes rag_chunks.json, keywords.csv, references.json, summary.json and
+        semantic_scholar_citations.csv/.json.
+        """
+        merged = {"chunks": [], "references": {}, "summary": {}, "keywords": [], "citations": []}
+        for pmcid in self.pmcids:
+            entry = self.manifest.papers[pmcid]
+            artifacts = entry["artifacts"]
+            for stage in ("chunks", "references", "summary", "keywords", "citations"):
+                if artifacts.get(stage, {}).get("hash"):
+                    value = self.load(stage, pmcid)
+                    if stage == "chunks":
+                        merged["chunks"].extend(value)
+                    elif stage == "keywords":
+                        merged["keywords"].append({'title': entry["title"], 'url': entry["url"],
+                                                   'keywords': ', '.join(value)})
+                    elif stage == "citations":
+                        # An empty artifact means Semantic Scholar does not know the paper.
+                        if value:
+                            merged["citations"].append(self.module("semantic_scholar").citation_result(entry, value))
+                    else:
+                        merged[stage][pmcid] = value
+        with open(os.path.join(self.data_dir, "rag_chunks.json"), 'w', encoding='utf-8') as f:
+            json.dump(merged["chunks"], f, ensure_ascii=False, indent=2)
+        for name in ("references", "summary"):
+            with open(os.path.join(self.data_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+                json.dump(merged[name], f, ensure_ascii=False, indent=2)
+        with open(os.path.join(self.data_dir, "keywords.csv"), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['title', 'url', 'keywords'])
+            writer.writeheader()
+            writer.writerows(merged["keywords"])
+        if merged["citations"]:
+            # Same columns as the Semantic Scholar script, so citation_graph.py --ids can read it.
+            searcher = self.module("semantic_scholar")
+            path = os.path.join(self.data_dir, "semantic_scholar_citations")
+            searcher.save_results_to_csv(merged["citations"], path + ".csv")
+            searcher.save_results_to_json(merged["citations"], path + ".json")
+        print(f"Exported {len(merged['chunks'])} chunks, {len(merged['keywords'])} keyword rows, "
+              f"{len(merged['references'])} reference lists, {len(merged['summary'])} summaries and "
+              f"{len(merged['citations'])} citation records to {self.data_dir}")
+
+
+def print_status(counts):
+    for stage, reasons in counts.items():
+        print(f"{stage:12s} " + ", ".join(f"{reason} {n}" for reason, n in sorted(reasons.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally rebuild per-paper artifacts from SB_publication_PMC.csv")
+    parser.add_argument("command", choices=["status", "update", "export", "prune"],
+                        help="status and export only read; prune drops papers no longer in the CSV and their files")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Where the manifest and artifacts live")
+    parser.add_argument("--only", nargs="*", choices=list(STAGES), help="Run only these stages")
+    parser.add_argument("--skip", nargs="*", choices=list(STAGES), default=[], help="Leave these stages alone")
+    parser.add_argument("--limit", type=int, help="Rebuild at most this many artifacts per stage")
+    parser.add_argument("--delay", type=float,
+                        help="Extra seconds between network requests (default: none while RATE_LIMIT is on, else 1)")
+    parser.add_argument("--refetch", action="store_true", help="Fetch every page again to pick up upstream edits")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry failed artifacts without waiting for their backoff")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    pipeline = Pipeline(args.csv, args.dir, args.delay)
+    new, changed, missing = pipeline.sync_rows(prune=args.command == "prune")
+    print(f"{len(pipeline.pmcids)} papers in CSV ({new} new, {changed} changed); "
+          f"{missing} manifest papers not in CSV" + (" pruned" if args.command == "prune" else ""))
+    stages = [s for s in (args.only or STAGES) if s not in args.skip]
+    if args.command == "update" and "summary" in stages and not os.environ.get("OPENROUTER_API_KEY"):
+        print("OPENROUTER_API_KEY is not set; skipping the summary stage")
+        stages.remove("summary")
+
+    if args.command == "status":
+        print_status(pipeline.status(stages))
+    elif args.command == "prune":
+        pipeline.manifest.save()
+    elif args.command == "update":
+        rebuilt = pipeline.update(stages, args.limit, args.refetch, args.retry_failed)
+        print("Rebuilt: " + ", ".join(f"{stage} {n}" for stage, n in rebuilt.items()))
+        if any(rebuilt.values()):
+            pipeline.export()
+        pipeline.metrics.print_stage_summary()
+    else:
+        pipeline.export()
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from keyword_graph import KEYWORD_SPLIT, MISSING_KEYWORDS, normalize_keyword
+from keyword_trends import DEFAULT_CSV_PATH, parse_publication_dates
+from title_index import file_fingerprint, unchanged_fingerprint
+
+SNAPSHOT_VERSION = 1
+MISSING_AUTHORS = {"", "error", "not found"}
+
+
+def encode_strings(strings):
+    """Pack strings into one UTF-8 byte array plus offsets, so they load without pickle."""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def decode_strings(blob, offsets):
+    """Inverse of encode_strings."""
+    raw = blob.tobytes()
+    return [raw[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+class DictionaryColumn:
+    """A multi-valued string column: each row holds codes into a shared vocabulary (CSR layout)."""
+
+    def __init__(self, vocab, indptr, codes):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.codes = codes
+
+    @classmethod
+    def from_rows(cls, rows):
+        ids = {}
+        indptr = [0]
+        codes = []
+        for values in rows:
+            codes.extend(ids.setdefault(value, len(ids)) for value in values)
+            indptr.append(len(codes))
+        return cls(list(ids), np.asarray(indptr, dtype=np.int64), np.asarray(codes, dtype=np.int32))
+
+    def row(self, i):
+        return [self.vocab[c] for c in self.codes[self.indptr[i]:self.indptr[i + 1]]]
+
+    def row_ids(self):
+        """The row number of every entry in codes."""
+        return np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+
+    def value_counts(self, rows=None):
+        """Number of rows containing each vocabulary value, optionally restricted to a row mask."""
+        codes = self.codes if rows is None else self.codes[rows[self.row_ids()]]
+        return np.bincount(codes, minlength=len(self.vocab))
+
+
+class PublicationTable:
+    """papers_with_citations.csv held column by column.
+
+    titles/urls are plain lists, keywords/authors dictionary-encoded, and
+    citations (NaN when unknown), year and month (0 when unknown) are NumPy
+    arrays, so analytics are array operations instead of row loops.
+    """
+
+    def __init__(self, titles, urls, keywords, authors, years, months, citations):
+        self.titles = titles
+        self.urls = urls
+        self.keywords = keywords
+        self.authors = authors
+        self.years = years
+        self.months = months
+        self.citations = citations
+
+    def __len__(self):
+        return len(self.titles)
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        titles, urls, keywords, authors, dates, citations = [], [], [], [], [], []
+        with open(csv_path, 'r', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                titles.append(row.get('title', '').strip())
+                urls.append(row.get('url', '').strip())
+                kws = {normalize_keyword(k) for k in KEYWORD_SPLIT.split(row.get('keywords', ''))}
+                keywords.append(sorted(kws - MISSING_KEYWORDS))
+                names = [name.strip() for name in row.get('authors', '').split(',')]
+                authors.append([name for name in names if name.lower() not in MISSING_AUTHORS])
+                dates.append(row.get('publication_date', ''))
+                citations.append(row.get('citations', ''))
+        years, months = parse_publication_dates(dates)
+        return cls(titles, urls, DictionaryColumn.from_rows(keywords), DictionaryColumn.from_rows(authors),
+                   years, months, parse_citations(citations))
+
+    def save_snapshot(self, path, source):
+        arrays = {"years": self.years, "months": self.months, "citations": self.citations,
+                  "meta": np.frombuffer(json.dumps({"version": SNAPSHOT_VERSION, "source": source}).encode(),
+                                        dtype=np.uint8)}
+        for name, strings in (("titles", self.titles), ("urls", self.urls),
+                              ("keyword_vocab", self.keywords.vocab), ("author_vocab", self.authors.vocab)):
+            arrays[name + "_blob"], arrays[name + "_offsets"] = encode_strings(strings)
+        for name, column in (("keyword", self.keywords), ("author", self.authors)):
+            arrays[name + "_indptr"], arrays[name + "_codes"] = column.indptr, column.codes
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """Return (table, snapshot meta)."""
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes())
+            strings = {name: decode_strings(data[name + "_blob"], data[name + "_offsets"])
+                       for name in ("titles", "urls", "keyword_vocab", "author_vocab")}
+            table = cls(strings["titles"], strings["urls"],
+                        DictionaryColumn(strings["keyword_vocab"], data["keyword_indptr"], data["keyword_codes"]),
+                        DictionaryColumn(strings["author_vocab"], data["author_indptr"], data["author_codes"]),
+                        data["years"], data["months"], data["citations"])
+        return table, meta
+
+    def papers_per_year(self):
+        """Return (years, paper counts) for papers with a known year."""
+        years, counts = np.unique(self.years[self.years > 0], return_counts=True)
+        return years, counts
+
+    def top_cited_per_year(self, n=5):
+        """Return {year: [(title, citations), ...]} with the n most cited papers of each year."""
+        rows = np.flatnonzero((self.years > 0) & ~np.isnan(self.citations))
+        rows = rows[np.lexsort((-self.citations[rows], self.years[rows]))]
+        years = self.years[rows]
+        rank = np.arange(len(rows)) - np.searchsorted(years, years)
+        result = {}
+        for row in rows[rank < n]:
+            result.setdefault(int(self.years[row]), []).append((self.titles[row], float(self.citations[row])))
+        return result
+
+    def citation_histogram(self, bins=(0, 1, 10, 25, 50, 100, 250, 500, 1000, np.inf)):
+        """Return (bin edges, paper counts) over papers with known citations."""
+        counts, edges = np.histogram(self.citations[~np.isnan(self.citations)], bins=np.asarray(bins, dtype=float))
+        return edges, counts
+
+    def author_counts(self, top_n=20):
+        """Return the top_n (author, papers) pairs."""
+        counts = self.authors.value_counts()
+        top = np.argsort(-counts, kind='stable')[:top_n]
+        return [(self.authors.vocab[a], int(counts[a])) for a in top]
+
+    def authors_per_paper(self):
+        return np.diff(self.authors.indptr)
+
+
+def parse_citations(values):
+    """Citation strings ("94.0", "") to a float32 array with NaN for unknown."""
+    citations = np.full(len(values), np.nan, dtype=np.float32)
+    for i, value in enumerate(values):
+        try:
+            citations[i] = float(value)
+        except ValueError:
+            pass
+    return citations
+
+
+def load_publication_table(csv_path=DEFAULT_CSV_PATH, snapshot_path=None):
+    """Load the table from its binary snapshot, re-parsing the CSV only when its contents changed."""
+    snapshot_path = snapshot_path or csv_path + ".table.npz"
+    if os.path.exists(snapshot_path):
+        try:
+            table, meta = PublicationTable.load_snapshot(snapshot_path)
+            if meta.get("version") == SNAPSHOT_VERSION:
+                current = unchanged_fingerprint(meta["source"], csv_path)
+                if current is not None:
+                    if current is not meta["source"]:
+                        table.save_snapshot(snapshot_path, current)
+                    return table
+        except Exception as e:
+            print(f"Error loading snapshot {snapshot_path}: {e}. Rebuilding.")
+
+    table = PublicationTable.from_csv(csv_path)
+    table.save_snapshot(snapshot_path, file_fingerprint(csv_path))
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load papers_with_citations.csv as a columnar table and print analytics")
+    parser.add_argument("--csv", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--snapshot", default=None, help="Defaults to <csv>.table.npz")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = load_publication_table(args.csv, args.snapshot)
+    load_ms = (time.perf_counter() - start) * 1000
+    print(f"Loaded {len(table)} papers, {len(table.keywords.vocab)} keywords, "
+          f"{len(table.authors.vocab)} authors in {load_ms:.1f} ms")
+
+    years, counts = table.papers_per_year()
+    print("Papers per year: " + ", ".join(f"{y}: {c}" for y, c in zip(years, counts)))
+    edges, hist = table.citation_histogram()
+    print("Citations: " + ", ".join(f"[{edges[i]:g}, {edges[i + 1]:g}): {c}" for i, c in enumerate(hist)))
+    print("Top authors: " + ", ".join(f"{name} ({n})" for name, n in table.author_counts(5)))
+    print(f"Authors per paper: median {np.median(table.authors_per_paper()):g}")
+    top = table.top_cited_per_year(1)
+    for year in sorted(top)[-3:]:
+        title, cited = top[year][0]
+        print(f"Most cited of {year}: {title[:70]} ({cited:g})")
+
+
+if __name__ == "__main__":
+    main()
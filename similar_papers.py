@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from scipy import sparse
+
+from bm25_index import DEFAULT_CHUNKS_PATH, tokenize
+from keyword_extraction import iter_corpus_documents
+from title_index import extract_pmcid
+from vector_index import TfidfVectorizer
+
+DEFAULT_OUTPUT_PATH = os.path.join("Backend", "Data", "similar_papers.json")
+
+
+def paper_tfidf_matrix(documents, min_df=2, max_features=100000):
+    """Return the L2-normalized paper x term TF-IDF matrix as scipy CSR."""
+    token_lists = [tokenize(text) for text in documents]
+    vectorizer = TfidfVectorizer().fit(token_lists, min_df=min_df, max_features=max_features)
+    indptr, indices, data = vectorizer.transform(token_lists)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(documents), len(vectorizer.vocab)))
+
+
+def blocked_top_k(matrix, k=10, block_size=1024, min_score=0.0):
+    """Cosine top-k neighbours of every row, multiplying one row block at a time.
+
+    Only a block_size x n_papers score block is materialized, so memory stays
+    bounded however large the corpus grows.
+    """
+    n = matrix.shape[0]
+    k = min(k, max(n - 1, 0))
+    matrix_t = matrix.T.tocsc()
+    neighbour_ids = np.zeros((n, k), dtype=np.int32)
+    neighbour_scores = np.zeros((n, k), dtype=np.float32)
+    if k == 0:
+        return neighbour_ids, neighbour_scores
+
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        scores = (matrix[start:end] @ matrix_t).toarray()
+        scores[np.arange(end - start), np.arange(start, end)] = -1.0  # never your own neighbour
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        neighbour_ids[start:end] = np.take_along_axis(top, order, axis=1)
+        neighbour_scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+
+    neighbour_scores[neighbour_scores < min_score] = 0.0
+    return neighbour_ids, neighbour_scores
+
+
+def build_similar_papers(corpus_path, output_path=DEFAULT_OUTPUT_PATH, k=10, block_size=1024, min_score=0.05):
+    """Compute top-k similar papers for the corpus and write the lookup file."""
+    papers = []
+    documents = []
+    for title, url, text in iter_corpus_documents(corpus_path):
+        if not text.strip():
+            continue
+        papers.append({"title": title, "url": url, "pmcid": extract_pmcid(url)})
+        documents.append(text)
+    if len(papers) < 2:
+        print("Need at least two papers to compare.")
+        return None
+
+    matrix = paper_tfidf_matrix(documents)
+    neighbour_ids, neighbour_scores = blocked_top_k(matrix, k, block_size, min_score)
+
+    lookup = {
+        "meta": {"source": corpus_path, "papers": len(papers), "terms": matrix.shape[1], "k": k},
+        "papers": papers,
+        # neighbours[i] lists [paper index, cosine score] pairs for papers[i], best first.
+        "neighbours": [
+            [[int(j), round(float(s), 4)] for j, s in zip(ids, scores) if s > 0]
+            for ids, scores in zip(neighbour_ids, neighbour_scores)
+        ],
+    }
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(lookup, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"Similar papers for {len(papers)} papers ({matrix.shape[1]} terms) saved to {output_path}")
+    return lookup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute TF-IDF similar papers with blocked sparse products")
+    parser.add_argument("--corpus", default=DEFAULT_CHUNKS_PATH,
+                        help="rag_chunks.json style chunk file or scraped_papers.json")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--block-size", type=int, default=1024, help="Rows multiplied per block")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    lookup = build_similar_papers(args.corpus, args.output, args.k, args.block_size)
+    if lookup:
+        first = lookup["papers"][0]["title"]
+        print(f"\nMost similar to '{first[:70]}':")
+        for j, score in lookup["neighbours"][0][:5]:
+            print(f"  [{score:.3f}] {lookup['papers'][j]['title'][:80]}")
+    print(f"Took {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,218 @@
-import openai
-import json
-from collections import defaultdict
-
-# Set up OpenRouter (OpenAI-compatible)
-client = openai.OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key="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",  # Replace with your OpenRouter API key
-)
-
-def load_json_data(file_path):
-    """Load data from JSON file with UTF-8 encoding."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except UnicodeDecodeError as e:
-        print(f"Encoding error: {str(e)}. Trying 'latin1' encoding as fallback...")
+"""
+Summarize papers from rag_chunks.json with an OpenRouter model.
+
+Importing this module is cheap: the openai package is imported and the client
+built on first use, then shared, so a long-running process reuses one
+connection pool for every call.
+
+    python summarize.py "Mice in Bion-M 1 Space Mission: Training and Selection" PMC3630201
+    python summarize.py --titles-file titles.txt --concurrency 4 --model openai/gpt-4o-mini
+    cat titles.txt | python summarize.py -
+"""
+import argparse
+import importlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_telemetry import DEFAULT_REPORT_PATH, LLMTelemetry
+from title_index import TitleIndex
+
+SCRAPING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Scraping")
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_MODEL = "qwen/qwen3-coder"
+DEFAULT_JSON_PATH = "rag_chunks.json"
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def scraping_module(name):
+    """Import a shared helper (rate_limiter, profiling) from Scraping/.
+
+    The directory is appended to sys.path on first use rather than put in
+    front, so the scraper modules there never shadow installed packages.
+    """
+    if SCRAPING_DIR not in sys.path:
+        sys.path.append(SCRAPING_DIR)
+    return importlib.import_module(name)
+
+
+def get_client(api_key=None):
+    """Return the shared OpenRouter (OpenAI-compatible) client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import openai
+                api_key = api_key or os.environ.get("OPENROUTER_API_KEY")
+                if not api_key:
+                    raise RuntimeError("Set OPENROUTER_API_KEY to your OpenRouter API key")
+                # openai's default connection pool keeps far more connections alive than --concurrency needs.
+                _client = openai.OpenAI(base_url=OPENROUTER_BASE_URL, api_key=api_key)
+    return _client
+
+
+def summarize_text(client, text, paper_title, model=DEFAULT_MODEL, telemetry=None, max_retries=3):
+    """Summarize a paper's full text using OpenRouter API.
+
+    The response is streamed so time to first token can be measured; tokens,
+    latency, retries, prompt-cache hits and cost go to telemetry when given.
+    """
+    import openai
+    retryable = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+    client = (client or get_client()).with_options(max_retries=0)  # retries are counted here instead
+    acquire = scraping_module("rate_limiter").acquire
+    start = time.perf_counter()
+    attempt_start = start
+    retries = 0
+    while True:
         try:
-            with open(file_path, 'r', encoding='latin1') as f:
-                return json.load(f)
-        except Exception as e2:
-            print(f"Fallback failed: {str(e2)}")
-            return []
-    except Exception as e:
-        print(f"Error loading JSON file: {str(e)}")
-        return []
-
-def summarize_text(client, text, paper_title, model="qwen/qwen3-coder"):
-    """Summarize a paper's full text using OpenRouter API."""
-    try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that summarizes scientific papers concisely while preserving key details."},
-                {"role": "user", "content": f"Summarize the following scientific paper titled '{paper_title}' in 3-5 sentences:\n\n{text}"}
-            ],
-            max_tokens=200,  # Limit output length
-            temperature=0.3,  # Low for factual summaries
+            acquire(OPENROUTER_BASE_URL)
+            # TTFT and latency measure the model: rate-limit waits, failed attempts and backoff only count in wall.
+            attempt_start = time.perf_counter()
+            stream = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that summarizes scientific papers concisely while preserving key details."},
+                    {"role": "user", "content": f"Summarize the following scientific paper titled '{paper_title}' in 3-5 sentences:\n\n{text}"}
+                ],
+                max_tokens=200,  # Limit output length
+                temperature=0.3,  # Low for factual summaries
+                stream=True,
+                stream_options={"include_usage": True},
+                extra_body={"usage": {"include": True}},  # OpenRouter reports the cost in usage
+            )
+            parts = []
+            ttft = None
+            usage = None
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if ttft is None:
+                        ttft = time.perf_counter() - attempt_start
+                    parts.append(chunk.choices[0].delta.content)
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+            break
+        except retryable as e:
+            if retries >= max_retries:
+                return failed_summary(telemetry, paper_title, model, start, attempt_start, retries, e)
+            retries += 1
+            time.sleep(2 ** retries)
+        except Exception as e:
+            return failed_summary(telemetry, paper_title, model, start, attempt_start, retries, e)
+
+    if telemetry is not None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        telemetry.record(
+            title=paper_title, model=model, ok=True,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+            ttft=ttft, latency=time.perf_counter() - attempt_start, wall=time.perf_counter() - start,
+            retries=retries,
+            cost=getattr(usage, "cost", None),
         )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Error summarizing '{paper_title}': {str(e)}"
-
-def group_by_title(data):
-    """Group sections by paper title."""
-    papers = defaultdict(list)
-    for item in data:
-        if "paper_title" in item and "text" in item:
-            papers[item["paper_title"]].append(item["text"])
-    return papers
-
-def summarize_and_print_papers_by_title(titles, json_file_path, client):
-    """Summarize papers from JSON file for given titles and print them."""
-    # Load JSON data
-    data = load_json_data(json_file_path)
-    if not data:
-        print("No data loaded from JSON file. Please check the file encoding or content.")
-        return
+    return "".join(parts).strip()
+
+
+def failed_summary(telemetry, paper_title, model, start, attempt_start, retries, error):
+    """Record a call that gave up and return the error text shown in place of a summary."""
+    if telemetry is not None:
+        now = time.perf_counter()
+        telemetry.record(title=paper_title, model=model, ok=False, prompt_tokens=0, completion_tokens=0,
+                         ttft=None, latency=now - attempt_start, wall=now - start, retries=retries,
+                         error=str(error))
+    return f"Error summarizing '{paper_title}': {str(error)}"
 
-    # Group data by title
-    papers = group_by_title(data)
 
-    print("=== Paper Summaries ===\n")
+def summarize_papers(titles, json_file_path=DEFAULT_JSON_PATH, client=None, model=DEFAULT_MODEL,
+                     concurrency=1, telemetry=None):
+    """Yield (title, matched paper or None, similarity, summary, candidates) in input order.
 
+    Chunks are read up front in this thread; up to concurrency LLM calls then
+    run at once on the shared client. A title without a confident match is not
+    summarized; candidates then holds the closest (title, similarity) pairs.
+    """
+    # The sidecar title index lets us read just the requested papers' chunks
+    # instead of loading and grouping the whole file.
+    index = TitleIndex(json_file_path)
+    jobs = []
     for title in titles:
-        if title in papers:
-            # Concatenate all sections for this paper
-            full_text = "\n\n".join(papers[title])
-            summary = summarize_text(client, full_text, title)
-            print(f"**{title}**\n{summary}\n")
-        else:
-            print(f"**{title}**\nNo data found for '{title}' in the JSON file. Please verify the title or provide the text.\n")
-
-# Configuration
-json_file_path = "rag_chunks.json"  # Replace with your JSON file path
-titles_to_summarize = [
-    "Mice in Bion-M 1 Space Mission: Training and Selection",
-    # Add more titles here, e.g., "Another Paper Title"
-]
-
-# Run summarization and print
-summarize_and_print_papers_by_title(titles_to_summarize, json_file_path, client)
\ No newline at end of file
+        # Exact title or PMCID first, then a clearly closest title by trigram similarity
+        paper, score, candidates = index.resolve(title)
+        text = "\n\n".join(chunk["text"] for chunk in index.read_paper_chunks(paper)) if paper else None
+        jobs.append((title, paper, score, text, candidates))
+
+    def run(job):
+        title, paper, score, text, candidates = job
+        summary = summarize_text(client, text, title, model, telemetry) if paper is not None else None
+        return title, paper, score, summary, candidates
+
+    if concurrency <= 1:
+        yield from map(run, jobs)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        yield from pool.map(run, jobs)
+
+
+def summarize_and_print_papers_by_title(titles, json_file_path, client=None, telemetry=None,
+                                        model=DEFAULT_MODEL, concurrency=1):
+    """Summarize papers from JSON file for given titles (or PMCIDs) and print them."""
+    paper_done = scraping_module("profiling").paper_done
+    try:
+        results = summarize_papers(titles, json_file_path, client, model, concurrency, telemetry)
+        print("=== Paper Summaries ===\n")
+        for title, paper, score, summary, candidates in results:
+            if paper is not None:
+                if score < 1.0:
+                    print(f"Matched '{title}' to '{paper['title']}' (similarity {score:.2f})")
+                print(f"**{title}**\n{summary}\n")
+            elif candidates:
+                suggestions = "\n".join(f"  [{s:.2f}] {t}" for t, s in candidates)
+                print(f"**{title}**\nNo exact match for '{title}'. Did you mean:\n{suggestions}\n")
+            else:
+                print(f"**{title}**\nNo data found for '{title}' in the JSON file. Please verify the title or provide the text.\n")
+            paper_done()
+    except (OSError, ValueError) as e:
+        print(f"Error indexing JSON file: {str(e)}")
+        print("No data loaded from JSON file. Please check the file encoding or content.")
+
+
+def read_titles(args):
+    """Titles from the command line, --titles-file, or stdin ('-' or nothing given with piped input)."""
+    titles = [t for t in args.titles if t != "-"]
+    if args.titles_file:
+        with open(args.titles_file, 'r', encoding='utf-8') as f:
+            titles.extend(line.strip() for line in f)
+    if "-" in args.titles or (not titles and not sys.stdin.isatty()):
+        titles.extend(line.strip() for line in sys.stdin)
+    return [t for t in titles if t]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize papers from rag_chunks.json by title or PMCID")
+    parser.add_argument("titles", nargs="*", help="Paper titles or PMCIDs ('-' reads them from stdin)")
+    parser.add_argument("--file", default=DEFAULT_JSON_PATH, help="Chunk JSON file")
+    parser.add_argument("--titles-file", help="File with one title or PMCID per line")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--concurrency", type=int, default=4, help="LLM calls in flight at once")
+    parser.add_argument("--telemetry", default=DEFAULT_REPORT_PATH, help="Where to write the LLM call report")
+    args = parser.parse_args()
+
+    titles = read_titles(args)
+    if not titles:
+        parser.error("no titles given")
+    client = get_client()
+    telemetry = LLMTelemetry()
+    summarize_and_print_papers_by_title(titles, args.file, client, telemetry, args.model, args.concurrency)
+    telemetry.print_summary()
+    telemetry.save(args.telemetry)
+
+
+if __name__ == "__main__":
+    # Set PROFILE_RUN=cprofile or sampling to profile the run
+    with scraping_module("profiling").profile_run("summarize"):
+        main()
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import re
+
+from chunk_reader import decode_record, iter_records
+
+INDEX_SUFFIX = ".titles.idx.json"
+INDEX_VERSION = 1
+
+# A fuzzy title match is only accepted when its trigram Dice similarity is at
+# least DEFAULT_MIN_SCORE and beats the runner-up by DEFAULT_MIN_MARGIN; below
+# that, sibling titles ("... Part 1" / "... Part 2") are too easily confused.
+DEFAULT_MIN_SCORE = 0.9
+DEFAULT_MIN_MARGIN = 0.05
+SUGGESTIONS = 3
+
+PMCID_PATTERN = re.compile(r"PMC\d+", re.IGNORECASE)
+
+
+def normalize_title(title):
+    """Casefold a title and collapse punctuation and whitespace runs to single spaces."""
+    return " ".join(re.sub(r"[\W_]+", " ", title.casefold()).split())
+
+
+def extract_pmcid(text):
+    """Return the upper-cased PMCID found in a URL or string, or an empty string."""
+    match = PMCID_PATTERN.search(text or "")
+    return match.group(0).upper() if match else ""
+
+
+def file_fingerprint(file_path, with_hash=True):
+    """Describe a file by size, mtime and (optionally) SHA-1 of its contents."""
+    stat = os.stat(file_path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        fingerprint["sha1"] = digest.hexdigest()
+    return fingerprint
+
+
+def unchanged_fingerprint(cached, file_path):
+    """Return the file's fingerprint if it still matches cached, else None.
+
+    Size and mtime are checked first; when only the mtime moved (copy, touch,
+    checkout) the SHA-1 decides, and the refreshed fingerprint is returned.
+    """
+    current = file_fingerprint(file_path, with_hash=False)
+    if cached.get("size") != current["size"]:
+        return None
+    if cached.get("mtime_ns") == current["mtime_ns"]:
+        return cached
+    current = file_fingerprint(file_path)
+    return current if current["sha1"] == cached.get("sha1") else None
+
+
+def build_title_index(json_file_path):
+    """Stream a JSON-array or NDJSON chunk file once and map each paper to the byte spans of its chunks."""
+    papers = {}
+    pmcids = {}
+    with open(json_file_path, 'rb') as f:
+        for chunk_id, (start, end, raw) in enumerate(iter_records(f)):
+            chunk = decode_record(raw)
+
+            title = chunk.get("paper_title")
+            if not title or "text" not in chunk:
+                continue
+            key = normalize_title(title)
+            paper = papers.get(key)
+            if paper is None:
+                pmcid = extract_pmcid(chunk.get("url", ""))
+                paper = papers[key] = {"title": title, "pmcid": pmcid, "chunk_ids": [], "spans": []}
+                if pmcid:
+                    pmcids.setdefault(pmcid, key)
+            paper["chunk_ids"].append(chunk_id)
+            paper["spans"].append([start, end])
+
+    return {
+        "version": INDEX_VERSION,
+        "source": file_fingerprint(json_file_path),
+        "papers": papers,
+        "pmcids": pmcids,
+    }
+
+
+class TitleIndex:
+    """Sidecar index from normalized title / PMCID to the chunks of one paper."""
+
+    def __init__(self, json_file_path, index_path=None):
+        self.json_file_path = json_file_path
+        self.index_path = index_path or json_file_path + INDEX_SUFFIX
+        self.data = self._load_or_build()
+        self._trigrams = None
+
+    def _load_or_build(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+
+        if data and data.get("version") == INDEX_VERSION:
+            current = unchanged_fingerprint(data["source"], self.json_file_path)
+            if current is not None:
+                if current is not data["source"]:
+                    data["source"] = current
+                    self._save(data)
+                return data
+
+        print(f"Building title index for {self.json_file_path}...")
+        data = build_title_index(self.json_file_path)
+        self._save(data)
+        print(f"Indexed {len(data['papers'])} papers into {self.index_path}")
+        return data
+
+    def _save(self, data):
+        try:
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Could not write title index {self.index_path}: {e}")
+
+    def lookup(self, title_or_pmcid):
+        """Return the index entry for a title or PMCID, or None."""
+        papers = self.data["papers"]
+        pmcid = extract_pmcid(title_or_pmcid)
+        if pmcid and pmcid in self.data["pmcids"] and pmcid == title_or_pmcid.strip().upper():
+            return papers[self.data["pmcids"][pmcid]]
+        return papers.get(normalize_title(title_or_pmcid))
+
+    def resolve(self, title_or_pmcid, min_score=DEFAULT_MIN_SCORE, min_margin=DEFAULT_MIN_MARGIN):
+        """Return (entry, score, candidates) for an exact, PMCID or confident fuzzy match.
+
+        When no match is confident, entry is None and candidates lists the
+        closest (original title, score) pairs to suggest instead.
+        """
+        paper = self.lookup(title_or_pmcid)
+        if paper is not None:
+            return paper, 1.0, []
+        if self._trigrams is None:
+            # Imported lazily so exact lookups never pay for numpy.
+            from title_trigrams import TrigramIndex
+            self._trigrams = TrigramIndex(self.data["papers"])
+        matches = self._trigrams.search(title_or_pmcid, k=max(SUGGESTIONS, 2))
+        if not matches:
+            return None, 0.0, []
+        (key, score), runner_up = matches[0], matches[1][1] if len(matches) > 1 else 0.0
+        if score >= min_score and score - runner_up >= min_margin:
+            return self.data["papers"][key], score, []
+        candidates = [(self.data["papers"][key]["title"], score) for key, score in matches[:SUGGESTIONS]]
+        return None, score, candidates
+
+    def titles(self):
+        """Return the original titles of every indexed paper."""
+        return [paper["title"] for paper in self.data["papers"].values()]
+
+    def read_chunks(self, title_or_pmcid):
+        """Read only the chunk records of one paper from the chunk file."""
+        paper = self.lookup(title_or_pmcid)
+        if paper is None:
+            return []
+        return self.read_paper_chunks(paper)
+
+    def read_paper_chunks(self, paper):
+        """Read the chunk records of an entry returned by lookup() or resolve()."""
+        chunks = []
+        with open(self.json_file_path, 'rb') as f:
+            for start, end in paper["spans"]:
+                f.seek(start)
+                chunks.append(decode_record(f.read(end - start)))
+        return chunks
+
+    def read_texts(self, title_or_pmcid):
+        """Return the section texts of one paper, in file order."""
+        return [chunk["text"] for chunk in self.read_chunks(title_or_pmcid)]
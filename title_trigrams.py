@@ -0,0 +1,95 @@
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from title_index import normalize_title
+
+
+def title_trigrams(title):
+    """Return the set of character trigrams of a normalized, space-padded title."""
+    padded = f"  {normalize_title(title)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Character-trigram inverted index for approximate title lookup."""
+
+    def __init__(self, titles):
+        self.titles = list(titles)
+        grams_per_title = [title_trigrams(title) for title in self.titles]
+
+        postings = {}
+        for title_id, grams in enumerate(grams_per_title):
+            for gram in grams:
+                postings.setdefault(gram, []).append(title_id)
+
+        # One CSR layout for all posting lists keeps a lookup to a handful of
+        # slices plus a single bincount.
+        self.gram_ids = {}
+        indptr = [0]
+        ids = []
+        for gram_id, (gram, title_ids) in enumerate(postings.items()):
+            self.gram_ids[gram] = gram_id
+            ids.extend(title_ids)
+            indptr.append(len(ids))
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.postings = np.asarray(ids, dtype=np.int32)
+        self.gram_counts = np.asarray([len(grams) for grams in grams_per_title], dtype=np.float32)
+
+    def search(self, query, k=5, min_score=0.0):
+        """Return up to k (title, score) pairs by Dice similarity of trigram sets, best first."""
+        if not self.titles:
+            return []
+        grams = title_trigrams(query)
+        slices = [self.postings[self.indptr[gid]:self.indptr[gid + 1]]
+                  for gid in (self.gram_ids.get(gram) for gram in grams) if gid is not None]
+        if not slices:
+            return []
+        shared = np.bincount(np.concatenate(slices), minlength=len(self.titles))
+        scores = 2.0 * shared / (len(grams) + self.gram_counts)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.titles[i], float(scores[i])) for i in top if scores[i] > 0 and scores[i] >= min_score]
+
+    def best_match(self, query, min_score=0.0):
+        """Return the single best (title, score) pair, or (None, 0.0)."""
+        matches = self.search(query, k=1, min_score=min_score)
+        return matches[0] if matches else (None, 0.0)
+
+
+def read_csv_titles(csv_file):
+    """Read the Title column of SB_publication_PMC.csv style files."""
+    try:
+        with open(csv_file, 'r', encoding='utf-8-sig') as f:
+            return [row['Title'].strip() for row in csv.DictReader(f) if row.get('Title', '').strip()]
+    except Exception as e:
+        print(f"Error reading CSV file: {e}")
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzzy-match a title against known paper titles")
+    parser.add_argument("query", nargs="+")
+    parser.add_argument("--csv", default="Backend/Data/SB_publication_PMC.csv")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = TrigramIndex(read_csv_titles(args.csv))
+    print(f"Indexed {len(index.titles)} titles in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for query in args.query:
+        start = time.perf_counter()
+        matches = index.search(query, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"\n=== {query} ({elapsed_ms:.3f} ms) ===")
+        for title, score in matches:
+            print(f"  [{score:.3f}] {title}")
+
+
+if __name__ == "__main__":
+    main()
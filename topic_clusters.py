@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from scipy import sparse
+
+from ann_index import kmeans_plus_plus
+from bm25_index import DEFAULT_CHUNKS_PATH, tokenize
+from keyword_extraction import PHRASE_BREAKERS, iter_corpus_documents
+from keyword_graph import read_paper_keywords
+from title_index import extract_pmcid
+from vector_index import TfidfVectorizer, l2_normalize, randomized_svd_components
+
+DEFAULT_KEYWORDS_CSV = "papers_with_citations.csv"
+DEFAULT_OUTPUT_DIR = os.path.join("Backend", "Data", "topic_clusters")
+
+# Title and keywords describe every paper, section text only the scraped ones.
+# Each part is normalized on its own and the text added at this weight, so
+# full-text papers do not end up in a cluster of their own.
+TEXT_WEIGHT = 0.5
+
+
+def collect_papers(corpus_path, keyword_csvs):
+    """Merge section text and keywords per paper; papers with only keywords are kept too."""
+    papers = {}
+    if keyword_csvs:
+        for key, (title, keywords) in read_paper_keywords(keyword_csvs).items():
+            papers[key] = {"title": title, "url": key if key.startswith("http") else "",
+                           "keywords": sorted(keywords), "text": ""}
+    if corpus_path and os.path.exists(corpus_path):
+        for title, url, text in iter_corpus_documents(corpus_path):
+            paper = papers.setdefault(url or title, {"title": title, "url": url, "keywords": [], "text": ""})
+            paper["text"] = text
+    return list(papers.values())
+
+
+def topic_tokens(text):
+    """Tokenize text without the scientific-prose filler that says nothing about a topic."""
+    return [token for token in tokenize(text) if token not in PHRASE_BREAKERS and not token.isdigit()]
+
+
+def paper_tfidf(vectorizer, papers):
+    """Return the L2-normalized TF-IDF rows mixing each paper's summary and section text."""
+    n_terms = len(vectorizer.vocab)
+    parts = []
+    for tokens in ([topic_tokens(paper["title"] + " " + " ".join(paper["keywords"])) for paper in papers],
+                   [topic_tokens(paper["text"]) for paper in papers]):
+        indptr, indices, data = vectorizer.transform(tokens)
+        parts.append(sparse.csr_matrix((data, indices, indptr), shape=(len(papers), n_terms)))
+    matrix = (parts[0] + TEXT_WEIGHT * parts[1]).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).astype(np.float32) @ matrix
+
+
+def update_centroids(centroids, counts, vectors, assignment):
+    """Move centroids toward newly assigned vectors with per-centroid 1/count learning rates."""
+    n_clusters = len(centroids)
+    batch_counts = np.bincount(assignment, minlength=n_clusters)
+    sums = np.zeros_like(centroids)
+    np.add.at(sums, assignment, vectors)
+    counts += batch_counts
+    touched = batch_counts > 0
+    # Equivalent to averaging every point a centroid has ever seen, one batch at a time.
+    centroids[touched] += (sums[touched] - batch_counts[touched, None] * centroids[touched]) / counts[touched, None]
+    centroids[touched] = l2_normalize(centroids[touched])
+
+
+def mini_batch_kmeans(vectors, n_clusters, batch_size=256, n_iter=100, seed=0):
+    """Spherical mini-batch k-means (Sculley 2010); returns (centroids, per-centroid counts)."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    centroids = kmeans_plus_plus(vectors, n_clusters, rng)
+    counts = np.zeros(n_clusters, dtype=np.int64)
+    for _ in range(n_iter):
+        batch = vectors[rng.choice(n, min(batch_size, n), replace=False)]
+        update_centroids(centroids, counts, batch, np.argmax(batch @ centroids.T, axis=1))
+    return centroids, counts
+
+
+def cluster_top_terms(tfidf, assignment, n_clusters, terms, top_n=10):
+    """Return the terms whose mean TF-IDF in a cluster most exceeds their corpus mean."""
+    membership = sparse.csr_matrix((np.ones(len(assignment), dtype=np.float32),
+                                    (assignment, np.arange(len(assignment)))),
+                                   shape=(n_clusters, len(assignment)))
+    sizes = np.maximum(np.bincount(assignment, minlength=n_clusters), 1)
+    cluster_means = (membership @ tfidf).toarray() / sizes[:, None]
+    corpus_mean = np.asarray(tfidf.mean(axis=0)).ravel()
+    distinctive = cluster_means - corpus_mean
+    top = np.argsort(-distinctive, axis=1, kind='stable')[:, :top_n]
+    return [[terms[t] for t in row if distinctive[c, t] > 0] for c, row in enumerate(top)]
+
+
+def build_topic_clusters(papers, output_dir=DEFAULT_OUTPUT_DIR, n_clusters=12, n_components=64,
+                         batch_size=256, n_iter=100, seed=0):
+    """Embed papers with LSA, cluster them with mini-batch k-means and persist the model."""
+    if len(papers) < n_clusters:
+        print(f"Need at least {n_clusters} papers to build {n_clusters} clusters.")
+        return None
+
+    vectorizer = TfidfVectorizer().fit(
+        [topic_tokens(" ".join([paper["title"], *paper["keywords"], paper["text"]])) for paper in papers])
+    tfidf = paper_tfidf(vectorizer, papers)
+    n_terms = len(vectorizer.vocab)
+    projection, _ = randomized_svd_components(tfidf.indptr, tfidf.indices, tfidf.data, n_terms,
+                                              n_components, seed=seed)
+    embeddings = l2_normalize(np.asarray(tfidf @ projection))
+
+    centroids, counts = mini_batch_kmeans(embeddings, n_clusters, batch_size, n_iter, seed)
+    similarities = embeddings @ centroids.T
+    assignment = np.argmax(similarities, axis=1)
+    terms = sorted(vectorizer.vocab, key=vectorizer.vocab.get)
+    top_terms = cluster_top_terms(tfidf, assignment, n_clusters, terms)
+
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(os.path.join(output_dir, "centroids.npy"), centroids)
+    np.save(os.path.join(output_dir, "counts.npy"), counts)
+    np.save(os.path.join(output_dir, "projection.npy"), projection)
+    np.save(os.path.join(output_dir, "idf.npy"), vectorizer.idf)
+    with open(os.path.join(output_dir, "vocab.json"), 'w', encoding='utf-8') as f:
+        json.dump(vectorizer.vocab, f, ensure_ascii=False, separators=(",", ":"))
+
+    sizes = np.bincount(assignment, minlength=n_clusters)
+    clusters = [{"id": c, "label": ", ".join(top_terms[c][:3]), "size": int(sizes[c]), "top_terms": top_terms[c]}
+                for c in range(n_clusters)]
+    with open(os.path.join(output_dir, "clusters.json"), 'w', encoding='utf-8') as f:
+        json.dump(clusters, f, indent=2, ensure_ascii=False)
+
+    assignments = [
+        {"title": paper["title"], "url": paper["url"], "pmcid": extract_pmcid(paper["url"]),
+         "cluster": int(cluster), "similarity": round(float(similarities[i, cluster]), 4)}
+        for i, (paper, cluster) in enumerate(zip(papers, assignment))
+    ]
+    with open(os.path.join(output_dir, "assignments.json"), 'w', encoding='utf-8') as f:
+        json.dump(assignments, f, ensure_ascii=False, separators=(",", ":"))
+
+    meta = {"papers": len(papers), "clusters": n_clusters, "terms": n_terms,
+            "dimensions": int(projection.shape[1]), "batch_size": batch_size, "iterations": n_iter}
+    with open(os.path.join(output_dir, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    print(f"Clustered {len(papers)} papers into {n_clusters} topics ({n_terms} terms) at {output_dir}")
+    return clusters
+
+
+class TopicClusters:
+    """A saved clustering that can place new papers without re-clustering the corpus."""
+
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR):
+        self.output_dir = output_dir
+        with open(os.path.join(output_dir, "vocab.json"), 'r', encoding='utf-8') as f:
+            vocab = json.load(f)
+        self.vectorizer = TfidfVectorizer(vocab, np.load(os.path.join(output_dir, "idf.npy")))
+        self.projection = np.load(os.path.join(output_dir, "projection.npy"))
+        self.centroids = np.load(os.path.join(output_dir, "centroids.npy"))
+        self.counts = np.load(os.path.join(output_dir, "counts.npy"))
+        with open(os.path.join(output_dir, "clusters.json"), 'r', encoding='utf-8') as f:
+            self.clusters = json.load(f)
+        with open(os.path.join(output_dir, "assignments.json"), 'r', encoding='utf-8') as f:
+            self.assignments = json.load(f)
+
+    def embed(self, papers):
+        """Project papers into the clustering space with the stored vocabulary and projection."""
+        return l2_normalize(np.asarray(paper_tfidf(self.vectorizer, papers) @ self.projection))
+
+    def assign(self, papers):
+        """Return (cluster ids, cosine similarity to the chosen centroid) for papers."""
+        similarities = self.embed(papers) @ self.centroids.T
+        clusters = np.argmax(similarities, axis=1)
+        return clusters, similarities[np.arange(len(papers)), clusters]
+
+    def add_papers(self, papers, update=True):
+        """Assign papers not seen before and optionally nudge the centroids toward them."""
+        known = {entry["url"] or entry["title"] for entry in self.assignments}
+        new_papers = [paper for paper in papers if (paper["url"] or paper["title"]) not in known]
+        if not new_papers:
+            return []
+        clusters, similarities = self.assign(new_papers)
+        if update:
+            update_centroids(self.centroids, self.counts, self.embed(new_papers), clusters)
+
+        added = [
+            {"title": paper["title"], "url": paper["url"], "pmcid": extract_pmcid(paper["url"]),
+             "cluster": int(cluster), "similarity": round(float(similarity), 4)}
+            for paper, cluster, similarity in zip(new_papers, clusters, similarities)
+        ]
+        self.assignments.extend(added)
+        for cluster in clusters:
+            self.clusters[cluster]["size"] += 1
+        return added
+
+    def save(self):
+        """Persist centroids, counts, cluster sizes and assignments after incremental updates."""
+        np.save(os.path.join(self.output_dir, "centroids.npy"), self.centroids)
+        np.save(os.path.join(self.output_dir, "counts.npy"), self.counts)
+        with open(os.path.join(self.output_dir, "clusters.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.clusters, f, indent=2, ensure_ascii=False)
+        with open(os.path.join(self.output_dir, "assignments.json"), 'w', encoding='utf-8') as f:
+            json.dump(self.assignments, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster the corpus into research themes with mini-batch k-means")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("build", "assign"):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("--corpus", default=DEFAULT_CHUNKS_PATH,
+                         help="rag_chunks.json style chunk file or scraped_papers.json")
+        sub.add_argument("--keywords", nargs="*", default=[DEFAULT_KEYWORDS_CSV],
+                         help="CSVs with title,url,keywords columns")
+        sub.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    build_parser = subparsers.choices["build"]
+    build_parser.add_argument("--clusters", type=int, default=12)
+    build_parser.add_argument("--dimensions", type=int, default=64)
+    build_parser.add_argument("--batch-size", type=int, default=256)
+    build_parser.add_argument("--iterations", type=int, default=100)
+    subparsers.choices["assign"].add_argument("--no-update", action="store_true",
+                                              help="Assign new papers without moving the centroids")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    papers = collect_papers(args.corpus, args.keywords)
+    if args.command == "build":
+        clusters = build_topic_clusters(papers, args.output_dir, args.clusters, args.dimensions,
+                                        args.batch_size, args.iterations)
+        for cluster in clusters or []:
+            print(f"  [{cluster['id']:2d}] {cluster['size']:4d} papers: {', '.join(cluster['top_terms'][:6])}")
+    else:
+        model = TopicClusters(args.output_dir)
+        added = model.add_papers(papers, update=not args.no_update)
+        model.save()
+        print(f"Assigned {len(added)} new papers to existing clusters")
+    print(f"Took {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
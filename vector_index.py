@@ -0,0 +1,261 @@
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from bm25_index import DEFAULT_CHUNKS_PATH, ChunkMetadata, tokenize
+from chunk_reader import iter_chunks
+
+DEFAULT_INDEX_DIR = os.path.join("Backend", "Data", "vector_index")
+
+# Upper bound on query-block x chunk score matrix cells held at once.
+MAX_SCORE_CELLS = 1 << 25
+# Chunk rows upcast to float32 at a time while scoring.
+EMBEDDING_BLOCK_ROWS = 1 << 14
+
+
+def csr_matmul(indptr, indices, data, dense):
+    """Multiply a CSR matrix given as its three arrays by a dense matrix."""
+    n_rows = len(indptr) - 1
+    out = np.zeros((n_rows, dense.shape[1]), dtype=np.float32)
+    lengths = np.diff(indptr)
+    nonempty = np.flatnonzero(lengths)
+    if len(nonempty) == 0:
+        return out
+    weighted = dense[indices] * data[:, None]
+    # reduceat misbehaves on empty segments, so only sum the rows that have entries.
+    out[nonempty] = np.add.reduceat(weighted, indptr[nonempty], axis=0)
+    return out
+
+
+def csr_transpose(indptr, indices, data, n_cols):
+    """Return the CSR arrays of the transposed matrix."""
+    rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    t_indptr = np.zeros(n_cols + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=n_cols), out=t_indptr[1:])
+    return t_indptr, rows[order], data[order]
+
+
+def l2_normalize(matrix):
+    """Scale every row to unit length, leaving all-zero rows untouched."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class TfidfVectorizer:
+    """Sublinear TF-IDF over the shared chunk tokenizer."""
+
+    def __init__(self, vocab=None, idf=None):
+        self.vocab = vocab or {}
+        self.idf = idf
+
+    def fit(self, token_lists, min_df=2, max_features=50000):
+        """Choose the vocabulary and idf weights from tokenized documents."""
+        df = {}
+        for tokens in token_lists:
+            for tok in set(tokens):
+                df[tok] = df.get(tok, 0) + 1
+        kept = [term for term, count in df.items() if count >= min_df]
+        kept.sort(key=lambda term: (-df[term], term))
+        kept = sorted(kept[:max_features])
+        n_docs = len(token_lists)
+        self.vocab = {term: i for i, term in enumerate(kept)}
+        self.idf = np.array([math.log((1 + n_docs) / (1 + df[term])) + 1.0 for term in kept],
+                            dtype=np.float32)
+        return self
+
+    def transform(self, token_lists):
+        """Return CSR arrays (indptr, indices, data) of L2-normalized TF-IDF rows."""
+        indptr = [0]
+        indices = []
+        data = []
+        for tokens in token_lists:
+            counts = {}
+            for tok in tokens:
+                col = self.vocab.get(tok)
+                if col is not None:
+                    counts[col] = counts.get(col, 0) + 1
+            cols = sorted(counts)
+            weights = [(1.0 + math.log(counts[col])) * self.idf[col] for col in cols]
+            norm = math.sqrt(sum(w * w for w in weights)) or 1.0
+            indices.extend(cols)
+            data.extend(w / norm for w in weights)
+            indptr.append(len(indices))
+        return (np.asarray(indptr, dtype=np.int64),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(data, dtype=np.float32))
+
+
+def randomized_svd_components(indptr, indices, data, n_cols, n_components, n_oversamples=10,
+                              n_iter=4, seed=0):
+    """Right singular vectors of a sparse matrix via randomized range finding (Halko et al.)."""
+    rng = np.random.default_rng(seed)
+    t_indptr, t_indices, t_data = csr_transpose(indptr, indices, data, n_cols)
+    width = min(n_components + n_oversamples, n_cols)
+
+    y = csr_matmul(indptr, indices, data, rng.standard_normal((n_cols, width), dtype=np.float32))
+    q, _ = np.linalg.qr(y)
+    for _ in range(n_iter):
+        z, _ = np.linalg.qr(csr_matmul(t_indptr, t_indices, t_data, q))
+        q, _ = np.linalg.qr(csr_matmul(indptr, indices, data, z))
+
+    # B = Q^T X is small (width x n_cols), so an exact SVD of it is cheap.
+    b = csr_matmul(t_indptr, t_indices, t_data, q).T
+    _, singular_values, vt = np.linalg.svd(b, full_matrices=False)
+    k = min(n_components, len(singular_values))
+    return vt[:k].T.astype(np.float32), singular_values[:k]
+
+
+def build_vector_index(chunks, index_dir=DEFAULT_INDEX_DIR, n_components=128, dtype="float16",
+                       min_df=2, max_features=50000):
+    """Compute LSA embeddings for every chunk and store them as a memory-mappable matrix."""
+    metadata = ChunkMetadata()
+    token_lists = []
+    for chunk in chunks:
+        token_lists.append(tokenize(chunk.get("text", "")))
+        metadata.add(chunk)
+
+    if not token_lists:
+        print("No chunks to index.")
+        return None
+
+    vectorizer = TfidfVectorizer().fit(token_lists, min_df=min_df, max_features=max_features)
+    indptr, indices, data = vectorizer.transform(token_lists)
+    n_terms = len(vectorizer.vocab)
+
+    projection, singular_values = randomized_svd_components(
+        indptr, indices, data, n_terms, n_components)
+    embeddings = l2_normalize(csr_matmul(indptr, indices, data, projection))
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "embeddings.npy"), embeddings.astype(dtype))
+    np.save(os.path.join(index_dir, "projection.npy"), projection)
+    np.save(os.path.join(index_dir, "idf.npy"), vectorizer.idf)
+    metadata.save(index_dir)
+    with open(os.path.join(index_dir, "vocab.json"), 'w', encoding='utf-8') as f:
+        json.dump(vectorizer.vocab, f, ensure_ascii=False, separators=(",", ":"))
+
+    meta = {
+        "num_chunks": len(token_lists),
+        "num_terms": n_terms,
+        "dimensions": int(projection.shape[1]),
+        "dtype": dtype,
+        "explained_singular_values": [float(v) for v in singular_values[:10]],
+    }
+    with open(os.path.join(index_dir, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"Embedded {meta['num_chunks']} chunks into {meta['dimensions']} dimensions "
+          f"({n_terms} terms) at {index_dir}")
+    return meta
+
+
+def top_k_rows(scores, k):
+    """Return (ids, scores) of the k best columns of every row, best first."""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(k), scores.shape).copy()
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+class VectorIndex:
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        with open(os.path.join(index_dir, "meta.json"), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(index_dir, "vocab.json"), 'r', encoding='utf-8') as f:
+            vocab = json.load(f)
+        self.vectorizer = TfidfVectorizer(vocab, np.load(os.path.join(index_dir, "idf.npy")))
+        self.projection = np.load(os.path.join(index_dir, "projection.npy"))
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode='r')
+        self.metadata = ChunkMetadata.load(index_dir)
+
+    def embed(self, texts):
+        """Project query texts into the chunk embedding space."""
+        indptr, indices, data = self.vectorizer.transform([tokenize(text) for text in texts])
+        return l2_normalize(csr_matmul(indptr, indices, data, self.projection))
+
+    def search_vectors(self, vectors, k=10):
+        """Top-k chunk ids and cosine scores for a batch of unit query vectors."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n_chunks = self.embeddings.shape[0]
+        block = max(1, MAX_SCORE_CELLS // max(n_chunks, 1))
+        all_ids = []
+        all_scores = []
+        for start in range(0, len(vectors), block):
+            batch = vectors[start:start + block]
+            scores = np.empty((len(batch), n_chunks), dtype=np.float32)
+            # float16 storage halves the file; upcast one block of chunk rows at a
+            # time so the full matrix is never materialized in float32.
+            for row in range(0, n_chunks, EMBEDDING_BLOCK_ROWS):
+                rows = self.embeddings[row:row + EMBEDDING_BLOCK_ROWS].astype(np.float32, copy=False)
+                scores[:, row:row + len(rows)] = batch @ rows.T
+            ids, top_scores = top_k_rows(scores, k)
+            all_ids.append(ids)
+            all_scores.append(top_scores)
+        if not all_ids:
+            return np.empty((0, k), dtype=np.int64), np.empty((0, k), dtype=np.float32)
+        return np.vstack(all_ids), np.vstack(all_scores)
+
+    def search_batch(self, queries, k=10):
+        """Return one ranked hit list per query text."""
+        ids, scores = self.search_vectors(self.embed(queries), k)
+        results = []
+        for row_ids, row_scores in zip(ids, scores):
+            hits = []
+            for chunk_id, score in zip(row_ids, row_scores):
+                hit = {"chunk_id": int(chunk_id), "score": float(score)}
+                hit.update(self.metadata.describe(int(chunk_id)))
+                hits.append(hit)
+            results.append(hits)
+        return results
+
+    def search(self, query, k=10):
+        """Return the top-k chunks most similar to a single query text."""
+        return self.search_batch([query], k)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline LSA vector index over RAG chunks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the index from a chunk file")
+    build_parser.add_argument("--chunks", default=DEFAULT_CHUNKS_PATH)
+    build_parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    build_parser.add_argument("--dimensions", type=int, default=128)
+    build_parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+
+    query_parser = subparsers.add_parser("query", help="Query an existing index")
+    query_parser.add_argument("query", nargs="+", help="One or more query strings, searched as a batch")
+    query_parser.add_argument("-k", type=int, default=10)
+    query_parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        build_vector_index(iter_chunks(args.chunks), args.index_dir,
+                           n_components=args.dimensions, dtype=args.dtype)
+        print(f"Build took {time.perf_counter() - start:.2f}s")
+    else:
+        index = VectorIndex(args.index_dir)
+        start = time.perf_counter()
+        results = index.search_batch(args.query, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for query, hits in zip(args.query, results):
+            print(f"\n=== {query} ===")
+            for rank, hit in enumerate(hits, 1):
+                print(f"{rank:2d}. [{hit['score']:.3f}] {hit['paper_title'][:70]} :: {hit['section'][:40]}")
+        print(f"\n{len(args.query)} queries in {elapsed_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()